@@ -0,0 +1,36 @@
+import pytest
+
+from hfval.synthetic import make_patches, make_workspace, write_likelihoods
+
+# (n_channels, n_bins, n_samples, n_modifiers, n_points)
+SCALES = {
+    "small": (4, 5, 3, 10, 20),
+    "medium": (20, 10, 5, 20, 100),
+    "large": (50, 10, 5, 20, 200),
+}
+
+
+@pytest.fixture(scope="session", params=list(SCALES))
+def scale(request):
+    return request.param
+
+
+@pytest.fixture(scope="session")
+def likelihoods(scale):
+    n_channels, n_bins, n_samples, n_modifiers, n_points = SCALES[scale]
+    workspace = make_workspace(
+        n_channels=n_channels,
+        n_bins=n_bins,
+        n_samples=n_samples,
+        n_modifiers=n_modifiers,
+    )
+    patches = make_patches(workspace, n_points=n_points, n_modifiers=n_modifiers)
+    return workspace, patches
+
+
+@pytest.fixture(scope="session")
+def likelihood_dir(tmp_path_factory, scale, likelihoods):
+    directory = tmp_path_factory.mktemp(f"likelihoods_{scale}")
+    write_likelihoods(directory / "files", *likelihoods)
+    write_likelihoods(directory / "patchset", *likelihoods, patchset=True)
+    return directory
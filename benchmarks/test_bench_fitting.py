@@ -0,0 +1,34 @@
+import pytest
+
+from hfval.fitting import fit, fit_patches, patched_specs, set_backend
+
+# Fits are slow, only a few points of the smallest scale are fitted
+N_POINTS = 5
+
+
+@pytest.fixture(scope="module")
+def grid(scale, likelihoods):
+    if scale != "small":
+        pytest.skip("fits are only benchmarked at the small scale")
+    set_backend("numpy", "scipy")
+    workspace, patches = likelihoods
+    return workspace, patches[:N_POINTS]
+
+
+def test_fit_independent(benchmark, grid):
+    workspace, patches = grid
+    results = benchmark.pedantic(
+        lambda: [fit(spec, name) for name, spec in patched_specs(workspace, patches)],
+        rounds=1,
+    )
+    assert all(result.converged for result in results)
+
+
+@pytest.mark.parametrize("warm_start", ["previous", "background"])
+def test_fit_incremental(benchmark, grid, warm_start):
+    workspace, patches = grid
+    results = benchmark.pedantic(
+        lambda: list(fit_patches(workspace, patches, warm_start=warm_start)),
+        rounds=1,
+    )
+    assert all(result.converged for result in results)
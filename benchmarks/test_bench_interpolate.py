@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from hfval.interpolate import MassPlaneInterpolator
+from hfval.render import ContourJob, render
+from hfval.synthetic import signal_masses
+
+
+@pytest.fixture(scope="module")
+def mass_plane(likelihoods):
+    workspace, patches = likelihoods
+    n_bins = sum(len(ch["samples"][0]["data"]) for ch in workspace["channels"])
+    rng = np.random.default_rng(2)
+    masses = np.asarray(signal_masses(len(patches)), dtype=float)
+    values = rng.uniform(0.0, 3.0, (len(masses), n_bins))
+    # Leave out some points of each bin, like zero relative systs
+    mask = rng.uniform(size=values.shape) > 0.1
+    return masses, values, mask
+
+
+def test_interpolate(benchmark, mass_plane):
+    masses, values, mask = mass_plane
+
+    def run():
+        # A new interpolator per run, so the triangulations are not reused
+        return MassPlaneInterpolator(masses)(values, mask)
+
+    assert benchmark(run).shape == (values.shape[1], 100, 100)
+
+
+def test_render_contours(benchmark, tmp_path, scale, mass_plane):
+    if scale != "small":
+        pytest.skip("the rendering time does not depend on the workspace size")
+    masses, values, mask = mass_plane
+    interpolator = MassPlaneInterpolator(masses)
+    z = interpolator(values, mask)
+    jobs = [
+        ContourJob(
+            filename=f"bin{ibin}.png",
+            title=f"Bin {ibin}",
+            x=interpolator.x,
+            y=interpolator.y,
+            z=z[ibin],
+            points=np.stack([masses[:, 0], masses[:, 1], values[:, ibin]]),
+            outliers=np.zeros((3, 0)),
+            vmin=0,
+            vmax=3,
+            xlim=(masses[:, 0].min() - 25, masses[:, 0].max() + 25),
+            ylim=(masses[:, 1].min() - 25, masses[:, 1].max() + 25),
+            xlabel="m1",
+            ylabel="m2",
+            zlabel="rel",
+        )
+        for ibin in range(5)
+    ]
+    count = benchmark(render, jobs, output_dir=str(tmp_path), n_workers=1)
+    assert count == len(jobs)
@@ -0,0 +1,28 @@
+from hfval.loader import iter_documents, iter_patch_ops, load_background
+from hfval.store import ColumnarStore, write_store
+
+
+def test_load_background(benchmark, likelihood_dir):
+    spec = benchmark(load_background, str(likelihood_dir / "files"))
+    assert spec["channels"]
+
+
+def test_load_patch_files(benchmark, likelihood_dir, likelihoods):
+    pattern = str(likelihood_dir / "files" / "patch_*.json")
+    ops = benchmark(lambda: list(iter_patch_ops([pattern], n_workers=1)))
+    assert len(ops) == len(likelihoods[1]) * len(likelihoods[0]["channels"])
+
+
+def test_load_patchset(benchmark, likelihood_dir, likelihoods):
+    path = str(likelihood_dir / "patchset" / "patchset.json")
+    ops = benchmark(lambda: list(iter_patch_ops([path], n_workers=1)))
+    assert len(ops) == len(likelihoods[1]) * len(likelihoods[0]["channels"])
+
+
+def test_open_store(benchmark, likelihood_dir, likelihoods, tmp_path_factory):
+    path = str(likelihood_dir / "files" / "patch_*.json")
+    spec = load_background(str(likelihood_dir / "files"))
+    store = str(tmp_path_factory.mktemp("store"))
+    write_store(store, spec, iter_documents([path]))
+    summaries = benchmark(lambda: list(ColumnarStore(store).iter_summaries()))
+    assert len(summaries) == len(likelihoods[1]) * len(likelihoods[0]["channels"])
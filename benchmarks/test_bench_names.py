@@ -0,0 +1,31 @@
+import pytest
+
+from hfval.names import ParameterIndex
+
+
+@pytest.fixture(scope="module")
+def parameter_names(likelihoods):
+    workspace = likelihoods[0]
+    pyhf_names = ["mu_SIG"]
+    root_names = ["mu_SIG"]
+    systs = {
+        m["name"]
+        for ch in workspace["channels"]
+        for sample in ch["samples"]
+        for m in sample["modifiers"]
+        if m["type"] != "staterror"
+    }
+    for name in sorted(systs):
+        pyhf_names.append(name)
+        root_names.append(f"alpha_{name}")
+    # Repeat the gammas to reach the size of large combinations
+    for c, ch in enumerate(workspace["channels"] * 50):
+        for i in range(len(ch["samples"][0]["data"])):
+            pyhf_names.append(f"staterror_SR_{c}_{i}")
+            root_names.append(f"gamma_stat_SR_{c}_bin_{i}")
+    return root_names[::-1], pyhf_names
+
+
+def test_parameter_index(benchmark, parameter_names):
+    index = benchmark(ParameterIndex, *parameter_names)
+    assert (index.root_to_pyhf >= 0).all()
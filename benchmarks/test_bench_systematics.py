@@ -0,0 +1,45 @@
+import numpy as np
+
+from hfval.loader import reduce_patch
+from hfval.systematics import (
+    ModifierVariations,
+    add_ops,
+    process_patch,
+    process_patches,
+    summarize_ops,
+    workspace_systs,
+)
+
+
+def test_process_patch(benchmark, likelihoods):
+    ops = [op for patch in likelihoods[1] for op in patch]
+
+    def run():
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return [process_patch(op) for op in ops]
+
+    assert len(benchmark(run)) == len(ops)
+
+
+def test_process_patches(benchmark, likelihoods):
+    data = benchmark(process_patches, likelihoods[1])
+    assert len(data) == len(likelihoods[1])
+
+
+def test_summarize_ops(benchmark, likelihoods):
+    ops = [item for patch in likelihoods[1] for item in reduce_patch(patch)]
+    assert len(benchmark(summarize_ops, ops)) == len(ops)
+
+
+def test_workspace_systs(benchmark, likelihoods):
+    result = benchmark(workspace_systs, likelihoods[0])
+    assert result.rel.shape[1] == len(likelihoods[0]["channels"])
+
+
+def test_modifier_variations(benchmark, likelihoods):
+    ops = list(add_ops(likelihoods[1]))
+
+    def run():
+        return ModifierVariations.from_ops(ops).rel_systs()
+
+    assert len(benchmark(run)) == sum(len(op["value"]["data"]) for _, op in ops)
@@ -11,6 +11,7 @@ extras_require = {
         "pytest~=6.0",
         "pytest-cov~=2.8",
         "pytest-console-scripts~=0.2",
+        "pytest-benchmark~=3.4",
         "bumpversion~=0.5",
         "flake8",
         "pre-commit",
@@ -18,8 +19,14 @@ extras_require = {
         "twine",
     ],
     "test": ["matplotlib"],
+    "minuit": ["pyhf[minuit]"],
+    "backends": ["pyhf[backends]"],
+    "fast": ["orjson"],
 }
-extras_require["complete"] = sorted(set(sum(extras_require.values(), [])))
+# The tensor backends are large and only needed for the --backend options
+extras_require["complete"] = sorted(
+    set(sum((v for k, v in extras_require.items() if k != "backends"), []))
+)
 
 setup(
     name="hfval",
@@ -42,7 +49,7 @@ setup(
     package_dir={"": "src"},
     packages=find_packages(where="src"),
     include_package_data=True,
-    install_requires=["pyhf[xmlio]>0.6.0"],
+    install_requires=["pyhf[xmlio]>=0.7.0", "click", "matplotlib", "parse", "scipy"],
     python_requires=">=3.7",
     extras_require=extras_require,
     entry_points={"console_scripts": ["pyhf-validation=hfval.commandline:hfval"]},
@@ -0,0 +1,197 @@
+"""On-disk, content-addressed cache of NumPy arrays with LRU eviction."""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 2 * 1024**3
+STATS_FILE = "stats.json"
+
+
+def default_cache_dir():
+    """``$HFVAL_CACHE_DIR``, or ``hfval`` in ``$XDG_CACHE_HOME`` (``~/.cache``)."""
+    if "HFVAL_CACHE_DIR" in os.environ:
+        return os.environ["HFVAL_CACHE_DIR"]
+    cache_home = os.environ.get(
+        "XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")
+    )
+    return os.path.join(cache_home, "hfval")
+
+
+def digest(obj, salt=""):
+    """SHA-256 hex digest of the canonical JSON serialization of ``obj``."""
+    canonical = json.dumps(obj, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256((salt + canonical).encode()).hexdigest()
+
+
+def file_identity(path):
+    """
+    Return ``[path, mtime_ns, size]`` identifying the version of a file
+    without reading it. Paths inside a tarball are identified by the tarball.
+
+    Directories are identified by the files a background is read from, see
+    :func:`hfval.loader.load_background`: ``BkgOnly.json``, or the latest
+    modification time and the total size of the files of a columnar store.
+    """
+    from .store import is_store
+
+    path = os.path.abspath(path)
+    if os.path.isdir(path) and is_store(path):
+        with os.scandir(path) as it:
+            stats = [entry.stat() for entry in it if entry.is_file()]
+        return [
+            path,
+            max(stat.st_mtime_ns for stat in stats),
+            sum(stat.st_size for stat in stats),
+        ]
+    if os.path.isdir(path):
+        path = os.path.join(path, "BkgOnly.json")
+    existing = path
+    while not os.path.exists(existing) and os.path.dirname(existing) != existing:
+        existing = os.path.dirname(existing)
+    stat = os.stat(existing)
+    return [path, stat.st_mtime_ns, stat.st_size]
+
+
+class ArrayCache:
+    """
+    Cache of dicts of arrays, stored as one ``.npz`` file per key.
+
+    The modification time of an entry is bumped whenever it is read, and the
+    least recently used entries are evicted once the cache grows beyond
+    ``max_bytes``. Hit, miss and eviction counts are accumulated across runs
+    in ``stats.json`` when the cache is closed.
+
+    Args:
+        namespace: Subdirectory of ``cache_dir`` holding the entries.
+        cache_dir: Root of the cache, :func:`default_cache_dir` by default.
+        max_bytes: Size limit of the namespace.
+    """
+
+    def __init__(self, namespace, cache_dir=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = os.path.join(cache_dir or default_cache_dir(), namespace)
+        self.max_bytes = max_bytes
+        os.makedirs(self.path, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._size = sum(size for _, _, size in self._entries())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, key):
+        return os.path.exists(self._filename(key))
+
+    def get(self, key, count=True):
+        """
+        Return the cached dict of arrays for ``key``, or ``None``.
+
+        Lookups with ``count=False`` are left out of the hit and miss counts.
+        """
+        filename = self._filename(key)
+        try:
+            with np.load(filename) as entry:
+                value = dict(entry)
+        except (OSError, ValueError):
+            self.misses += count
+            return None
+        os.utime(filename)
+        self.hits += count
+        return value
+
+    def put(self, key, arrays):
+        """Store a dict of arrays under ``key`` and evict entries if needed."""
+        filename = self._filename(key)
+        tmp_filename = f"{filename}.{os.getpid()}.tmp"
+        with open(tmp_filename, "wb") as outfile:
+            np.savez(outfile, **arrays)
+        if os.path.exists(filename):
+            self._size -= os.path.getsize(filename)
+        os.replace(tmp_filename, filename)
+        self._size += os.path.getsize(filename)
+        if self._size > self.max_bytes:
+            self.evict(self.max_bytes)
+
+    def evict(self, max_bytes):
+        """Remove the least recently used entries until at most ``max_bytes`` remain."""
+        entries = sorted(self._entries(), key=lambda entry: entry[1])
+        self._size = sum(size for _, _, size in entries)
+        for filename, _, size in entries:
+            if self._size <= max_bytes:
+                break
+            try:
+                os.remove(filename)
+            except FileNotFoundError:
+                continue
+            self._size -= size
+            self.evictions += 1
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        for filename, _, _ in self._entries():
+            os.remove(filename)
+        stats_file = os.path.join(self.path, STATS_FILE)
+        if os.path.exists(stats_file):
+            os.remove(stats_file)
+        self._size = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        """Return the statistics of the namespace, including unsaved counts."""
+        stats = _read_stats(self.path)
+        for name in ("hits", "misses", "evictions"):
+            stats[name] += getattr(self, name)
+        stats["entries"] = sum(1 for _ in self._entries())
+        stats["bytes"] = self._size
+        stats["max_bytes"] = self.max_bytes
+        return stats
+
+    def close(self):
+        """Add the counts of this session to ``stats.json``."""
+        stats = _read_stats(self.path)
+        for name in ("hits", "misses", "evictions"):
+            stats[name] += getattr(self, name)
+            setattr(self, name, 0)
+        with open(os.path.join(self.path, STATS_FILE), "w") as outfile:
+            json.dump(stats, outfile)
+
+    def _filename(self, key):
+        return os.path.join(self.path, f"{key}.npz")
+
+    def _entries(self):
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.endswith(".npz"):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    yield entry.path, stat.st_mtime, stat.st_size
+
+
+def namespaces(cache_dir=None):
+    """Return the names of the namespaces in ``cache_dir``."""
+    cache_dir = cache_dir or default_cache_dir()
+    if not os.path.isdir(cache_dir):
+        return []
+    return sorted(
+        name
+        for name in os.listdir(cache_dir)
+        if os.path.isdir(os.path.join(cache_dir, name))
+    )
+
+
+def _read_stats(path):
+    stats = {"hits": 0, "misses": 0, "evictions": 0}
+    try:
+        with open(os.path.join(path, STATS_FILE)) as infile:
+            stats.update(json.load(infile))
+    except (OSError, ValueError):
+        pass
+    return stats
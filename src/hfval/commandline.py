@@ -1,6 +1,18 @@
 import logging
 import click
 
+from .commands.compare_fitted_nuisance import compare_fitted_nuisance
+from .commands.compare_nuisance import compare_nuisance
+from .commands.convert import convert
+from .commands.export_root_fit import export_root_fit
+from .commands.limits import limits
+from .commands.profile_scan import profile_scan
+from .commands.scan import scan
+from .commands.serve import serve
+from .commands.validate_systs import validate_systs
+from .commands.validate_workspace import validate_workspace
+from .commands.worker import worker
+from .commands.xml_diff import xml_diff
 from .version import __version__
 
 logging.basicConfig()
@@ -9,5 +21,101 @@ log = logging.getLogger(__name__)
 
 @click.group(context_settings=dict(help_option_names=["-h", "--help"]))
 @click.version_option(version=__version__)
-def hfval():
-    pass
+@click.option(
+    "--profile",
+    help="Time the stages of the command, count the files, bytes, patches, figures and fits it processes, and write them as a Chrome trace-event JSON file",
+    is_flag=True,
+)
+@click.option(
+    "--profile-output",
+    help="Path of the trace written with --profile",
+    default="hfval-profile.json",
+    show_default=True,
+)
+@click.option(
+    "--profile-pstats",
+    help="With --profile, also write the cProfile statistics of each stage to {stage}.pstats files in this directory",
+    default=None,
+)
+@click.pass_context
+def hfval(ctx, profile, profile_output, profile_pstats):
+    if not profile:
+        return
+    from . import profiling
+
+    profiler = profiling.enable(pstats_dir=profile_pstats)
+
+    def finish():
+        profiler.write(profile_output)
+        profiling.disable()
+        click.echo(profiler.summary(), err=True)
+        click.echo(f"Wrote the profile to {profile_output}", err=True)
+
+    # The callbacks run in reverse order, the command stage is closed first
+    ctx.call_on_close(finish)
+    ctx.with_resource(profiling.stage(f"pyhf-validation {ctx.invoked_subcommand}"))
+
+
+hfval.add_command(validate_systs)
+hfval.add_command(validate_workspace)
+hfval.add_command(compare_nuisance)
+hfval.add_command(compare_fitted_nuisance)
+hfval.add_command(export_root_fit)
+hfval.add_command(convert)
+hfval.add_command(scan)
+hfval.add_command(profile_scan)
+hfval.add_command(limits)
+hfval.add_command(worker)
+hfval.add_command(serve)
+hfval.add_command(xml_diff)
+
+
+@hfval.group()
+def cache():
+    """Inspect and clear the on-disk caches."""
+
+
+@cache.command()
+@click.option(
+    "--cache-dir",
+    help="Root directory of the caches (defaults to $HFVAL_CACHE_DIR or ~/.cache/hfval)",
+    default=None,
+)
+def info(cache_dir):
+    """Show the size and hit statistics of the caches."""
+    from .cache import ArrayCache, default_cache_dir, namespaces
+
+    cache_dir = cache_dir or default_cache_dir()
+    names = namespaces(cache_dir)
+    if not names:
+        click.echo(f"No caches in {cache_dir}")
+        return
+    click.echo(f"Caches in {cache_dir}:")
+    for name in names:
+        stats = ArrayCache(name, cache_dir=cache_dir).stats()
+        click.echo(
+            f"  {name}: {stats['entries']} entries, {stats['bytes'] / 1024**2:.1f} MB,"
+            f" {stats['hits']} hits, {stats['misses']} misses,"
+            f" {stats['evictions']} evictions"
+        )
+
+
+@cache.command()
+@click.option(
+    "--cache-dir",
+    help="Root directory of the caches (defaults to $HFVAL_CACHE_DIR or ~/.cache/hfval)",
+    default=None,
+)
+@click.option(
+    "--namespace",
+    help="Only clear this cache, can be given multiple times (defaults to all caches)",
+    multiple=True,
+)
+def clear(cache_dir, namespace):
+    """Remove the cached entries and reset the statistics."""
+    from .cache import ArrayCache, default_cache_dir, namespaces
+
+    cache_dir = cache_dir or default_cache_dir()
+    for name in namespace or namespaces(cache_dir):
+        ArrayCache(name, cache_dir=cache_dir).clear()
+        click.echo(f"Cleared {name}")
@@ -0,0 +1 @@
+"""Subcommands of the pyhf-validation command line interface."""
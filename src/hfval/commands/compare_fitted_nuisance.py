@@ -0,0 +1,332 @@
+"""Compare the fitted nuisance parameters of a ROOT workspace and a pyhf workspace."""
+
+import click
+
+from ..fitting import BACKENDS, OPTIMIZERS
+
+
+def print_fit_summary(result, file=None):
+    converged_str = "converged" if result.converged else "NOT CONVERGED"
+    print(
+        f"pyhf fit {result.name}: backend {result.backend}, optimizer {result.optimizer},"
+        f" {result.wall_time:.3f} s, {result.n_calls} function calls, {converged_str},"
+        f" -2 log L = {result.twice_nll:.6f}\n",
+        file=file,
+    )
+
+
+def print_comparison(report, file=None):
+    """
+    Print a :class:`hfval.report.ComparisonReport` as a table.
+
+    Args:
+        report: Comparison of the fitted values.
+        file: Output stream, stdout by default.
+    """
+    param_str = "param"
+    pyhf_val_str = "pyhf val"
+    root_val_str = "root val"
+    abs_diff_str = "abs diff"
+    rel_diff_str = "% diff"
+    pull_str = "pull"
+    print(
+        f"{param_str:<42}{pyhf_val_str:<18}{root_val_str:<18}{abs_diff_str:<18}{rel_diff_str:<18}{pull_str:<12}\n",
+        file=file,
+    )
+
+    for param, pyhf_val, root_val, abs_diff, rel_diff, pull, passed in zip(
+        report.parameter.tolist(),
+        report.pyhf.tolist(),
+        report.root.tolist(),
+        report.abs_diff.tolist(),
+        report.rel_diff.tolist(),
+        report.pull.tolist(),
+        report.passed.tolist(),
+    ):
+        status = "" if passed else "FAIL"
+        print(
+            f"{param:<42}{pyhf_val:<18.6e}{root_val:<18.6e}{abs_diff:<18.6e}{100 * rel_diff:<18.6f}{pull:<12.4f}{status}",
+            file=file,
+        )
+    print(
+        f"\n{len(report) - report.n_failed} of {len(report)} parameters within tolerance",
+        file=file,
+    )
+
+
+@click.command(name="compare-fitted-nuisance")
+@click.option(
+    "--root-workspace",
+    help="The location of the root file containing the combined root workspace. Can be given multiple times, once for each pyhf workspace or patch. If left out, only the pyhf fits are run.",
+    multiple=True,
+)
+@click.option(
+    "--root-reference",
+    help="ROOT fit results exported with `pyhf-validation export-root-fit`, used instead of fitting --root-workspace. Can be given multiple times, once for each pyhf workspace or patch.",
+    multiple=True,
+)
+@click.option(
+    "--cache-dir",
+    help="Root directory of the cache of ROOT fit results, keyed by the content of the ROOT workspace file, and of the --fit-cache (defaults to $HFVAL_CACHE_DIR or ~/.cache/hfval)",
+    default=None,
+)
+@click.option(
+    "--fit-cache",
+    help="Reuse the pyhf fit results cached in --cache-dir, keyed by the workspace, interpolation codes, backend and optimizer, and warm-start the other fits from the closest cached fit",
+    is_flag=True,
+)
+@click.option(
+    "--fit-cache-size",
+    help="Size limit of the pyhf fit cache in MB, least recently used fits are evicted beyond it",
+    type=int,
+    default=1024,
+    show_default=True,
+)
+@click.option(
+    "--refit-root",
+    help="Rerun the ROOT fits even if their results are cached",
+    is_flag=True,
+)
+@click.option(
+    "--name-rules",
+    help="JSON file with a list of {pattern, name} rules translating ROOT to pyhf parameter names, tried before the default rules",
+    default=None,
+)
+@click.option(
+    "--pyhf-json",
+    help="The location of the json file containing the pyhf likelihood info, or a columnar store from 'pyhf-validation convert'. Can be given multiple times.",
+    multiple=True,
+    required=True,
+)
+@click.option(
+    "--patch",
+    "patches",
+    help="Signal patch or pyhf patchset to apply to the pyhf workspace, fitting one signal point per patch. Can be given multiple times.",
+    multiple=True,
+)
+@click.option(
+    "--warm-start",
+    help="Fit the patches incrementally: validate each model structure once and start every fit from the best fit of the previous patch, or of the background-only workspace. The patches of each worker are fitted in order, so neighbouring signal points should be given next to each other.",
+    type=click.Choice(["previous", "background"]),
+    default=None,
+)
+@click.option(
+    "--backend",
+    help="pyhf backend of the fits, run on the CPU",
+    type=click.Choice(BACKENDS),
+    default="numpy",
+    show_default=True,
+)
+@click.option(
+    "--optimizer",
+    help="pyhf optimizer of the fits",
+    type=click.Choice(OPTIMIZERS),
+    default="scipy",
+    show_default=True,
+)
+@click.option(
+    "--n-workers",
+    help="Number of processes running the pyhf fits concurrently (defaults to the number of CPUs)",
+    type=int,
+    default=None,
+)
+@click.option(
+    "--rtol",
+    help="Relative tolerance of the difference of the fitted values",
+    type=float,
+    default=1e-2,
+    show_default=True,
+)
+@click.option(
+    "--atol",
+    help="Absolute tolerance of the difference of the fitted values",
+    type=float,
+    default=1e-3,
+    show_default=True,
+)
+@click.option(
+    "--max-pull",
+    help="Parameters whose difference divided by the ROOT uncertainty is at most this value also pass",
+    type=float,
+    default=None,
+)
+@click.option(
+    "--report",
+    help="Write the comparison of all fits to this .csv, .json, .npz or .parquet (requires pyarrow) file",
+    default=None,
+)
+@click.option(
+    "--outfile",
+    help="Path to file to output nuisance parameter comparison to. Will print to screen if left blank.",
+    default="",
+)
+def compare_fitted_nuisance(
+    root_workspace,
+    root_reference,
+    cache_dir,
+    fit_cache,
+    fit_cache_size,
+    refit_root,
+    name_rules,
+    pyhf_json,
+    patches,
+    warm_start,
+    backend,
+    optimizer,
+    n_workers,
+    rtol,
+    atol,
+    max_pull,
+    report,
+    outfile,
+):
+    """
+    Fit the ROOT and pyhf workspaces and compare the fitted nuisance parameters.
+    """
+    import contextlib
+
+    from .. import profiling
+    from ..fitting import FitCache, fit_many, fit_patches_many, patched_specs
+    from ..loader import load_background, load_json, named_patches
+    from ..names import DEFAULT_RULES, ParameterIndex, load_rules
+    from ..reference import ReferenceStore, load_reference
+    from ..report import REPORT_FORMATS, ComparisonReport, Tolerance
+
+    if report and not report.lower().endswith(REPORT_FORMATS):
+        raise click.BadParameter(
+            f"expected one of the suffixes {', '.join(REPORT_FORMATS)}",
+            param_hint="--report",
+        )
+    if report and report.lower().endswith(".parquet"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise click.BadParameter(
+                "writing parquet files requires pyarrow", param_hint="--report"
+            )
+
+    if root_workspace and root_reference:
+        raise click.BadParameter(
+            "use either root workspaces or root references",
+            param_hint="--root-reference",
+        )
+
+    if patches:
+        if len(pyhf_json) != 1:
+            raise click.BadParameter(
+                "patches can only be applied to a single pyhf workspace",
+                param_hint="--patch",
+            )
+        spec = load_background(pyhf_json[0])
+        documents = [load_json(patch) for patch in patches]
+    elif warm_start:
+        raise click.BadParameter(
+            "warm starts need signal patches", param_hint="--warm-start"
+        )
+    if warm_start and fit_cache:
+        raise click.BadParameter(
+            "use either --warm-start or --fit-cache", param_hint="--fit-cache"
+        )
+    # Check the ROOT inputs before running any fit
+    n_fits = sum(1 for _ in named_patches(documents)) if patches else len(pyhf_json)
+    for option, values in [
+        ("--root-workspace", root_workspace),
+        ("--root-reference", root_reference),
+    ]:
+        if values and len(values) != n_fits:
+            raise click.BadParameter(
+                f"got {len(values)} values for {n_fits} pyhf fits",
+                param_hint=option,
+            )
+
+    # Get the pyhf fit results
+    with profiling.stage("pyhf fits"):
+        if warm_start:
+            results = list(
+                fit_patches_many(
+                    spec,
+                    documents,
+                    warm_start=warm_start,
+                    backend=backend,
+                    optimizer=optimizer,
+                    n_workers=n_workers,
+                )
+            )
+        else:
+            if patches:
+                tasks = patched_specs(spec, documents)
+            else:
+                tasks = ((path, load_background(path)) for path in pyhf_json)
+            cache = None
+            if fit_cache:
+                cache = FitCache(
+                    cache_dir=cache_dir, max_bytes=fit_cache_size * 1024**2
+                )
+            with cache or contextlib.nullcontext():
+                results = list(
+                    fit_many(
+                        tasks,
+                        backend=backend,
+                        optimizer=optimizer,
+                        n_workers=n_workers,
+                        cache=cache,
+                    )
+                )
+            if cache is not None:
+                print(f"Reused {cache.reused} of {len(results)} cached pyhf fits")
+    profiling.count("fits run", len(results))
+
+    # Compare the fitted nuisance params, and print them out, either to the specified file or to the screen
+    if outfile != "":
+        f_comp = open(outfile, "w")
+    else:
+        f_comp = None
+        print(
+            "\n\n########### Printing nuisance parameter comparisons to screen #############\n"
+        )
+
+    # Get the root fit results, only running the ROOT fits that are not stored yet
+    if root_reference:
+        root_results = [load_reference(path) for path in root_reference]
+    elif root_workspace:
+        with ReferenceStore(cache_dir=cache_dir) as store:
+            root_results = [
+                store.fit(path, refit=refit_root) for path in root_workspace
+            ]
+    else:
+        root_results = [None] * len(results)
+
+    # The parameters are indexed once for every distinct pair of parameter lists
+    rules = load_rules(name_rules) if name_rules else DEFAULT_RULES
+    tolerance = Tolerance(rtol=rtol, atol=atol, max_pull=max_pull)
+    indices = {}
+    reports = []
+    for result, root_result in zip(results, root_results):
+        print_fit_summary(result, file=f_comp)
+        if root_result is not None:
+            key = (tuple(root_result.parameters), tuple(result.parameters))
+            if key not in indices:
+                indices[key] = ParameterIndex(*key, rules=rules)
+            reports.append(
+                ComparisonReport.from_index(
+                    indices[key],
+                    result.bestfit,
+                    root_result,
+                    fit=result.name,
+                    tolerance=tolerance,
+                )
+            )
+            print_comparison(reports[-1], file=f_comp)
+            for pyhf_param in indices[key].unmatched_root():
+                print("Parameter %s missing from pyhf file" % pyhf_param)
+            print("", file=f_comp)
+
+    if report:
+        ComparisonReport.concatenate(reports).write(report)
+
+    if f_comp is None:
+        print(
+            "\n###########################################################################\n"
+        )
+    else:
+        f_comp.close()
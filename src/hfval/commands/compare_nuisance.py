@@ -0,0 +1,60 @@
+"""Compare the nuisance parameters of a ROOT workspace and a pyhf workspace."""
+
+import click
+
+
+@click.command(name="compare-nuisance")
+@click.option(
+    "--root-workspace",
+    help="The location of the root file containing the combined root workspace",
+)
+@click.option(
+    "--pyhf-json",
+    help="The location of the json file containing the pyhf likelihood info, or a columnar store from 'pyhf-validation convert'",
+)
+@click.option(
+    "--name-rules",
+    help="JSON file with a list of {pattern, name} rules translating ROOT to pyhf parameter names, tried before the default rules",
+    default=None,
+)
+def compare_nuisance(root_workspace, pyhf_json, name_rules):
+    """
+    List the nuisance parameters that only exist in either the ROOT or pyhf workspace.
+    """
+    import ROOT
+
+    from ..names import DEFAULT_RULES, ParameterIndex, load_rules
+    from ..view import WorkspaceView
+
+    # Get the root nuisance params
+    infile = ROOT.TFile.Open(root_workspace)
+    workspace = infile.Get("combined")
+    mc = workspace.obj("ModelConfig")
+
+    def exhaust_argset(s):
+        it = s.fwdIterator()
+        while True:
+            n = it.next()
+            if not n:
+                break
+            yield n
+
+    pars = [x.GetName() for x in exhaust_argset(mc.GetNuisanceParameters())] + [
+        x.GetName() for x in exhaust_argset(mc.GetParametersOfInterest())
+    ]
+
+    # Get pyhf nuisance params from the index of the workspace, without
+    # building the model
+    pyhf_pars = WorkspaceView(pyhf_json).parameter_names()
+
+    # Compare the nuisance params, translating the root names to the pyhf naming scheme
+    rules = load_rules(name_rules) if name_rules else DEFAULT_RULES
+    index = ParameterIndex(pars, pyhf_pars, rules=rules)
+
+    print("Nuisance params unique to pyhf:")
+    for param in index.unmatched_pyhf():
+        print(param)
+
+    print("\nNuisance params unique to root:")
+    for param in index.unmatched_root():
+        print(param)
@@ -0,0 +1,44 @@
+"""Convert a workspace and its signal patches into a columnar store."""
+
+import click
+
+
+@click.command(name="convert")
+@click.option(
+    "--background",
+    help="Background-only workspace, a directory containing BkgOnly.json or a path inside a tarball",
+    default="BkgOnly.json",
+    show_default=True,
+)
+@click.option(
+    "--patches",
+    help="Signal patch or patchset file, glob, directory, or tarball (optionally followed by a directory inside it). Can be given multiple times (defaults to 'patch*.json')",
+    multiple=True,
+)
+@click.option(
+    "--output",
+    help="Directory of the columnar store to write",
+    required=True,
+)
+def convert(background, patches, output):
+    """
+    Parse the JSON likelihoods once into a directory of memory-mappable arrays.
+
+    The store can be given instead of the JSON files to `validate-systs --store`
+    and as the workspace of the other commands.
+    """
+    from .. import profiling
+    from ..loader import PATCH_PATTERN, iter_documents, load_background
+    from ..store import write_store
+
+    with profiling.stage("convert"):
+        store = write_store(
+            output,
+            load_background(background),
+            iter_documents(patches or [PATCH_PATTERN]),
+        )
+    n_signal = int((store.sample_signal >= 0).sum())
+    click.echo(
+        f"Wrote {len(store) - n_signal} background and {n_signal} signal samples"
+        f" of {len(store.signals)} signal points to {output}"
+    )
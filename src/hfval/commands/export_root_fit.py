@@ -0,0 +1,82 @@
+"""Export the fit results of a ROOT workspace to a ROOT-free reference file."""
+
+import click
+
+
+@click.command(name="export-root-fit")
+@click.option(
+    "--root-workspace",
+    help="The location of the root file containing the combined root workspace",
+    required=True,
+)
+@click.option(
+    "--output",
+    help="Path of the .npz reference file to write",
+    required=True,
+)
+@click.option(
+    "--scan",
+    help="Also scan the profile likelihood of this ROOT parameter, for `pyhf-validation profile-scan --reference`. Can be given multiple times",
+    multiple=True,
+)
+@click.option(
+    "--scan-output",
+    help="Path of the .npz file of the profile likelihood scans",
+    default=None,
+)
+@click.option(
+    "--n-points",
+    help="Number of points of every scan",
+    type=int,
+    default=21,
+    show_default=True,
+)
+@click.option(
+    "--n-sigma",
+    help="Half width of the scans in units of the fitted errors",
+    type=float,
+    default=3.0,
+    show_default=True,
+)
+@click.option(
+    "--cache-dir",
+    help="Root directory of the cache of ROOT fit results (defaults to $HFVAL_CACHE_DIR or ~/.cache/hfval)",
+    default=None,
+)
+@click.option(
+    "--refit-root",
+    help="Rerun the ROOT fit even if its result is cached",
+    is_flag=True,
+)
+def export_root_fit(
+    root_workspace, output, scan, scan_output, n_points, n_sigma, cache_dir, refit_root
+):
+    """
+    Fit a ROOT workspace once and write the fitted values, errors and correlations.
+
+    The reference file can be read without ROOT, for example by
+    `pyhf-validation compare-fitted-nuisance --root-reference`.
+    """
+    from ..reference import ReferenceStore, save_reference, scan_root_workspace
+    from ..scans import save_scans
+
+    if scan and not scan_output:
+        raise click.BadParameter(
+            "the scans need an output file", param_hint="--scan-output"
+        )
+
+    with ReferenceStore(cache_dir=cache_dir) as store:
+        result = store.fit(root_workspace, refit=refit_root)
+    save_reference(output, result)
+    click.echo(
+        f"Wrote the fit results of {len(result.parameters)} parameters to {output}"
+    )
+
+    if scan:
+        scans = scan_root_workspace(
+            root_workspace, scan, n_points=n_points, n_sigma=n_sigma
+        )
+        save_scans(scan_output, scans)
+        click.echo(
+            f"Wrote the profile likelihood scans of {len(scans)} parameters to {scan_output}"
+        )
@@ -0,0 +1,374 @@
+"""Compute the CLs of every signal point and compare with published values."""
+
+import click
+
+from ..fitting import BACKENDS, OPTIMIZERS
+from ..scheduler import EXECUTORS
+
+
+@click.command(name="limits")
+@click.option(
+    "--background",
+    help="Background-only workspace, a directory containing BkgOnly.json, a path inside a tarball or a columnar store",
+    default="BkgOnly.json",
+    show_default=True,
+)
+@click.option(
+    "--patches",
+    help="Signal patch or patchset file, glob, directory, or tarball (optionally followed by a directory inside it). Can be given multiple times (defaults to 'patch*.json')",
+    multiple=True,
+)
+@click.option(
+    "--poi-value",
+    help="Signal strength the CLs are computed at",
+    type=float,
+    default=1.0,
+    show_default=True,
+)
+@click.option(
+    "--test-stat",
+    help="Test statistic of the hypothesis tests",
+    type=click.Choice(["qtilde", "q"]),
+    default="qtilde",
+    show_default=True,
+)
+@click.option(
+    "--executor",
+    help="Where the signal points are computed: a local process pool, a Dask or Ray cluster, a server started with 'pyhf-validation serve', or workers started with 'pyhf-validation worker' on a shared --queue-dir",
+    type=click.Choice(EXECUTORS),
+    default="local",
+    show_default=True,
+)
+@click.option(
+    "--address",
+    help="Address of the Dask scheduler or Ray cluster, a local cluster is started by default, or of the server, its default socket by default",
+    default=None,
+)
+@click.option(
+    "--queue-dir",
+    help="Shared directory of the queue executor",
+    default=None,
+)
+@click.option(
+    "--lease",
+    help="Seconds after which the queue executor requeues the signal points of crashed workers (never by default)",
+    type=float,
+    default=None,
+)
+@click.option(
+    "--checkpoint-dir",
+    help="Checkpoint every finished signal point in this directory and skip them when the command is rerun",
+    default=None,
+)
+@click.option(
+    "--retries",
+    help="Number of times a failed signal point is retried",
+    type=int,
+    default=2,
+    show_default=True,
+)
+@click.option(
+    "--n-workers",
+    help="Number of processes computing signal points concurrently and rendering the plots (defaults to the number of CPUs)",
+    type=int,
+    default=None,
+)
+@click.option(
+    "--backend",
+    help="pyhf backend of the fits, run on the CPU",
+    type=click.Choice(BACKENDS),
+    default="numpy",
+    show_default=True,
+)
+@click.option(
+    "--optimizer",
+    help="pyhf optimizer of the fits",
+    type=click.Choice(OPTIMIZERS),
+    default="scipy",
+    show_default=True,
+)
+@click.option(
+    "--reference",
+    help="Table of published CLs values, a .csv or .json file with a name and any of the columns cls_obs, cls_exp_m2, cls_exp_m1, cls_exp, cls_exp_p1 and cls_exp_p2 per signal point",
+    default=None,
+)
+@click.option(
+    "--rtol",
+    help="Relative tolerance of the difference to the reference CLs values",
+    type=float,
+    default=0.0,
+    show_default=True,
+)
+@click.option(
+    "--atol",
+    help="Absolute tolerance of the difference to the reference CLs values",
+    type=float,
+    default=0.01,
+    show_default=True,
+)
+@click.option(
+    "--output",
+    help="Write the CLs values of all signal points to this .csv or .json table, which can be used as a --reference",
+    default=None,
+)
+@click.option(
+    "--signal-template",
+    help="Signal name template, with signal masses as variables, like for validate-systs. Plots the CLs over the mass plane, and their differences to the reference",
+    default=None,
+)
+@click.option(
+    "--x-var",
+    help="Which variable from the signal name template to plot on the x axis",
+    default="a",
+    show_default=True,
+)
+@click.option(
+    "--y-var",
+    help="Which variable from the signal name template to plot on the y axis",
+    default="b",
+    show_default=True,
+)
+@click.option(
+    "--x-label",
+    help="x label of the mass plane plots",
+    default=None,
+)
+@click.option(
+    "--y-label",
+    help="y label of the mass plane plots",
+    default=None,
+)
+@click.option(
+    "--output-format",
+    help="Write the plots as separate png files, a single multi-page pdf or png files with an html index",
+    type=click.Choice(["png", "pdf", "html"]),
+    default="png",
+    show_default=True,
+)
+@click.option(
+    "--grid-resolution",
+    help="Number of points along each axis of the grid the CLs are interpolated on",
+    type=int,
+    default=100,
+    show_default=True,
+)
+def limits(
+    background,
+    patches,
+    poi_value,
+    test_stat,
+    executor,
+    address,
+    queue_dir,
+    lease,
+    checkpoint_dir,
+    retries,
+    n_workers,
+    backend,
+    optimizer,
+    reference,
+    rtol,
+    atol,
+    output,
+    signal_template,
+    x_var,
+    y_var,
+    x_label,
+    y_label,
+    output_format,
+    grid_resolution,
+):
+    """
+    Compute the observed and expected CLs of every signal point.
+
+    Every signal patch is applied to the background-only workspace, which is
+    loaded once per worker process, and the points are computed in a process
+    pool, or by any other executor of 'pyhf-validation scan'. Finished points
+    are checkpointed, so an interrupted run resumes where it stopped. The CLs
+    values are compared with a reference table of published values, and with
+    --signal-template plotted over the mass plane together with their
+    differences to the reference.
+    """
+    import os
+
+    import numpy as np
+
+    from .. import profiling
+    from ..cache import digest, file_identity
+    from ..limits import (
+        TABLE_FORMATS,
+        compare_limits,
+        hypotest_patch,
+        limit_records,
+        load_table,
+        write_table,
+    )
+    from ..loader import PATCH_PATTERN, iter_documents, named_patches
+    from ..scheduler import Scheduler, make_executor
+
+    for option, path in [("--reference", reference), ("--output", output)]:
+        if path and not path.lower().endswith(TABLE_FORMATS):
+            raise click.BadParameter(
+                f"expected one of the suffixes {', '.join(TABLE_FORMATS)}",
+                param_hint=option,
+            )
+    if executor == "queue" and queue_dir is None:
+        raise click.BadParameter(
+            "the queue executor needs a queue directory", param_hint="--queue-dir"
+        )
+
+    background = os.path.abspath(background)
+    # The workspace, the patch and the settings are part of the keys, so
+    # checkpoints of other inputs are not reused
+    identity = tuple(file_identity(background))
+    tasks = [
+        (
+            (
+                name,
+                identity,
+                digest(ops, salt="patch"),
+                poi_value,
+                test_stat,
+                backend,
+                optimizer,
+            ),
+            (name, background, ops, poi_value, test_stat, backend, optimizer),
+        )
+        for name, ops in named_patches(iter_documents(patches or [PATCH_PATTERN]))
+    ]
+    names = [key[0] for key, _ in tasks]
+    if len(set(names)) != len(names):
+        raise click.BadParameter("signal points must be unique", param_hint="--patches")
+
+    runner = make_executor(
+        executor,
+        n_workers=n_workers,
+        address=address,
+        queue_dir=queue_dir,
+        lease=lease,
+    )
+    scheduler = Scheduler(
+        hypotest_patch,
+        executor=runner,
+        checkpoint_dir=checkpoint_dir,
+        retries=retries,
+    )
+    try:
+        with profiling.stage("limits"):
+            results = [result for _, result in scheduler.run(tasks)]
+    finally:
+        runner.close()
+    click.echo(
+        f"{len(results)} of {len(tasks)} signal points finished,"
+        f" {scheduler.n_resumed} from checkpoints"
+    )
+    for result in results:
+        click.echo(
+            f"{result.name}\tCLs obs {result.cls_obs:.4f}"
+            f"\texp {result.cls_exp[2]:.4f}"
+        )
+    if output and results:
+        write_table(output, limit_records(results))
+
+    comparisons = []
+    if reference:
+        table = load_table(reference)
+        comparisons = compare_limits(results, table, rtol=rtol, atol=atol)
+        failed = [c for c in comparisons if not c.passed]
+        compared = {c.name for c in comparisons}
+        click.echo(
+            f"{len(failed)} of {len(comparisons)} CLs values of {len(compared)}"
+            f" signal points differ from {reference}"
+        )
+        for c in failed:
+            click.echo(
+                f"  {c.name} {c.column}: {c.value:.4f} instead of {c.reference:.4f}"
+            )
+        missing = [name for name in table if name not in names]
+        if missing:
+            click.echo(f"{len(missing)} signal points of {reference} are missing")
+
+    if signal_template and len(results) >= 3:
+        from ..interpolate import MassPlaneInterpolator, mass_points
+        from ..render import ContourJob, render
+
+        masses = mass_points(
+            [result.name for result in results], signal_template, x_var, y_var
+        )
+        records = {record["name"]: record for record in limit_records(results)}
+        differences = {(c.name, c.column): c for c in comparisons}
+        maps = [("cls_obs", "CLs (observed)", None)]
+        if reference:
+            maps += [
+                ("cls_obs", "CLs (observed) - reference", "difference"),
+                ("cls_exp", "CLs (expected) - reference", "difference"),
+            ]
+
+        values = np.full((len(results), len(maps)), np.nan)
+        failed = np.zeros(values.shape, dtype=bool)
+        for i, result in enumerate(results):
+            for j, (column, _, kind) in enumerate(maps):
+                if kind is None:
+                    values[i, j] = records[result.name][column]
+                elif (result.name, column) in differences:
+                    c = differences[result.name, column]
+                    values[i, j] = c.difference
+                    failed[i, j] = not c.passed
+        selected = ~np.isnan(values)
+        interpolator = MassPlaneInterpolator(masses, resolution=grid_resolution)
+        z = interpolator(np.where(selected, values, 0.0), selected)
+
+        def contour_jobs():
+            x_min, y_min = masses.min(axis=0)
+            x_max, y_max = masses.max(axis=0)
+            for j, (column, title, kind) in enumerate(maps):
+                if not selected[:, j].any():
+                    continue
+                if kind is None:
+                    vmin, vmax = 0.0, 1.0
+                else:
+                    vmax = max(np.abs(values[selected[:, j], j]).max(), atol, 1e-6)
+                    vmin = -vmax
+                yield ContourJob(
+                    filename=f"limits_{column}{'_delta' if kind else ''}.png",
+                    title=title,
+                    x=interpolator.x,
+                    y=interpolator.y,
+                    z=z[j],
+                    points=np.stack(
+                        [
+                            masses[selected[:, j], 0],
+                            masses[selected[:, j], 1],
+                            values[selected[:, j], j],
+                        ]
+                    ),
+                    outliers=np.stack(
+                        [
+                            masses[failed[:, j], 0],
+                            masses[failed[:, j], 1],
+                            np.abs(values[failed[:, j], j]),
+                        ]
+                    ),
+                    vmin=vmin,
+                    vmax=vmax,
+                    xlim=(x_min - 25, x_max + 25),
+                    ylim=(y_min - 25, y_max + 25),
+                    xlabel=x_label,
+                    ylabel=y_label,
+                    zlabel=title,
+                )
+
+        render(
+            contour_jobs(),
+            output_dir="Plots",
+            output_format=output_format,
+            name="limits",
+            n_workers=n_workers,
+        )
+
+    if scheduler.failed:
+        for key, error in scheduler.failed.items():
+            click.echo(f"{key[0]} failed after {retries} retries:\n{error}", err=True)
+        raise click.ClickException(f"{len(scheduler.failed)} signal points failed")
+    if any(not c.passed for c in comparisons):
+        raise click.ClickException(f"CLs values differ from {reference}")
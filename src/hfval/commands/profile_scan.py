@@ -0,0 +1,227 @@
+"""Scan the profile likelihood of pyhf models and compare with reference scans."""
+
+import click
+
+from ..fitting import BACKENDS, OPTIMIZERS
+
+
+@click.command(name="profile-scan")
+@click.option(
+    "--pyhf-json",
+    help="The location of the json file containing the pyhf likelihood info, or a columnar store from 'pyhf-validation convert'",
+    default="BkgOnly.json",
+    show_default=True,
+)
+@click.option(
+    "--patch",
+    help="Signal patch to apply to the pyhf workspace",
+    default=None,
+)
+@click.option(
+    "--channel",
+    "channels",
+    help="Only fit this channel, parsing only the selected channels of the workspace. Can be given multiple times (defaults to all channels)",
+    multiple=True,
+)
+@click.option(
+    "--parameter",
+    help="Scan this pyhf parameter, a component of a parameter with several components is named like 'staterror_SR_0'. Can be given multiple times (defaults to the parameter of interest)",
+    multiple=True,
+)
+@click.option(
+    "--all-parameters",
+    help="Scan every parameter that is not fixed",
+    is_flag=True,
+)
+@click.option(
+    "--n-points",
+    help="Number of points of every scan",
+    type=int,
+    default=21,
+    show_default=True,
+)
+@click.option(
+    "--n-sigma",
+    help="Half width of the scans of constrained parameters in units of their constraint width, unconstrained parameters are scanned between their bounds",
+    type=float,
+    default=3.0,
+    show_default=True,
+)
+@click.option(
+    "--reference",
+    help="Reference scans, for example exported from ROOT with `pyhf-validation export-root-fit --scan`. The parameters of the reference are scanned at its values instead of --parameter",
+    default=None,
+)
+@click.option(
+    "--name-rules",
+    help="JSON file with a list of {pattern, name} rules translating ROOT to pyhf parameter names, tried before the default rules",
+    default=None,
+)
+@click.option(
+    "--tolerance",
+    help="Largest allowed difference of twice the negative log-likelihood relative to its minimum between the scans and the reference",
+    type=float,
+    default=0.1,
+    show_default=True,
+)
+@click.option(
+    "--backend",
+    help="pyhf backend of the fits, run on the CPU",
+    type=click.Choice(BACKENDS),
+    default="numpy",
+    show_default=True,
+)
+@click.option(
+    "--optimizer",
+    help="pyhf optimizer of the fits",
+    type=click.Choice(OPTIMIZERS),
+    default="scipy",
+    show_default=True,
+)
+@click.option(
+    "--n-workers",
+    help="Number of processes scanning parameters concurrently (defaults to the number of CPUs)",
+    type=int,
+    default=None,
+)
+@click.option(
+    "--output",
+    help="Write the scans to this .npz file, which can be used as a --reference",
+    default=None,
+)
+@click.option(
+    "--report",
+    help="Write the comparison of every scan point with the reference to this .csv or .json file",
+    default=None,
+)
+def profile_scan(
+    pyhf_json,
+    patch,
+    channels,
+    parameter,
+    all_parameters,
+    n_points,
+    n_sigma,
+    reference,
+    name_rules,
+    tolerance,
+    backend,
+    optimizer,
+    n_workers,
+    output,
+    report,
+):
+    """
+    Scan the profile likelihood of parameters of a pyhf workspace.
+
+    At every point of a scan the parameter is fixed and the others are fitted,
+    starting from the fit of the neighbouring point, and different parameters
+    are scanned in parallel. With a reference, the scans are compared point by
+    point relative to their minima, reporting the largest deviation of each
+    parameter.
+    """
+    import jsonpatch
+    import numpy as np
+
+    from ..loader import load_background, load_json
+    from ..names import DEFAULT_RULES, ParameterIndex, load_rules
+    from ..view import WorkspaceView, prune_channels
+    from ..scans import (
+        SCAN_FORMATS,
+        compare_scan,
+        load_scans,
+        save_scans,
+        scan_grid,
+        scan_parameters,
+        write_comparisons,
+    )
+
+    if report and not reference:
+        raise click.BadParameter("reports need a --reference", param_hint="--report")
+    if report and not report.lower().endswith(SCAN_FORMATS):
+        raise click.BadParameter(
+            f"expected one of the suffixes {', '.join(SCAN_FORMATS)}",
+            param_hint="--report",
+        )
+    if reference and (parameter or all_parameters):
+        raise click.BadParameter(
+            "the reference defines the scanned parameters", param_hint="--parameter"
+        )
+
+    try:
+        if channels and not patch:
+            spec = WorkspaceView(pyhf_json).spec(channels)
+        else:
+            spec = load_background(pyhf_json)
+        if patch:
+            # The patch ops address the channels of the full workspace
+            spec = jsonpatch.apply_patch(spec, load_json(patch))
+            if channels:
+                spec = prune_channels(spec, channels)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="--channel")
+
+    references = {}
+    unmatched = []
+
+    def grids(model, bestfit):
+        names = bestfit.parameters
+        if reference:
+            scans = load_scans(reference)
+            rules = load_rules(name_rules) if name_rules else DEFAULT_RULES
+            index = ParameterIndex([scan.parameter for scan in scans], names, rules)
+            for scan, position in zip(scans, index.root_to_pyhf.tolist()):
+                if position < 0:
+                    unmatched.append(scan.parameter)
+                else:
+                    references[names[position]] = scan
+            return {name: scan.values for name, scan in references.items()}
+        if all_parameters:
+            fixed = model.config.suggested_fixed()
+            selected = [name for name, f in zip(names, fixed) if not f]
+        else:
+            selected = list(parameter) or [model.config.poi_name]
+        for name in selected:
+            if name not in names:
+                raise click.BadParameter(
+                    f"unknown parameter {name}", param_hint="--parameter"
+                )
+        return {
+            name: scan_grid(
+                model, bestfit.bestfit, names.index(name), n_points, n_sigma
+            )
+            for name in selected
+        }
+
+    bestfit, scans = scan_parameters(
+        spec, grids, backend=backend, optimizer=optimizer, n_workers=n_workers
+    )
+    click.echo(f"Best fit twice NLL {bestfit.twice_nll:.6f}")
+    if output:
+        save_scans(output, scans)
+
+    comparisons = []
+    for scan in scans:
+        status = "" if scan.converged.all() else "  not converged"
+        if scan.parameter not in references:
+            click.echo(f"{scan.parameter}: {len(scan.values)} points{status}")
+            continue
+        comparison = compare_scan(scan, references[scan.parameter])
+        comparisons.append(comparison)
+        deviation = np.nan_to_num(np.abs(comparison.difference), nan=np.inf)
+        worst = int(deviation.argmax()) if len(scan.values) else 0
+        flag = "  FAILED" if not comparison.max_deviation <= tolerance else ""
+        click.echo(
+            f"{scan.parameter}: max deviation {comparison.max_deviation:.6g}"
+            f" at {comparison.values[worst]:.6g}{status}{flag}"
+        )
+    for name in unmatched:
+        click.echo(f"Parameter {name} missing from pyhf file")
+
+    if report:
+        write_comparisons(report, comparisons)
+    failed = [c for c in comparisons if not c.max_deviation <= tolerance]
+    if failed:
+        raise click.ClickException(
+            f"{len(failed)} of {len(comparisons)} scans deviate from {reference}"
+        )
@@ -0,0 +1,174 @@
+"""Fit every signal point of a scan through a fault-tolerant scheduler."""
+
+import click
+
+from ..fitting import BACKENDS, OPTIMIZERS
+from ..scheduler import EXECUTORS
+
+
+@click.command(name="scan")
+@click.option(
+    "--background",
+    help="Background-only workspace, a directory containing BkgOnly.json, a path inside a tarball or a columnar store. Must be readable by every worker.",
+    default="BkgOnly.json",
+    show_default=True,
+)
+@click.option(
+    "--patches",
+    help="Signal patch or patchset file, glob, directory, or tarball (optionally followed by a directory inside it). Can be given multiple times (defaults to 'patch*.json')",
+    multiple=True,
+)
+@click.option(
+    "--executor",
+    help="Where the fits run: a local process pool, a Dask or Ray cluster, a server started with 'pyhf-validation serve', or workers started with 'pyhf-validation worker' on a shared --queue-dir",
+    type=click.Choice(EXECUTORS),
+    default="local",
+    show_default=True,
+)
+@click.option(
+    "--address",
+    help="Address of the Dask scheduler or Ray cluster, a local cluster is started by default, or of the server, its default socket by default",
+    default=None,
+)
+@click.option(
+    "--queue-dir",
+    help="Shared directory of the queue executor",
+    default=None,
+)
+@click.option(
+    "--lease",
+    help="Seconds after which the queue executor requeues the fits of crashed workers (never by default)",
+    type=float,
+    default=None,
+)
+@click.option(
+    "--checkpoint-dir",
+    help="Checkpoint every finished fit in this directory and skip them when the scan is rerun",
+    default=None,
+)
+@click.option(
+    "--retries",
+    help="Number of times a failed fit is retried",
+    type=int,
+    default=2,
+    show_default=True,
+)
+@click.option(
+    "--n-workers",
+    help="Number of local worker processes (defaults to the number of CPUs)",
+    type=int,
+    default=None,
+)
+@click.option(
+    "--backend",
+    help="pyhf tensor backend of the fits",
+    type=click.Choice(BACKENDS),
+    default="numpy",
+    show_default=True,
+)
+@click.option(
+    "--optimizer",
+    help="pyhf optimizer of the fits",
+    type=click.Choice(OPTIMIZERS),
+    default="scipy",
+    show_default=True,
+)
+@click.option(
+    "--output",
+    help="Write the merged fit results of all signal points to this JSON file",
+    default=None,
+)
+def scan(
+    background,
+    patches,
+    executor,
+    address,
+    queue_dir,
+    lease,
+    checkpoint_dir,
+    retries,
+    n_workers,
+    backend,
+    optimizer,
+    output,
+):
+    """
+    Fit the background-only workspace patched with every signal patch.
+
+    Each signal point is a task, retried when it fails and checkpointed when
+    it finishes, so a crashed scan resumes where it stopped.
+    """
+    import json
+    import os
+
+    from .. import profiling
+    from ..cache import digest, file_identity
+    from ..fitting import fit_patch
+    from ..loader import PATCH_PATTERN, iter_documents, named_patches
+    from ..scheduler import Scheduler, make_executor
+
+    if executor == "queue" and queue_dir is None:
+        raise click.BadParameter(
+            "the queue executor needs a queue directory", param_hint="--queue-dir"
+        )
+
+    background = os.path.abspath(background)
+    # The workspace, the patch and the settings are part of the keys, so
+    # checkpoints of other inputs are not reused
+    identity = tuple(file_identity(background))
+    tasks = [
+        (
+            (name, identity, digest(ops, salt="patch"), backend, optimizer),
+            (name, background, ops, backend, optimizer),
+        )
+        for name, ops in named_patches(iter_documents(patches or [PATCH_PATTERN]))
+    ]
+    names = [key[0] for key, _ in tasks]
+    if len(set(names)) != len(names):
+        raise click.BadParameter("signal points must be unique", param_hint="--patches")
+
+    runner = make_executor(
+        executor,
+        n_workers=n_workers,
+        address=address,
+        queue_dir=queue_dir,
+        lease=lease,
+    )
+    scheduler = Scheduler(
+        fit_patch, executor=runner, checkpoint_dir=checkpoint_dir, retries=retries
+    )
+    try:
+        with profiling.stage("scan"):
+            results = scheduler.run(tasks)
+    finally:
+        runner.close()
+
+    click.echo(
+        f"{len(results)} of {len(tasks)} fits finished,"
+        f" {scheduler.n_resumed} from checkpoints"
+    )
+    for key, result in results:
+        status = "" if result.converged else "  not converged"
+        click.echo(f"{key[0]}\t{result.twice_nll:.6f}{status}")
+
+    if output:
+        records = [
+            {
+                "name": key[0],
+                "twice_nll": result.twice_nll,
+                "converged": result.converged,
+                "wall_time": result.wall_time,
+                "n_calls": result.n_calls,
+                "backend": result.backend,
+                "optimizer": result.optimizer,
+                "bestfit": dict(zip(result.parameters, result.bestfit.tolist())),
+            }
+            for key, result in results
+        ]
+        with open(output, "w") as outfile:
+            json.dump(records, outfile, indent=1)
+
+    if scheduler.failed:
+        for key, error in scheduler.failed.items():
+            click.echo(f"{key[0]} failed after {retries} retries:\n{error}", err=True)
+        raise click.ClickException(f"{len(scheduler.failed)} fits failed")
@@ -0,0 +1,73 @@
+"""Serve fits and hypothesis tests from a long-lived process caching models."""
+
+import click
+
+
+@click.command(name="serve")
+@click.option(
+    "--address",
+    help="Unix socket to listen on, or an http://127.0.0.1:PORT URL (defaults to serve.sock in the cache directory)",
+    default=None,
+)
+@click.option(
+    "--max-models",
+    help="Number of patched workspace models kept in memory",
+    type=int,
+    default=32,
+    show_default=True,
+)
+@click.option(
+    "--status",
+    "show_status",
+    help="Print the status of the running server instead of starting one",
+    is_flag=True,
+)
+@click.option(
+    "--stop",
+    help="Stop the running server instead of starting one",
+    is_flag=True,
+)
+def serve(address, max_models, show_status, stop):
+    """
+    Keep pyhf imported and the models of patched workspaces cached.
+
+    Run 'pyhf-validation scan' or 'pyhf-validation limits' with '--executor
+    server' to compute their signal points in the server. Repeated runs on the
+    same workspaces then skip the imports and the model building. The server
+    computes one signal point at a time, so grids that are not cached yet run
+    faster with the default local executor.
+    """
+    if show_status or stop:
+        from ..server import Client
+
+        client = Client(address)
+        try:
+            status = client.call("shutdown" if stop else "status")
+        except OSError as error:
+            raise click.ClickException(
+                f"No server is listening on {client.address}: {error}"
+            )
+        for key, value in status.items():
+            click.echo(f"{key}: {value}")
+        if stop:
+            click.echo(f"Stopped the server on {client.address}")
+        return
+
+    import os
+
+    from ..server import default_address, make_server
+
+    address = address or default_address()
+    try:
+        server = make_server(address, max_models=max_models)
+    except (OSError, RuntimeError, ValueError) as error:
+        raise click.ClickException(str(error))
+    click.echo(f"Serving on {address}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if not address.startswith("http://") and os.path.exists(address):
+            os.unlink(address)
@@ -0,0 +1,366 @@
+"""
+Date:     200325
+History:
+  - Originally written as a python notebook by Lukas Heinrich
+  - Adapted for the 3L-RJ likelihood validation by Giordon Stark (https://github.com/kratsg/3L-RJ-mimic-likelihood-validation/blob/master/OutlierPlot.ipynb)
+  - Adapted and generalized to script by Danika MacDonell [March 25, 2020]
+
+  - Moved into the pyhf-validation command line interface as `pyhf-validation validate-systs`
+
+Details:  Command to visualize the relative size of the systematics for pyhf likelihoods at each mass point, where the systematics are added together in quadrature. Should be run in a directory containing the background-only json likelihood file, along with a patch json likelihood file for each signal point.
+
+The background-only file and the patches can also be given explicitly with --background and --patches, which accept gzipped json files, pyhf patchsets and paths inside a tarball (e.g. likelihoods.tar.gz/RegionA) that are read without extracting them. The patch files are parsed and the plots are rendered in parallel by --n_workers processes. With --output_format pdf or html, the plots are collected in a single multi-page pdf or an html index per plot type.
+
+With --cache_dir, the per-patch summaries are cached on disk keyed by a content hash of each patch op, so that reruns only recompute new or changed signal points. Use `pyhf-validation cache info` and `pyhf-validation cache clear` to inspect and clear the cache.
+
+With --store, the background and the patches are read from a columnar store written by `pyhf-validation convert` instead, which skips parsing the JSON files.
+
+The relative syst sizes of every bin are linearly interpolated over the mass plane on a --grid_resolution x --grid_resolution grid, leaving out the points with zero relative syst in that bin.
+
+The patches are summarized in batches and streamed through the plots, so memory use does not grow with the number of signal points. The per-bin relative syst sizes of every signal point are appended to a columnar log in --summary_log (raw .bin column files, read back with hfval.outliers.read_summary_log), and only the --top_k outliers above --outlier_threshold with the largest nominal yield are listed, overall and for each channel.
+
+Usage:
+>> pyhf-validation validate-systs --signal_template <signal_template_{a}_{b}_{c}_for_masses> --x_var <which variable in signal name template to plot on x axis (defaults to 'a')> --y_var <which variable in signal name template to plot on x axis (defaults to 'b')> --v_max <max colourbar amplitude> --x_label <x axis label> --y_label <y axis label>
+
+Example for 1Lbb Wh analysis (https://glance.cern.ch/atlas/analysis/analyses/details.php?id=2969):
+
+>> pyhf-validation validate-systs --signal_template C1N2_Wh_hbb_{a}_{b} --x_var a --y_var b --v_max 10 --x_label '$m(\tilde{\\chi}_{1}^{\\pm}/\tilde{\\chi}_{2}^{0})$ [GeV]' --y_label '$m(\tilde{\\chi}_{1}^{0})$ [GeV]'
+
+The signal template is the name of an arbitrary signal in the json patch files, with the signal masses left as {}. Given a background-only file and a patch file, the signal name can be found under "samples" in the output of:
+>> jsonpatch BkgOnly.json patch_XXX.json | pyhf inspect
+
+If, for example, one of the signals is called C1N2_Wh_hbb_550_200, where 550 and 200 are the variable model masses, the signal template would be C1N2_Wh_hbb_{}_{}.
+
+"""
+
+import os
+
+import click
+
+
+def rel_syst_jobs(summaries, channel_names):
+    import numpy as np
+
+    from ..render import BarJob
+
+    for (signal_name, path), summary in summaries:
+        channel_name = channel_names[path]
+        sys_names = summary["histo_names"].tolist() + summary["norm_names"].tolist()
+
+        for iBin in range(len(summary["nom"])):
+            bin_number = iBin + 1
+            rel_size = np.concatenate(
+                (summary["histo_rel_size"][:, iBin], summary["norm_rel_size"][:, iBin])
+            )
+            # Select for relative systematics above 0.5 (i.e. >50% variation from nominal)
+            selected = (rel_size > 0.5) & (np.isfinite(rel_size))
+
+            # Only make a plot if there are any relative systematics above 0.5
+            if selected.any():
+                yield BarJob(
+                    filename=f"rel_systs_{signal_name}_{channel_name}_bin{bin_number}.png",
+                    title=f"{signal_name}: {channel_name} (Bin {bin_number}), Norm & Histo",
+                    labels=[sys_names[idx] for idx in np.flatnonzero(selected)],
+                    values=rel_size[selected],
+                    ylabel="Relative Syst Size",
+                )
+
+
+@click.command(name="validate-systs")
+@click.option(
+    "--signal_template",
+    help="Signal name template, with signal masses as variables. Signal masses must be denoted by {a}, {b}, {c}, ... (eg. signal_{a}_{b}_more_info)",
+)
+@click.option(
+    "--x_var",
+    help="Which variable from the signal name template to plot on the x axis (defaults to 'a')",
+    default="a",
+    required=False,
+)
+@click.option(
+    "--y_var",
+    help="Which variable from the signal name template to plot on the y axis (defaults to 'b')",
+    default="b",
+    required=False,
+)
+@click.option(
+    "--v_max",
+    help="Maximum amplitude of the colourbar for plotting interpolated relative syst sizes",
+    default=10,
+    required=False,
+)
+@click.option(
+    "--x_label",
+    help="x label for interpolated plot of relative systematics",
+    default=None,
+    required=False,
+)
+@click.option(
+    "--y_label",
+    help="y label for interpolated plot of relative systematics",
+    default=None,
+    required=False,
+)
+@click.option(
+    "--background",
+    help="Background-only workspace, a directory containing BkgOnly.json or a path inside a tarball (defaults to 'BkgOnly.json')",
+    default="BkgOnly.json",
+    required=False,
+)
+@click.option(
+    "--patches",
+    help="Signal patch or patchset file, glob, directory, or tarball (optionally followed by a directory inside it). Can be given multiple times (defaults to 'patch*.json')",
+    multiple=True,
+    required=False,
+)
+@click.option(
+    "--store",
+    help="Columnar store written by 'pyhf-validation convert', read instead of the background and patch files",
+    default=None,
+    required=False,
+)
+@click.option(
+    "--n_workers",
+    help="Number of processes parsing the patch files and rendering the plots (defaults to the number of CPUs)",
+    type=int,
+    default=None,
+    required=False,
+)
+@click.option(
+    "--output_format",
+    help="Write the plots as separate png files, a single multi-page pdf per plot type or png files with an html index (defaults to 'png')",
+    type=click.Choice(["png", "pdf", "html"]),
+    default="png",
+    required=False,
+)
+@click.option(
+    "--cache_dir",
+    help="Cache the per-patch summaries in this directory, keyed by the content of the patches, so that reruns only recompute new or changed signal points, and the channel index of the background-only workspace (disabled by default)",
+    default=None,
+    required=False,
+)
+@click.option(
+    "--cache_size",
+    help="Size limit of the cache in MB, least recently used summaries are evicted beyond it (defaults to 2048)",
+    type=int,
+    default=2048,
+    required=False,
+)
+@click.option(
+    "--outlier_threshold",
+    help="Bins with a relative syst size above this value are outliers (defaults to 1.0)",
+    type=float,
+    default=1.0,
+    required=False,
+)
+@click.option(
+    "--top_k",
+    help="Number of outliers with the largest nominal yield listed overall and for each channel (defaults to 50)",
+    type=int,
+    default=50,
+    required=False,
+)
+@click.option(
+    "--summary_log",
+    help="Directory of the columnar log of the per-bin relative syst sizes of every signal point (defaults to 'Plots/summaries')",
+    default=os.path.join("Plots", "summaries"),
+    required=False,
+)
+@click.option(
+    "--grid_resolution",
+    help="Number of points along each axis of the grid the relative syst sizes are interpolated on (defaults to 100)",
+    type=int,
+    default=100,
+    required=False,
+)
+def validate_systs(
+    signal_template,
+    v_max,
+    x_var,
+    y_var,
+    x_label,
+    y_label,
+    background,
+    patches,
+    store,
+    n_workers,
+    output_format,
+    cache_dir,
+    cache_size,
+    outlier_threshold,
+    top_k,
+    summary_log,
+    grid_resolution,
+):
+    """
+    Plot the relative size of the systematics of the signal patches over the mass plane.
+    """
+    import contextlib
+
+    import numpy as np
+
+    from .. import profiling
+    from ..cache import ArrayCache
+    from ..interpolate import MassPlaneInterpolator, mass_points
+    from ..loader import (
+        CHANNEL_FIELDS,
+        PATCH_PATTERN,
+        channel_name,
+        channel_nbins,
+        iter_patch_ops,
+        load_background,
+    )
+    from ..outliers import OutlierTracker, SummaryLog
+    from ..render import ContourJob, render
+    from ..store import ColumnarStore
+    from ..systematics import iter_summaries
+    from ..view import WorkspaceView
+
+    # Parse the background-only workspace exactly once, keeping only the
+    # channel names and bin counts
+    with profiling.stage("load background"):
+        if store is not None:
+            store = ColumnarStore(store)
+            spec_bkg = {"channels": [{"name": name} for name in store.channels]}
+            nbins_bkg = store.channel_nbins()
+        elif cache_dir is not None:
+            # The index of an unchanged background is read from the cache
+            with ArrayCache("workspace_index", cache_dir=cache_dir) as index_cache:
+                view = WorkspaceView(background, cache=index_cache)
+            spec_bkg = {"channels": [{"name": name} for name in view.channels]}
+            nbins_bkg = view.channel_nbins()
+        else:
+            spec_bkg = load_background(background, fields=CHANNEL_FIELDS)
+            nbins_bkg = channel_nbins(spec_bkg)
+
+    # Only recompute the summaries of new or changed patch ops, the summaries
+    # of a store are cheaper to recompute than to look up
+    if store is None:
+        ops = iter_patch_ops(patches or [PATCH_PATTERN], n_workers=n_workers)
+    else:
+        cache_dir = None
+    if cache_dir is None:
+        cache = contextlib.nullcontext()
+    else:
+        cache = ArrayCache(
+            "systematics", cache_dir=cache_dir, max_bytes=cache_size * 1024**2
+        )
+
+    # Stream the summaries through the plots, the outlier selection and the
+    # on-disk log, without holding all of them in memory
+    tracker = OutlierTracker(threshold=outlier_threshold, k=top_k)
+    channel_names = {}
+    n_summaries = 0
+    with cache, SummaryLog(summary_log) as log:
+
+        def summaries():
+            nonlocal n_summaries
+            if store is not None:
+                results = store.iter_summaries()
+            else:
+                results = iter_summaries(
+                    ops, cache=cache if cache_dir is not None else None
+                )
+            for (signal, path), summary in results:
+                n_summaries += 1
+                if path not in channel_names:
+                    channel_names[path] = channel_name(spec_bkg, path)
+                log.append(signal, path, summary["rel"], summary["nom"])
+                tracker.update(signal, path, summary["rel"], summary["nom"])
+                yield (signal, path), summary
+
+        # Make plots of relative syst for each signal point and bin
+        render(
+            rel_syst_jobs(summaries(), channel_names),
+            output_dir="Plots",
+            output_format=output_format,
+            name="rel_systs",
+            n_workers=n_workers,
+        )
+        if cache_dir is not None:
+            print(f"Reused {cache.hits} of {n_summaries} cached patch summaries")
+
+        # Channel paths in the order they first appear in the patches
+        channels_json = log.paths
+        channel_bins = {path: nbins_bkg[name] for path, name in channel_names.items()}
+
+        print(f"Outliers (> {outlier_threshold}):")
+        for o in tracker.overall.items():
+            print("\t", o.nom, o.rel, o.signal, channel_names[o.path], o.bin)
+        n_more = tracker.overall.count - len(tracker.overall.items())
+        if n_more:
+            print(f"\t... and {n_more} more")
+        for path, top in tracker.by_channel.items():
+            print(f"Outliers in {channel_names[path]}: {top.count}")
+            for o in top.items():
+                print("\t", o.nom, o.rel, o.signal, o.bin)
+        """
+        missing_signal = []
+        # missing signal in signal region
+        print("Missing signal in signal region:")
+        for k, v in data.items():
+            if not '/channels/2/samples/5' in v or not '/channels/2/samples/5' in v:
+                missing_signal.append(k)
+                print('\t',k)
+        """
+
+        def contour_jobs():
+            masses = mass_points(log.signals, signal_template, x_var, y_var)
+            x_min, y_min = masses.min(axis=0)
+            x_max, y_max = masses.max(axis=0)
+            interpolator = MassPlaneInterpolator(masses, resolution=grid_resolution)
+            for channel in channels_json:
+                rel_systs = log.channel(channel, channel_bins[channel])
+                # Remove any points with zero relative syst, separately for each bin
+                nonzero = rel_systs != 0
+                with profiling.stage("interpolate"):
+                    z = interpolator(rel_systs, nonzero)
+                for ibin in range(channel_bins[channel]):
+                    bin_number = ibin + 1
+                    selected = nonzero[:, ibin]
+                    if not selected.any():
+                        continue
+
+                    if channel_bins[channel] < 2:
+                        title = channel_names[channel]
+                    else:
+                        title = f"{channel_names[channel]} (Bin {bin_number})"
+
+                    outlying = rel_systs[:, ibin] > outlier_threshold
+
+                    yield ContourJob(
+                        filename=f"{channel_names[channel]}_bin{bin_number}.png",
+                        title=title,
+                        x=interpolator.x,
+                        y=interpolator.y,
+                        z=z[ibin],
+                        points=np.stack(
+                            [
+                                masses[selected, 0],
+                                masses[selected, 1],
+                                rel_systs[selected, ibin],
+                            ]
+                        ),
+                        outliers=np.stack(
+                            [
+                                masses[outlying, 0],
+                                masses[outlying, 1],
+                                rel_systs[outlying, ibin],
+                            ]
+                        ),
+                        vmin=0,
+                        vmax=v_max,
+                        xlim=(x_min - 25, x_max + 25),
+                        ylim=(y_min - 25, y_max + 25),
+                        xlabel=x_label,
+                        ylabel=y_label,
+                        zlabel=r"$\oplus$ (histosys, normsys, staterr)",
+                    )
+
+        render(
+            contour_jobs(),
+            output_dir="Plots",
+            output_format=output_format,
+            name="outliers",
+            n_workers=n_workers,
+        )
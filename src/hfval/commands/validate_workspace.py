@@ -0,0 +1,110 @@
+"""Validate the relative size of the systematics of every sample of a workspace."""
+
+import click
+
+
+@click.command(name="validate-workspace")
+@click.option(
+    "--background",
+    help="Workspace, a directory containing BkgOnly.json or a path inside a tarball (defaults to 'BkgOnly.json')",
+    default="BkgOnly.json",
+)
+@click.option(
+    "--patch",
+    "patches",
+    help="Signal patch or pyhf patchset to apply to the workspace before the validation, the first patch of a patchset is used. Can be given multiple times.",
+    multiple=True,
+)
+@click.option(
+    "--channel",
+    "channels",
+    help="Only validate this channel, parsing only the selected channels of the workspace. Can be given multiple times (defaults to all channels)",
+    multiple=True,
+)
+@click.option(
+    "--no-stat",
+    help="Leave the staterror and shapesys uncertainties out of the relative syst size",
+    is_flag=True,
+)
+@click.option(
+    "--outlier-threshold",
+    help="Bins with a relative syst size above this value are outliers",
+    type=float,
+    default=1.0,
+    show_default=True,
+)
+@click.option(
+    "--top-k",
+    help="Number of outliers with the largest relative syst size that are listed",
+    type=int,
+    default=50,
+    show_default=True,
+)
+@click.option(
+    "--output",
+    help="Write the dense sample x channel x bin arrays to this .npz file",
+    default=None,
+)
+def validate_workspace(
+    background, patches, channels, no_stat, outlier_threshold, top_k, output
+):
+    """
+    Add up the systematics of every sample in every channel of a workspace.
+    """
+    import numpy as np
+
+    from .. import profiling
+    from ..fitting import patched_specs
+    from ..loader import load_background, load_json
+    from ..outliers import OutlierTracker
+    from ..systematics import workspace_systs
+    from ..view import WorkspaceView, prune_channels
+
+    try:
+        if channels and not patches:
+            spec = WorkspaceView(background).spec(channels)
+        else:
+            spec = load_background(background)
+        for patch in patches:
+            _, spec = next(patched_specs(spec, [load_json(patch)]))
+        if channels and patches:
+            # The patch ops address the channels of the full workspace
+            spec = prune_channels(spec, channels)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="--channel")
+
+    with profiling.stage("workspace systematics"):
+        result = workspace_systs(spec, include_stat=not no_stat)
+    print(
+        f"{len(result.samples)} samples in {len(result.channels)} channels"
+        f" with {result.nbins.sum()} bins"
+    )
+
+    tracker = OutlierTracker(threshold=outlier_threshold, k=top_k, key="rel")
+    for s, sample in enumerate(result.samples):
+        for c, channel in enumerate(result.channels):
+            nbins = result.nbins[c]
+            if not np.isnan(result.rel[s, c, 0]):
+                tracker.update(
+                    sample, channel, result.rel[s, c, :nbins], result.nom[s, c, :nbins]
+                )
+
+    print(f"Outliers (> {outlier_threshold}):")
+    for o in tracker.overall.items():
+        print("\t", o.rel, o.nom, o.signal, o.path, o.bin)
+    n_more = tracker.overall.count - len(tracker.overall.items())
+    if n_more:
+        print(f"\t... and {n_more} more")
+
+    if output:
+        with open(output, "wb") as outfile:
+            np.savez(
+                outfile,
+                samples=np.asarray(result.samples, dtype=str),
+                channels=np.asarray(result.channels, dtype=str),
+                **{
+                    field: getattr(result, field)
+                    for field in result._fields
+                    if field not in ["samples", "channels"]
+                },
+            )
@@ -0,0 +1,45 @@
+"""Run the tasks of a shared file queue, for example on a batch node."""
+
+import click
+
+
+@click.command(name="worker")
+@click.option(
+    "--queue-dir",
+    help="Shared directory of the queue, the --queue-dir of 'pyhf-validation scan'",
+    required=True,
+)
+@click.option(
+    "--idle-timeout",
+    help="Stop after this many seconds without new tasks (never by default)",
+    type=float,
+    default=None,
+)
+@click.option(
+    "--max-tasks",
+    help="Stop after this many tasks (never by default)",
+    type=int,
+    default=None,
+)
+@click.option(
+    "--poll-interval",
+    help="Seconds between the checks for new tasks",
+    type=float,
+    default=1.0,
+    show_default=True,
+)
+def worker(queue_dir, idle_timeout, max_tasks, poll_interval):
+    """
+    Take tasks from the queue of a scan and run them until it stays empty.
+
+    Start any number of workers on nodes that share the queue directory.
+    """
+    from ..scheduler import run_worker
+
+    n_tasks = run_worker(
+        queue_dir,
+        poll_interval=poll_interval,
+        idle_timeout=idle_timeout,
+        max_tasks=max_tasks,
+    )
+    click.echo(f"Ran {n_tasks} tasks")
@@ -0,0 +1,106 @@
+"""Compare HistFactory XML+ROOT inputs with their JSON workspace."""
+
+import click
+
+
+@click.command(name="xml-diff")
+@click.option(
+    "--xml",
+    "configfile",
+    help="Top-level HistFactory XML file",
+    required=True,
+)
+@click.option(
+    "--basedir",
+    help="Directory the paths in the XML files are relative to (defaults to the current directory, like 'pyhf xml2json')",
+    default=None,
+)
+@click.option(
+    "--mount",
+    help="Mount a host directory at a path used in the XML files, as HOST:MOUNT. Can be given multiple times",
+    multiple=True,
+)
+@click.option(
+    "--reference",
+    help="Reference JSON workspace, a directory containing BkgOnly.json, a path inside a tarball or a columnar store",
+    default="BkgOnly.json",
+    show_default=True,
+)
+@click.option(
+    "--rtol",
+    help="Relative tolerance of the compared values",
+    type=float,
+    default=1e-6,
+    show_default=True,
+)
+@click.option(
+    "--atol",
+    help="Absolute tolerance of the compared values",
+    type=float,
+    default=0.0,
+    show_default=True,
+)
+@click.option(
+    "--n-workers",
+    help="Number of worker processes converting channels (defaults to the number of CPUs)",
+    type=int,
+    default=None,
+)
+@click.option(
+    "--output",
+    help="Write the comparison of every array to this .csv or .json file",
+    default=None,
+)
+def xml_diff(configfile, basedir, mount, reference, rtol, atol, n_workers, output):
+    """
+    Convert the XML+ROOT inputs channel by channel like `pyhf xml2json` and
+    compare them with a reference JSON workspace.
+
+    The observed data, the nominal rates of every sample and the data of every
+    modifier are compared, and the arrays that differ, have different lengths
+    or are missing on either side are listed per channel, sample and modifier.
+    """
+    from .. import profiling
+    from ..loader import load_background
+    from ..xmldiff import diff_workspace, write_differences
+
+    mounts = []
+    for value in mount:
+        host, sep, target = value.partition(":")
+        if not sep:
+            raise click.BadParameter("expected HOST:MOUNT", param_hint="--mount")
+        mounts.append((host, target))
+
+    differences = []
+    n_failed = 0
+    with profiling.stage("xml diff"):
+        for channel in diff_workspace(
+            configfile,
+            load_background(reference),
+            basedir=basedir,
+            mounts=mounts,
+            rtol=rtol,
+            atol=atol,
+            n_workers=n_workers,
+        ):
+            failed = [d for d in channel if d.status != "ok"]
+            click.echo(
+                f"{channel[0].channel}: {len(failed)} of {len(channel)} arrays differ"
+            )
+            for d in failed:
+                where = "/".join(x for x in (d.sample, d.modifier, d.field) if x)
+                detail = (
+                    f"{d.n_failed} of {d.n_values} values,"
+                    f" max abs diff {d.max_abs_diff:.6g},"
+                    f" max rel diff {d.max_rel_diff:.6g}"
+                    if d.status == "differs"
+                    else d.status
+                )
+                click.echo(f"  {where or d.channel} ({d.type}): {detail}")
+            differences += channel
+            n_failed += len(failed)
+
+    if output:
+        write_differences(output, differences)
+    if n_failed:
+        raise click.ClickException(f"{n_failed} arrays differ from {reference}")
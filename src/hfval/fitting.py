@@ -0,0 +1,485 @@
+"""Maximum likelihood fits of pyhf workspaces with configurable backends."""
+
+import functools
+import os
+import time
+from collections import deque, namedtuple
+
+from . import profiling
+from .parallel import cpu_count, imap
+
+BACKENDS = ("numpy", "jax", "pytorch", "tensorflow")
+OPTIMIZERS = ("scipy", "minuit")
+# Bump to invalidate cached fit results when the fits change
+FIT_CACHE_VERSION = 1
+DEFAULT_MODIFIER_SETTINGS = {
+    "normsys": {"interpcode": "code4"},
+    "histosys": {"interpcode": "code4p"},
+}
+
+FitResult = namedtuple(
+    "FitResult",
+    [
+        "name",
+        "parameters",
+        "bestfit",
+        "twice_nll",
+        "wall_time",
+        "n_calls",
+        "converged",
+        "backend",
+        "optimizer",
+    ],
+)
+FitResult.__doc__ = """
+Result of :func:`fit`.
+
+``parameters`` are the names of the entries of the ``bestfit`` NumPy array,
+see :func:`parameter_names`. ``wall_time`` is the duration of the
+minimization in seconds and ``n_calls`` the number of objective evaluations.
+"""
+
+
+def set_backend(backend="numpy", optimizer="scipy"):
+    """Set the pyhf backend and optimizer, keeping the backends on the CPU."""
+    if backend != "numpy":
+        os.environ.setdefault("CUDA_VISIBLE_DEVICES", "")
+        os.environ.setdefault("JAX_PLATFORMS", "cpu")
+    import pyhf
+
+    pyhf.set_backend(backend, optimizer)
+
+
+def parameter_names(model):
+    """
+    Return the name of every entry of the parameter vector of ``model``.
+
+    Parameters with more than one component, and all staterror parameters,
+    are named ``{name}_{index}``.
+    """
+    names = [None] * model.config.npars
+    for k, v in model.config.par_map.items():
+        sl = v["slice"]
+        npars = sl.stop - sl.start
+        if npars > 1 or "staterror" in k:
+            for i in range(npars):
+                names[sl.start + i] = f"{k}_{i}"
+        else:
+            names[sl.start] = k
+    return names
+
+
+def model_data(model, spec):
+    """Return the observations of ``spec`` and the auxiliary data of ``model``."""
+    observations = {obs["name"]: obs["data"] for obs in spec["observations"]}
+    data = sum((observations[c] for c in model.config.channels), [])
+    return data + model.config.auxdata
+
+
+def fit(spec, name="", modifier_settings=None, start_values=None):
+    """
+    Fit a workspace with the current pyhf backend and optimizer.
+
+    Args:
+        spec: The workspace specification.
+        name: Label of the fit in the result.
+        modifier_settings: Interpolation codes of the model,
+            :data:`DEFAULT_MODIFIER_SETTINGS` by default.
+        start_values: Dict of initial values of parameters by name, for
+            example the best fit of a similar workspace. The suggested
+            initial values of the model are used for the other parameters.
+
+    Returns:
+        :class:`FitResult`
+    """
+    import pyhf
+
+    ws = pyhf.Workspace(spec)
+    model = ws.model(modifier_settings=modifier_settings or DEFAULT_MODIFIER_SETTINGS)
+    return _fit_model(model, spec, name, start_values)
+
+
+def fit_patches(spec, patches, warm_start="previous", modifier_settings=None):
+    """
+    Fit ``spec`` patched with every signal patch, sharing work between points.
+
+    Unlike :func:`fit` of every patched workspace, each distinct model
+    structure (the channels, and the names and types of the modifiers of
+    their samples) is only validated once, and the fits are warm-started.
+
+    Args:
+        spec: The background-only workspace specification.
+        patches: Signal patches or pyhf ``PatchSet`` documents, see
+            :func:`patched_specs`.
+        warm_start: Start every fit from the best fit of the ``"previous"``
+            point, or from the best fit of the ``"background"``-only
+            workspace, for the parameters they share. The suggested initial
+            values of the model are used if ``None``.
+        modifier_settings: Interpolation codes of the models,
+            :data:`DEFAULT_MODIFIER_SETTINGS` by default.
+
+    Yields:
+        :class:`FitResult` in the order of the patches.
+    """
+    import pyhf
+
+    if warm_start not in ("previous", "background", None):
+        raise ValueError(f"Unknown warm start {warm_start!r}")
+    modifier_settings = modifier_settings or DEFAULT_MODIFIER_SETTINGS
+
+    workspace = pyhf.Workspace(spec)
+    measurement = workspace.get_measurement()
+    start_values = {}
+    if warm_start == "background":
+        # The measurement without its POI, which the background does not have
+        background = workspace.model(poi_name=None, modifier_settings=modifier_settings)
+        result = _fit_model(background, spec, "background")
+        start_values = dict(zip(result.parameters, result.bestfit.tolist()))
+
+    validated = set()
+    for name, patched in patched_specs(spec, patches):
+        structure = _structure(patched)
+        if structure not in validated:
+            # Also validates the observations and measurements of the patch
+            pyhf.Workspace(patched)
+            validated.add(structure)
+        model = pyhf.Model(
+            {
+                "channels": patched["channels"],
+                "parameters": measurement["config"]["parameters"],
+            },
+            poi_name=measurement["config"]["poi"],
+            modifier_settings=modifier_settings,
+            validate=False,
+        )
+        result = _fit_model(model, patched, name, start_values)
+        if warm_start == "previous":
+            start_values = dict(zip(result.parameters, result.bestfit.tolist()))
+        yield result
+
+
+def _structure(spec):
+    return tuple(
+        (
+            channel["name"],
+            tuple(
+                tuple((m["name"], m["type"]) for m in sample["modifiers"])
+                for sample in channel["samples"]
+            ),
+        )
+        for channel in spec["channels"]
+    )
+
+
+def _fit_model(model, spec, name, start_values=None):
+    """Fit ``model`` to the observations of ``spec``, see :func:`fit`."""
+    import numpy as np
+    import pyhf
+
+    data = model_data(model, spec)
+    names = parameter_names(model)
+    init_pars = model.config.suggested_init()
+    if start_values:
+        bounds = np.asarray(model.config.suggested_bounds(), dtype=float)
+        fixed = model.config.suggested_fixed()
+        for idx, parameter in enumerate(names):
+            if parameter in start_values and not fixed[idx]:
+                init_pars[idx] = float(np.clip(start_values[parameter], *bounds[idx]))
+
+    start = time.perf_counter()
+    bestfit, twice_nll, result = pyhf.infer.mle.fit(
+        data,
+        model,
+        init_pars=init_pars,
+        return_fitted_val=True,
+        return_result_obj=True,
+    )
+    wall_time = time.perf_counter() - start
+
+    tensorlib, optimizer = pyhf.get_backend()
+    return FitResult(
+        name=name,
+        parameters=names,
+        bestfit=tensorlib.to_numpy(bestfit),
+        twice_nll=float(tensorlib.to_numpy(twice_nll)),
+        wall_time=wall_time,
+        n_calls=int(getattr(result, "nfev", -1)),
+        converged=bool(result.success),
+        backend=tensorlib.name,
+        optimizer=optimizer.name,
+    )
+
+
+def fit_patches_many(
+    spec,
+    patches,
+    warm_start="previous",
+    backend="numpy",
+    optimizer="scipy",
+    n_workers=None,
+):
+    """
+    Run :func:`fit_patches` concurrently on contiguous chunks of the patches.
+
+    Each worker process warm-starts the fits of its own chunk, so neighbouring
+    signal points should be neighbours in ``patches``.
+
+    Yields:
+        :class:`FitResult` in the order of the patches.
+    """
+    from .loader import named_patches
+
+    items = [
+        {"metadata": {"name": name}, "patch": ops}
+        for name, ops in named_patches(patches)
+    ]
+    n_workers = min(n_workers or cpu_count(), max(len(items), 1))
+    size = -(-len(items) // n_workers)
+    # Every chunk is a PatchSet of consecutive patches
+    chunks = (
+        (spec, [{"patches": items[start : start + size]}], warm_start)
+        for start in range(0, len(items), size)
+    )
+    for results in imap(
+        _fit_patches_task,
+        chunks,
+        n_workers=n_workers,
+        initializer=set_backend,
+        initargs=(backend, optimizer),
+    ):
+        yield from results
+
+
+def fit_many(tasks, backend="numpy", optimizer="scipy", n_workers=None, cache=None):
+    """
+    Fit many workspaces concurrently in a process pool.
+
+    Args:
+        tasks: Iterable of ``(name, spec)`` pairs.
+        backend: pyhf backend used by every worker.
+        optimizer: pyhf optimizer used by every worker.
+        n_workers: Number of worker processes, the number of CPUs by default.
+        cache: :class:`FitCache` of the results. Cached fits are not rerun,
+            and the others are warm-started from the closest cached fit.
+
+    Yields:
+        :class:`FitResult` in the order of ``tasks``.
+    """
+    if cache is None:
+        prepared = ((name, spec, None, None) for name, spec in tasks)
+    else:
+        keys = deque()
+
+        def prepare():
+            for name, spec in tasks:
+                key = cache.key(spec, backend=backend, optimizer=optimizer)
+                cached = cache.get(key, name=name)
+                keys.append((key, None if cached else cache.similar_keys(spec)))
+                if cached is not None:
+                    profiling.count("fits cached")
+                    yield name, None, None, cached
+                else:
+                    yield name, spec, cache.start_values(spec), None
+
+        prepared = prepare()
+
+    results = imap(
+        _fit_task,
+        prepared,
+        n_workers=n_workers,
+        initializer=set_backend,
+        initargs=(backend, optimizer),
+    )
+    for result in results:
+        if cache is not None:
+            key, similar_keys = keys.popleft()
+            if similar_keys is not None:
+                cache.put(key, result, similar_keys)
+        yield result
+
+
+class FitCache:
+    """
+    pyhf fit results keyed by a content hash of everything the fit depends on.
+
+    The key covers the workspace specification, including the observed data,
+    the interpolation codes, the backend and the optimizer. The latest result
+    of each model structure (see :func:`fit_patches`) and of each set of
+    channels is also indexed, and used as the :meth:`start_values` of
+    workspaces that are only partly changed.
+
+    Args:
+        cache_dir: Root of the cache, see :class:`hfval.cache.ArrayCache`.
+        max_bytes: Size limit of the cached fit results,
+            :data:`hfval.cache.DEFAULT_MAX_BYTES` by default.
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        from .cache import DEFAULT_MAX_BYTES, ArrayCache
+
+        self.cache = ArrayCache(
+            "fits", cache_dir=cache_dir, max_bytes=max_bytes or DEFAULT_MAX_BYTES
+        )
+        self.reused = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cache.close()
+
+    @staticmethod
+    def key(spec, modifier_settings=None, backend="numpy", optimizer="scipy"):
+        from .cache import digest
+
+        return digest(
+            {
+                "spec": spec,
+                "modifier_settings": modifier_settings or DEFAULT_MODIFIER_SETTINGS,
+                "backend": backend,
+                "optimizer": optimizer,
+            },
+            salt=f"fit-{FIT_CACHE_VERSION}",
+        )
+
+    @staticmethod
+    def similar_keys(spec):
+        """Return the keys of the closest matches of ``spec``, closest first."""
+        from .cache import digest
+
+        channels = sorted(channel["name"] for channel in spec["channels"])
+        return [
+            digest(_structure(spec), salt="fit-structure-index"),
+            digest(channels, salt="fit-channels-index"),
+        ]
+
+    def get(self, key, name=""):
+        """Return the cached :class:`FitResult` of ``key``, or ``None``."""
+        arrays = self.cache.get(key)
+        if arrays is None:
+            return None
+        self.reused += 1
+        return _from_arrays(arrays, name)
+
+    def put(self, key, result, similar_keys=()):
+        """Store ``result`` under ``key``, and index it by ``similar_keys``."""
+        import numpy as np
+
+        self.cache.put(key, _to_arrays(result))
+        for similar_key in similar_keys:
+            self.cache.put(similar_key, {"key": np.asarray(key)})
+
+    def start_values(self, spec):
+        """
+        Return the best fit of the closest cached match of ``spec`` by
+        parameter name, empty if there is none.
+
+        The lookups do not count as cache hits or misses, the fit still runs.
+        """
+        for similar_key in self.similar_keys(spec):
+            if similar_key not in self.cache:
+                continue
+            index = self.cache.get(similar_key, count=False)
+            arrays = index and self.cache.get(str(index["key"]), count=False)
+            if arrays:
+                return dict(
+                    zip(arrays["parameters"].tolist(), arrays["bestfit"].tolist())
+                )
+        return {}
+
+
+def _to_arrays(result):
+    import numpy as np
+
+    return {
+        "parameters": np.asarray(result.parameters, dtype=str),
+        "bestfit": np.asarray(result.bestfit, dtype=float),
+        "twice_nll": np.asarray(result.twice_nll),
+        "wall_time": np.asarray(result.wall_time),
+        "n_calls": np.asarray(result.n_calls),
+        "converged": np.asarray(result.converged),
+        "backend": np.asarray(result.backend),
+        "optimizer": np.asarray(result.optimizer),
+    }
+
+
+def _from_arrays(arrays, name=""):
+    return FitResult(
+        name=name,
+        parameters=arrays["parameters"].tolist(),
+        bestfit=arrays["bestfit"],
+        twice_nll=float(arrays["twice_nll"]),
+        wall_time=float(arrays["wall_time"]),
+        n_calls=int(arrays["n_calls"]),
+        converged=bool(arrays["converged"]),
+        backend=str(arrays["backend"]),
+        optimizer=str(arrays["optimizer"]),
+    )
+
+
+def patched_specs(spec, patches):
+    """
+    Yield ``(name, spec)`` for ``spec`` patched with every signal patch.
+
+    ``patches`` are lists of JSON patch ops or pyhf ``PatchSet`` documents,
+    whose patches are all applied in turn. A patch is named after the sample
+    its first op adds, or its ``PatchSet`` name.
+    """
+    import jsonpatch
+
+    from .loader import named_patches
+
+    for name, ops in named_patches(patches):
+        yield name, jsonpatch.apply_patch(spec, ops)
+
+
+def fit_patch(task):
+    """
+    Fit a background-only workspace patched with a signal patch.
+
+    The task function of the scans of :class:`hfval.scheduler.Scheduler`,
+    which only ship the patch to the workers. The workspace is loaded once
+    per worker process, and again when the file changes.
+
+    Args:
+        task: ``(name, background, ops, backend, optimizer)`` with the path of
+            the workspace (see :func:`hfval.loader.load_background`) and the
+            JSON patch ops, none to fit the workspace itself.
+
+    Returns:
+        :class:`FitResult`
+    """
+    import jsonpatch
+
+    name, background, ops, backend, optimizer = task
+    set_backend(backend, optimizer)
+    spec = _load_background(background)
+    if ops:
+        spec = jsonpatch.apply_patch(spec, ops)
+    return fit(spec, name=name)
+
+
+def _load_background(path):
+    from .cache import file_identity
+
+    # Long-lived workers read the workspace again when it changes
+    return _cached_background(path, tuple(file_identity(path)))
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_background(path, identity):
+    from .loader import load_background
+
+    return load_background(path)
+
+
+def _fit_patches_task(task):
+    spec, patches, warm_start = task
+    return list(fit_patches(spec, patches, warm_start=warm_start))
+
+
+def _fit_task(task):
+    name, spec, start_values, cached = task
+    if cached is not None:
+        return cached
+    return fit(spec, name=name, start_values=start_values)
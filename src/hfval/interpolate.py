@@ -0,0 +1,95 @@
+"""Linear interpolation of per-bin values over the signal mass plane."""
+
+import numpy as np
+from scipy.interpolate import LinearNDInterpolator
+from scipy.spatial import Delaunay
+
+
+def mass_points(signals, template, x_var="a", y_var="b"):
+    """
+    Return the ``(n_signals, 2)`` masses of signal points named like
+    ``template``, a :mod:`parse` template with the named fields ``x_var`` and
+    ``y_var``.
+
+    >>> mass_points(["C1N2_550_200"], "C1N2_{a}_{b}")
+    array([[550., 200.]])
+    """
+    import parse
+
+    compiled = parse.compile(template)
+    masses = np.empty((len(signals), 2))
+    for idx, signal in enumerate(signals):
+        named = compiled.parse(signal).named
+        masses[idx] = float(named[x_var]), float(named[y_var])
+    return masses
+
+
+class MassPlaneInterpolator:
+    """
+    Interpolate many bins of values given at the same signal mass points.
+
+    The regular grid spans the bounding box of all points. A Delaunay
+    triangulation is computed once per distinct subset of points and shared by
+    every bin using that subset, and all bins sharing a triangulation are
+    evaluated in a single call. The result for a bin is the same as
+    :func:`scipy.interpolate.griddata` with ``method="linear"`` on its points.
+
+    Args:
+        points: Array of shape ``(n_points, 2)`` with the mass points.
+        resolution: Number of grid points along each axis.
+    """
+
+    def __init__(self, points, resolution=100):
+        self.points = np.asarray(points, dtype=float)
+        self.resolution = resolution
+        x_min, y_min = self.points.min(axis=0)
+        x_max, y_max = self.points.max(axis=0)
+        step = complex(0, resolution)
+        self.x, self.y = np.mgrid[x_min:x_max:step, y_min:y_max:step]
+        self._triangulations = {}
+
+    def triangulation(self, mask):
+        """
+        Return the cached triangulation of the points selected by ``mask``.
+
+        Returns ``None`` if the selected points cannot be triangulated, for
+        example if there are fewer than three or they are collinear.
+        """
+        key = np.packbits(mask).tobytes()
+        if key not in self._triangulations:
+            try:
+                tri = Delaunay(self.points[mask])
+            except (RuntimeError, ValueError):
+                tri = None
+            self._triangulations[key] = tri
+        return self._triangulations[key]
+
+    def __call__(self, values, mask=None):
+        """
+        Interpolate every bin of ``values`` onto the grid.
+
+        Args:
+            values: Array of shape ``(n_points, n_bins)``.
+            mask: Boolean array like ``values`` selecting the points used for
+                each bin, all points by default.
+
+        Returns:
+            Array of shape ``(n_bins, resolution, resolution)``, NaN outside of
+            the convex hull of the points of a bin and for bins whose points
+            cannot be triangulated.
+        """
+        values = np.asarray(values, dtype=float)
+        if mask is None:
+            mask = np.ones(values.shape, dtype=bool)
+        z = np.full((values.shape[1], self.resolution, self.resolution), np.nan)
+
+        # Group the bins by the subset of points they use
+        subsets, inverse = np.unique(mask.T, axis=0, return_inverse=True)
+        for idx, subset in enumerate(subsets):
+            bins = np.flatnonzero(inverse.ravel() == idx)
+            tri = self.triangulation(subset) if subset.any() else None
+            if tri is None:
+                continue
+            interpolator = LinearNDInterpolator(tri, values[subset][:, bins])
+            z[bins] = np.moveaxis(interpolator(self.x, self.y), -1, 0)
+        return z
@@ -0,0 +1,150 @@
+"""
+Reading of JSON likelihoods with the fastest available parser.
+
+Documents are parsed with ``orjson`` or ``simdjson`` when one of them is
+installed (``pip install hfval[fast]``) and with :mod:`json` otherwise, and
+files are read through :mod:`mmap` rather than copied into memory first. The
+parser can be chosen with the ``HFVAL_JSON`` environment variable or
+:func:`set_backend`.
+"""
+
+import contextlib
+import json
+import mmap
+import os
+
+BACKENDS = ("orjson", "simdjson", "json")
+
+_backend = None
+
+
+def get_backend():
+    """Return the name of the JSON parser in use, picking one on first use."""
+    if _backend is None:
+        set_backend(os.environ.get("HFVAL_JSON") or None)
+    return _backend
+
+
+def set_backend(name=None):
+    """
+    Select the JSON parser.
+
+    Args:
+        name: One of :data:`BACKENDS`, or ``None`` for the first one that is
+            installed.
+    """
+    global _backend
+    if name is None:
+        for name in BACKENDS[:-1]:
+            try:
+                __import__(name)
+                break
+            except ImportError:
+                continue
+        else:
+            name = "json"
+    elif name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend {name!r}, expected one of {BACKENDS}")
+    else:
+        __import__(name)
+    _backend = name
+    return _backend
+
+
+def loads(raw):
+    """Parse a JSON document from ``bytes``, ``str`` or a buffer like a memoryview."""
+    backend = get_backend()
+    if backend == "orjson":
+        import orjson
+
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # The standard library also accepts NaN and Infinity
+            pass
+    elif backend == "simdjson":
+        import simdjson
+
+        return simdjson.Parser().parse(raw, True)
+    if isinstance(raw, memoryview):
+        raw = raw.tobytes()
+    return json.loads(raw)
+
+
+@contextlib.contextmanager
+def mapped(path):
+    """
+    Map the file ``path`` read-only into memory.
+
+    Yields:
+        memoryview: The content of the file, released when the context exits.
+    """
+    with open(path, "rb") as infile:
+        if not os.fstat(infile.fileno()).st_size:
+            # Empty files cannot be mapped
+            yield memoryview(b"")
+            return
+        with mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            with memoryview(mm) as view:
+                yield view
+
+
+def load(path):
+    """Parse the JSON file ``path`` through a memory map."""
+    with mapped(path) as view:
+        return loads(view)
+
+
+def extract(raw, fields):
+    """
+    Parse only the parts of a JSON document selected by ``fields``.
+
+    ``fields`` mirrors the structure of the document: a dict keeps the listed
+    keys of an object (missing keys are skipped) and projects their values
+    with the dict's values, a one-element list projects every element of an
+    array, ``True`` keeps a value as it is and ``len`` replaces an array or an
+    object by its length.
+
+    With ``simdjson`` the values that are not selected are never converted to
+    Python objects. The other parsers build the whole document first, and
+    only the selected parts are kept.
+
+    >>> extract(b'{"channels": [{"name": "SR", "data": [1, 2]}], "version": "1"}',
+    ...         {"channels": [{"name": True, "data": len}]})
+    {'channels': [{'name': 'SR', 'data': 2}]}
+    """
+    if get_backend() == "simdjson":
+        import simdjson
+
+        parser = simdjson.Parser()
+        return _project(parser.parse(raw), fields, _simdjson_value)
+    return _project(loads(raw), fields, lambda value: value)
+
+
+def extract_file(path, fields):
+    """Apply :func:`extract` to the JSON file ``path`` through a memory map."""
+    with mapped(path) as view:
+        return extract(view, fields)
+
+
+def _project(value, fields, convert):
+    if fields is True:
+        return convert(value)
+    if fields is len:
+        return len(value)
+    if isinstance(fields, list):
+        return [_project(item, fields[0], convert) for item in value]
+    return {
+        key: _project(value[key], sub, convert)
+        for key, sub in fields.items()
+        if key in value
+    }
+
+
+def _simdjson_value(value):
+    # Lazy simdjson containers, scalars are already Python objects
+    if hasattr(value, "as_dict"):
+        return value.as_dict()
+    if hasattr(value, "as_list"):
+        return value.as_list()
+    return value
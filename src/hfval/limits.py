@@ -0,0 +1,230 @@
+"""
+CLs of every signal point of a scan and their comparison with published values.
+
+Each signal point is a task of a :class:`hfval.scheduler.Scheduler`, so the
+points run in a process pool and finished points are checkpointed. The
+background-only workspace and its measurement are loaded once per worker, and
+again when the file changes, and each distinct model structure is only validated once.
+"""
+
+import csv
+import functools
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+from .fitting import (
+    DEFAULT_MODIFIER_SETTINGS,
+    _load_background,
+    _structure,
+    model_data,
+    set_backend,
+)
+
+TABLE_FORMATS = (".csv", ".json")
+EXPECTED_COLUMNS = (
+    "cls_exp_m2",
+    "cls_exp_m1",
+    "cls_exp",
+    "cls_exp_p1",
+    "cls_exp_p2",
+)
+COLUMNS = ("cls_obs",) + EXPECTED_COLUMNS
+
+LimitResult = namedtuple("LimitResult", ["name", "poi_value", "cls_obs", "cls_exp"])
+LimitResult.__doc__ = """
+Observed CLs of the signal point ``name`` at the signal strength
+``poi_value`` and the expected CLs band ``cls_exp``, the values of
+:data:`EXPECTED_COLUMNS` from -2 to +2 standard deviations.
+"""
+
+LimitComparison = namedtuple(
+    "LimitComparison",
+    ["name", "column", "value", "reference", "difference", "passed"],
+)
+LimitComparison.__doc__ = """
+Comparison of the CLs ``column`` of :data:`COLUMNS` of the signal point
+``name`` with the reference table.
+"""
+
+
+def hypotest_patch(task):
+    """
+    Compute the CLs of a background-only workspace patched with a signal patch.
+
+    The task function of :class:`hfval.scheduler.Scheduler`, like
+    :func:`hfval.fitting.fit_patch`.
+
+    Args:
+        task: ``(name, background, ops, poi_value, test_stat, backend,
+            optimizer)`` with the path of the workspace (see
+            :func:`hfval.loader.load_background`) and the JSON patch ops.
+
+    Returns:
+        :class:`LimitResult`
+    """
+    import jsonpatch
+    import pyhf
+
+    name, background, ops, poi_value, test_stat, backend, optimizer = task
+    set_backend(backend, optimizer)
+    spec = jsonpatch.apply_patch(_load_background(background), ops)
+    structure = _structure(spec)
+    if structure not in _validated:
+        # Also validates the observations and measurements of the patch
+        pyhf.Workspace(spec)
+        _validated.add(structure)
+    measurement = _measurement(background)
+    model = pyhf.Model(
+        {"channels": spec["channels"], "parameters": measurement["parameters"]},
+        poi_name=measurement["poi"],
+        modifier_settings=DEFAULT_MODIFIER_SETTINGS,
+        validate=False,
+    )
+    return hypotest_model(model, spec, name, poi_value, test_stat)
+
+
+def hypotest_model(model, spec, name, poi_value=1.0, test_stat="qtilde"):
+    """
+    Compute the CLs of ``model`` for the observations of ``spec``.
+
+    Returns:
+        :class:`LimitResult`
+    """
+    import pyhf
+
+    cls_obs, cls_exp = pyhf.infer.hypotest(
+        poi_value,
+        model_data(model, spec),
+        model,
+        test_stat=test_stat,
+        return_expected_set=True,
+    )
+    tensorlib, _ = pyhf.get_backend()
+    return LimitResult(
+        name,
+        poi_value,
+        float(tensorlib.to_numpy(cls_obs)),
+        np.asarray([float(tensorlib.to_numpy(cls)) for cls in cls_exp]),
+    )
+
+
+# Model structures validated by this process
+_validated = set()
+
+
+def _measurement(background):
+    from .cache import file_identity
+
+    return _cached_measurement(background, tuple(file_identity(background)))
+
+
+@functools.lru_cache(maxsize=4)
+def _cached_measurement(background, identity):
+    import pyhf
+
+    return pyhf.Workspace(_load_background(background)).get_measurement()["config"]
+
+
+def limit_records(results):
+    """Return a dict per :class:`LimitResult` with the :data:`COLUMNS`."""
+    return [
+        {
+            "name": result.name,
+            "poi_value": result.poi_value,
+            "cls_obs": result.cls_obs,
+            **dict(zip(EXPECTED_COLUMNS, result.cls_exp.tolist())),
+        }
+        for result in results
+    ]
+
+
+def write_table(path, records):
+    """Write records in the format given by the suffix of ``path``."""
+    suffix = os.path.splitext(str(path))[1].lower()
+    if suffix == ".csv":
+        with open(path, "w", newline="") as outfile:
+            writer = csv.DictWriter(outfile, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+    elif suffix == ".json":
+        # NaN is not valid JSON, missing values are written as null
+        records = [
+            {k: None if v != v else v for k, v in record.items()} for record in records
+        ]
+        with open(path, "w") as outfile:
+            json.dump(records, outfile, indent=1)
+    else:
+        raise ValueError(
+            f"Unknown table format {suffix!r}, expected one of {TABLE_FORMATS}"
+        )
+
+
+def load_table(path):
+    """
+    Read a reference table of CLs values by signal point.
+
+    The table is a ``.csv`` file with a header, or a ``.json`` file with a
+    list of records or a dict of records by name. Every record has a ``name``
+    and any of the :data:`COLUMNS`, like the tables of :func:`write_table`.
+
+    Returns:
+        dict: ``{name: {column: value}}`` with the :data:`COLUMNS` present.
+    """
+    suffix = os.path.splitext(str(path))[1].lower()
+    if suffix == ".csv":
+        with open(path, newline="") as infile:
+            records = list(csv.DictReader(infile))
+    elif suffix == ".json":
+        with open(path) as infile:
+            records = json.load(infile)
+        if isinstance(records, dict):
+            records = [{"name": name, **record} for name, record in records.items()]
+    else:
+        raise ValueError(
+            f"Unknown table format {suffix!r}, expected one of {TABLE_FORMATS}"
+        )
+    return {
+        record["name"]: {
+            column: float(record[column])
+            for column in COLUMNS
+            if record.get(column) not in (None, "")
+        }
+        for record in records
+    }
+
+
+def compare_limits(results, table, rtol=0.0, atol=0.01):
+    """
+    Compare the CLs of every point with the reference table.
+
+    A value ``x`` passes if ``|x - r| <= atol + rtol * |r|`` for the
+    reference ``r``. Points missing in the table are skipped.
+
+    Returns:
+        list: :class:`LimitComparison` of every column of the table, in the
+        order of ``results``.
+    """
+    comparisons = []
+    for record in limit_records(results):
+        reference = table.get(record["name"])
+        if reference is None:
+            continue
+        columns = [column for column in COLUMNS if column in reference]
+        value = np.asarray([record[column] for column in columns])
+        expected = np.asarray([reference[column] for column in columns])
+        difference = value - expected
+        passed = np.abs(difference) <= atol + rtol * np.abs(expected)
+        comparisons += [
+            LimitComparison(record["name"], *row)
+            for row in zip(
+                columns,
+                value.tolist(),
+                expected.tolist(),
+                difference.tolist(),
+                passed.tolist(),
+            )
+        ]
+    return comparisons
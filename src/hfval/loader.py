@@ -0,0 +1,295 @@
+"""Streaming loaders for background-only workspaces and signal patches."""
+
+import fnmatch
+import glob
+import gzip
+import os
+import tarfile
+
+from . import jsonio, profiling
+from .parallel import imap
+from .systematics import add_ops, signal_name
+
+PATCH_PATTERN = "patch*.json"
+ARCHIVE_SUFFIXES = (".tar.gz", ".tgz", ".tar")
+KEPT_MODIFIER_TYPES = ("histosys", "normsys")
+# Channel names and bin counts of a workspace, see load_json
+CHANNEL_FIELDS = {"channels": [{"name": True, "samples": [{"data": len}]}]}
+
+
+def split_archive_path(path):
+    """
+    Split a path like ``likelihoods.tar.gz/RegionA/BkgOnly.json``.
+
+    Returns:
+        tuple: ``(archive, member)`` with ``member`` relative to the archive, or
+        ``(None, path)`` if no component of ``path`` is an archive.
+    """
+    if os.path.exists(path) and not path.endswith(ARCHIVE_SUFFIXES):
+        return None, path
+    parts = path.replace(os.sep, "/").split("/")
+    for idx, part in enumerate(parts):
+        if part.endswith(ARCHIVE_SUFFIXES):
+            archive = "/".join(parts[: idx + 1])
+            if os.path.isfile(archive):
+                return archive, "/".join(parts[idx + 1 :])
+    return None, path
+
+
+def loads(raw, name=""):
+    """Parse JSON from bytes, decompressing gzip if ``name`` ends in ``.gz``."""
+    if name.endswith(".gz"):
+        raw = gzip.decompress(raw)
+    return jsonio.loads(raw)
+
+
+def load_json(path, fields=None):
+    """
+    Parse a ``.json`` or ``.json.gz`` file, or a member of a tarball.
+
+    Plain files are parsed through a memory map.
+
+    Args:
+        path: Path of the file.
+        fields: Only keep the parts of the document selected by ``fields``,
+            see :func:`hfval.jsonio.extract`.
+    """
+    profiling.count("files parsed")
+    archive, _ = split_archive_path(path)
+    if archive is None and not path.endswith(".gz"):
+        profiling.count("bytes read", os.path.getsize(path))
+        if fields is not None:
+            return jsonio.extract_file(path, fields)
+        return jsonio.load(path)
+    raw, name = read_bytes(path)
+    profiling.count("bytes read", len(raw))
+    if name.endswith(".gz"):
+        raw = gzip.decompress(raw)
+    if fields is not None:
+        return jsonio.extract(raw, fields)
+    return jsonio.loads(raw)
+
+
+def read_bytes(path):
+    """
+    Read a file or a member of a tarball.
+
+    Returns:
+        tuple: ``(raw, name)`` with the content and the name of the file.
+    """
+    archive, member = split_archive_path(path)
+    if archive is None:
+        with open(path, "rb") as infile:
+            return infile.read(), path
+    with tarfile.open(archive) as tar:
+        for info in tar:
+            if info.isfile() and _normpath(info.name) == _normpath(member):
+                return tar.extractfile(info).read(), info.name
+    raise FileNotFoundError(f"{member} not found in {archive}")
+
+
+def load_background(path="BkgOnly.json", fields=None):
+    """
+    Parse the background-only workspace once.
+
+    ``path`` may be a file, a directory containing ``BkgOnly.json``, a path
+    inside a tarball or a columnar store from :func:`hfval.store.write_store`.
+    With ``fields``, only parts of a JSON file are kept, see :func:`load_json`.
+    """
+    from .store import ColumnarStore, is_store
+
+    if os.path.isdir(path) and is_store(path):
+        return ColumnarStore(path).workspace()
+    if os.path.isdir(path):
+        path = os.path.join(path, "BkgOnly.json")
+    return load_json(path, fields=fields)
+
+
+def channel_nbins(spec):
+    """
+    Return the number of bins of every channel, like ``Workspace.channel_nbins``.
+
+    ``spec`` may be a full workspace or one loaded with :data:`CHANNEL_FIELDS`.
+    """
+    nbins = {}
+    for channel in spec["channels"]:
+        data = channel["samples"][0]["data"]
+        nbins[channel["name"]] = data if isinstance(data, int) else len(data)
+    return nbins
+
+
+def channel_name(spec, path):
+    """Return the name of the channel a patch op path like ``/channels/2/...`` is in."""
+    return spec["channels"][int(path.split("/")[2])]["name"]
+
+
+def reduce_patch(patch, signal=None):
+    """
+    Strip a patch down to what the systematic validation needs.
+
+    Args:
+        patch: List of JSON patch ops.
+        signal: Name of the signal, see :func:`hfval.systematics.signal_name`
+            by default.
+
+    Returns:
+        list: ``(signal, op)`` for the ``add`` ops of ``patch``, keeping only
+        their ``histosys`` and ``normsys`` modifiers.
+    """
+    if signal is None:
+        ops = add_ops([patch])
+    else:
+        ops = ((signal, op) for op in patch if op["op"] == "add")
+    reduced = []
+    for signal, op in ops:
+        value = op["value"]
+        modifiers = [m for m in value["modifiers"] if m["type"] in KEPT_MODIFIER_TYPES]
+        reduced.append(
+            (
+                signal,
+                {
+                    "op": "add",
+                    "path": op["path"],
+                    "value": {
+                        "name": value["name"],
+                        "data": value["data"],
+                        "modifiers": modifiers,
+                    },
+                },
+            )
+        )
+    return reduced
+
+
+def reduce_document(doc):
+    """
+    Reduce a patch file or a pyhf ``PatchSet`` with :func:`reduce_patch`,
+    naming the signals like :func:`named_patches`.
+    """
+    if isinstance(doc, dict) and "patches" in doc:
+        return [
+            item
+            for name, patch in named_patches([doc])
+            if patch
+            for item in reduce_patch(patch, name)
+        ]
+    return reduce_patch(doc) if doc else []
+
+
+def named_patches(patches):
+    """
+    Yield ``(name, ops)`` for every signal patch.
+
+    ``patches`` are lists of JSON patch ops or pyhf ``PatchSet`` documents,
+    whose patches are all yielded in turn. The patches are named by
+    :func:`hfval.systematics.signal_name`.
+    """
+    for patch in patches:
+        if isinstance(patch, dict) and "patches" in patch:
+            for item in patch["patches"]:
+                yield signal_name(item["patch"], item["metadata"]), item["patch"]
+        else:
+            yield signal_name(patch), patch
+
+
+def iter_documents(sources, pattern=PATCH_PATTERN):
+    """Parse every file of the patch sources in turn, see :func:`iter_sources`."""
+    for path, raw in iter_sources(sources, pattern):
+        if raw is None:
+            yield load_json(path)
+        else:
+            profiling.count("files parsed")
+            profiling.count("bytes read", len(raw))
+            yield loads(raw, path)
+
+
+def iter_sources(sources, pattern=PATCH_PATTERN):
+    """
+    Expand patch sources into tasks for the parsing workers.
+
+    A source is a patch or ``PatchSet`` file (optionally gzipped), a glob, a
+    directory, or a tarball or a directory inside one. Files in directories
+    and archives are selected with ``pattern`` (or ``pattern + ".gz"``).
+    Archive members are read without extracting them to disk.
+    """
+    for source in sources:
+        archive, member = split_archive_path(source)
+        if archive is not None:
+            yield from _iter_archive(archive, member, pattern)
+        elif os.path.isdir(source):
+            for path in sorted(_glob(source, pattern)):
+                yield path, None
+        elif glob.has_magic(source):
+            for path in sorted(glob.glob(source)):
+                yield path, None
+        else:
+            yield source, None
+
+
+def iter_patch_ops(sources, n_workers=None, pattern=PATCH_PATTERN, max_pending=None):
+    """
+    Parse signal patches in a process pool and stream their reduced ``add`` ops.
+
+    Args:
+        sources: Iterable of patch sources, see :func:`iter_sources`.
+        n_workers: Number of worker processes, parse in this process if 1.
+        pattern: Glob for the patch files in directories and archives.
+        max_pending: Maximum number of files parsed ahead of the consumer,
+            twice the number of workers by default.
+
+    Yields:
+        tuple: ``(signal, op)`` in the order of the sources, see
+        :func:`reduce_patch`.
+    """
+    tasks = iter_sources(sources, pattern)
+    results = imap(_parse_task, tasks, n_workers=n_workers, max_pending=max_pending)
+    while True:
+        with profiling.stage("parse patches"):
+            result = next(results, None)
+        if result is None:
+            return
+        ops, nbytes = result
+        profiling.count("files parsed")
+        profiling.count("bytes read", nbytes)
+        yield from ops
+
+
+def _parse_task(task):
+    path, raw = task
+    if raw is None:
+        archive, _ = split_archive_path(path)
+        if archive is None and not path.endswith(".gz"):
+            return reduce_document(jsonio.load(path)), os.path.getsize(path)
+        raw, path = read_bytes(path)
+    return reduce_document(loads(raw, path)), len(raw)
+
+
+def _iter_archive(archive, prefix, pattern):
+    prefix = _normpath(prefix)
+    with tarfile.open(archive) as tar:
+        for info in tar:
+            name = _normpath(info.name)
+            if not info.isfile():
+                continue
+            if prefix and name != prefix and not name.startswith(prefix + "/"):
+                continue
+            basename = os.path.basename(name)
+            if (
+                name == prefix
+                or fnmatch.fnmatch(basename, pattern)
+                or fnmatch.fnmatch(basename, pattern + ".gz")
+            ):
+                yield f"{archive}/{name}", tar.extractfile(info).read()
+
+
+def _glob(directory, pattern):
+    return glob.glob(os.path.join(directory, pattern)) + glob.glob(
+        os.path.join(directory, pattern + ".gz")
+    )
+
+
+def _normpath(name):
+    name = name.replace(os.sep, "/")
+    while name.startswith("./"):
+        name = name[2:]
+    return name.strip("/")
@@ -0,0 +1,119 @@
+"""Matching of ROOT (HistFactory) and pyhf parameter names."""
+
+import json
+import re
+from collections import namedtuple
+
+import numpy as np
+
+Rule = namedtuple("Rule", ["pattern", "name"])
+Rule.__doc__ = """
+Translation of ROOT parameter names matching the regular expression
+``pattern`` to the pyhf parameter ``name``, a replacement template like in
+:func:`re.sub`. The optional ``bin`` group of ``pattern`` is the component of
+the pyhf parameter.
+"""
+
+DEFAULT_RULES = (
+    Rule(r"^gamma_stat_(?P<channel>.+)_bin_(?P<bin>\d+)$", r"staterror_\g<channel>"),
+    Rule(r"^gamma_(?P<modifier>.+)_bin_(?P<bin>\d+)$", r"\g<modifier>"),
+    Rule(r"^alpha_(?P<modifier>.+)$", r"\g<modifier>"),
+    Rule(r"^lumi$", "Lumi"),
+)
+
+
+def load_rules(path):
+    """
+    Read rules from a JSON file with a list of ``{"pattern": ..., "name": ...}``.
+
+    The rules of the file take precedence over :data:`DEFAULT_RULES`.
+    """
+    with open(path) as infile:
+        return tuple(Rule(**rule) for rule in json.load(infile)) + DEFAULT_RULES
+
+
+def translate(names, rules=DEFAULT_RULES):
+    """
+    Translate ROOT parameter names with the first matching rule.
+
+    Names matched by no rule are kept as they are.
+
+    Returns:
+        List of ``(name, component)`` pairs, with ``component`` ``None`` for
+        names without a ``bin`` group.
+
+    >>> translate(["alpha_JES", "gamma_stat_SR_bin_2", "lumi", "mu_SIG"])
+    [('JES', None), ('staterror_SR', 2), ('Lumi', None), ('mu_SIG', None)]
+    """
+    compiled = [(re.compile(rule.pattern), rule.name) for rule in rules]
+    translated = []
+    for name in names:
+        for pattern, template in compiled:
+            match = pattern.match(name)
+            if match:
+                component = match.groupdict().get("bin")
+                # Unlike Match.expand, sub reuses the parsed template
+                name = pattern.sub(template, name, count=1)
+                translated.append((name, None if component is None else int(component)))
+                break
+        else:
+            translated.append((name, None))
+    return translated
+
+
+class ParameterIndex:
+    """
+    Bidirectional index between ROOT parameters and the pyhf parameter vector.
+
+    ``root_to_pyhf[i]`` is the position in the pyhf parameter vector of the
+    ROOT parameter ``i`` and ``pyhf_to_root[j]`` the position of the pyhf
+    parameter ``j`` among the ROOT parameters, both ``-1`` for parameters
+    without a match. Components of pyhf parameters are named like
+    :func:`hfval.fitting.parameter_names`, where a single component parameter
+    that is not a staterror has no ``_{index}`` suffix.
+
+    Args:
+        root_names: Names of the ROOT parameters.
+        pyhf_names: Names of the entries of the pyhf parameter vector.
+        rules: Ordered :class:`Rule` translating ROOT to pyhf names.
+    """
+
+    def __init__(self, root_names, pyhf_names, rules=DEFAULT_RULES):
+        self.root_names = np.asarray(root_names, dtype=str)
+        self.pyhf_names = np.asarray(pyhf_names, dtype=str)
+        position = {name: idx for idx, name in enumerate(pyhf_names)}
+
+        translated = []
+        self.root_to_pyhf = np.full(len(self.root_names), -1, dtype=np.intp)
+        for idx, (name, component) in enumerate(translate(root_names, rules)):
+            if component is not None:
+                # Single component parameters have no suffix
+                if f"{name}_{component}" in position or component != 0:
+                    name = f"{name}_{component}"
+            translated.append(name)
+            self.root_to_pyhf[idx] = position.get(name, -1)
+        self.translated = np.asarray(translated, dtype=str)
+
+        self.pyhf_to_root = np.full(len(self.pyhf_names), -1, dtype=np.intp)
+        matched = np.flatnonzero(self.root_to_pyhf >= 0)
+        self.pyhf_to_root[self.root_to_pyhf[matched]] = matched
+
+    @classmethod
+    def from_model(cls, root_names, model, rules=DEFAULT_RULES):
+        """Index the ROOT parameters against the parameters of a pyhf model."""
+        from .fitting import parameter_names
+
+        return cls(root_names, parameter_names(model), rules=rules)
+
+    def pairs(self):
+        """Return the positions ``(root, pyhf)`` of the matched parameters."""
+        matched = np.flatnonzero(self.root_to_pyhf >= 0)
+        return matched, self.root_to_pyhf[matched]
+
+    def unmatched_root(self):
+        """Return the translated names of the ROOT parameters missing in pyhf."""
+        return self.translated[self.root_to_pyhf < 0]
+
+    def unmatched_pyhf(self):
+        """Return the names of the pyhf parameters missing in ROOT."""
+        return self.pyhf_names[self.pyhf_to_root < 0]
@@ -0,0 +1,186 @@
+"""Streaming selection of outlying relative systematics over many signal points."""
+
+import heapq
+import itertools
+import os
+from collections import namedtuple
+
+import numpy as np
+
+Outlier = namedtuple("Outlier", ["rel", "nom", "signal", "path", "bin"])
+Outlier.__doc__ = """
+Bin ``bin`` of the sample at ``path`` of the ``signal`` patch, with relative
+systematic size ``rel`` and nominal yield ``nom``.
+"""
+
+COLUMNS = {
+    "signal": np.int32,
+    "path": np.int32,
+    "bin": np.int32,
+    "rel": np.float64,
+    "nom": np.float64,
+}
+
+
+class TopK:
+    """
+    The ``k`` outliers with the largest ``key`` seen so far.
+
+    Args:
+        k: Number of outliers kept, all of them if ``None``.
+        key: Field of :class:`Outlier` the outliers are ranked by.
+    """
+
+    def __init__(self, k=None, key="nom"):
+        self.k = k
+        self.key = key
+        self.count = 0
+        self._heap = []
+        self._order = itertools.count()
+
+    def push(self, outlier):
+        self.count += 1
+        # The insertion order breaks ties, the oldest outliers are kept
+        item = (getattr(outlier, self.key), -next(self._order), outlier)
+        if self.k is None or len(self._heap) < self.k:
+            heapq.heappush(self._heap, item)
+        elif item > self._heap[0]:
+            heapq.heapreplace(self._heap, item)
+
+    def items(self):
+        """Return the kept outliers, largest ``key`` first."""
+        return [item[-1] for item in sorted(self._heap, reverse=True)]
+
+
+class OutlierTracker:
+    """
+    Keep the top ``k`` outliers overall and per channel in bounded memory.
+
+    Args:
+        threshold: Bins with a relative systematic size above it are outliers.
+        k: Number of outliers kept overall and for each channel.
+        key: Field of :class:`Outlier` the outliers are ranked by, the
+            nominal yield by default.
+    """
+
+    def __init__(self, threshold=1.0, k=None, key="nom"):
+        self.threshold = threshold
+        self.k = k
+        self.key = key
+        self.overall = TopK(k, key=key)
+        self.by_channel = {}
+
+    def update(self, signal, path, rel, nom):
+        """Add the bins of the sample at ``path`` of the ``signal`` patch."""
+        rel = np.asarray(rel)
+        for b in np.flatnonzero(rel > self.threshold).tolist():
+            outlier = Outlier(float(rel[b]), float(nom[b]), signal, path, b)
+            self.overall.push(outlier)
+            if path not in self.by_channel:
+                self.by_channel[path] = TopK(self.k, key=self.key)
+            self.by_channel[path].push(outlier)
+
+
+class SummaryLog:
+    """
+    Append-only columnar log of the per-bin summaries of every signal point.
+
+    Every column of :data:`COLUMNS` is a raw binary file in ``path`` that
+    grows with each :meth:`append`, and the signal and sample path names are
+    stored once in ``signals.txt`` and ``paths.txt`` and referenced by their
+    line number. Reading maps the columns into memory.
+
+    Args:
+        path: Directory of the log, created and truncated when opened.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self._files = {name: open(self._column_file(name), "wb") for name in COLUMNS}
+        self._names = {"signals": {}, "paths": {}}
+        self._name_files = {
+            kind: open(os.path.join(path, f"{kind}.txt"), "w") for kind in self._names
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _column_file(self, name):
+        return os.path.join(self.path, f"{name}.bin")
+
+    def _code(self, kind, name):
+        codes = self._names[kind]
+        if name not in codes:
+            codes[name] = len(codes)
+            self._name_files[kind].write(name + "\n")
+        return codes[name]
+
+    def append(self, signal, path, rel, nom):
+        """Append the bins of the sample at ``path`` of the ``signal`` patch."""
+        nbins = len(rel)
+        columns = {
+            "signal": np.full(nbins, self._code("signals", signal)),
+            "path": np.full(nbins, self._code("paths", path)),
+            "bin": np.arange(nbins),
+            "rel": rel,
+            "nom": nom,
+        }
+        for name, dtype in COLUMNS.items():
+            self._files[name].write(np.asarray(columns[name], dtype=dtype).tobytes())
+
+    def close(self):
+        for outfile in list(self._files.values()) + list(self._name_files.values()):
+            outfile.close()
+
+    @property
+    def signals(self):
+        return list(self._names["signals"])
+
+    @property
+    def paths(self):
+        return list(self._names["paths"])
+
+    def read(self):
+        """Flush the log and return the memory-mapped columns."""
+        for outfile in list(self._files.values()) + list(self._name_files.values()):
+            outfile.flush()
+        return read_summary_log(self.path)
+
+    def channel(self, path, nbins):
+        """
+        Return the relative sizes of the channel at ``path`` of every signal.
+
+        Returns:
+            Array of shape ``(n_signals, nbins)``, zero for signals without
+            the channel, with the signals in the order they were appended.
+        """
+        columns = self.read()
+        rel = np.zeros((len(self._names["signals"]), nbins))
+        rows = np.flatnonzero(columns["path"] == self._names["paths"][path])
+        rel[columns["signal"][rows], columns["bin"][rows]] = columns["rel"][rows]
+        return rel
+
+
+def read_summary_log(path):
+    """
+    Map the columns of a :class:`SummaryLog` directory into memory.
+
+    Returns:
+        dict: The columns of :data:`COLUMNS`, plus the lists of ``signals``
+        and ``paths`` names their codes refer to.
+    """
+    columns = {}
+    for name, dtype in COLUMNS.items():
+        filename = os.path.join(path, f"{name}.bin")
+        if os.path.getsize(filename):
+            columns[name] = np.memmap(filename, dtype=dtype, mode="r")
+        else:
+            columns[name] = np.zeros(0, dtype=dtype)
+    for kind in ["signals", "paths"]:
+        with open(os.path.join(path, f"{kind}.txt")) as infile:
+            columns[kind] = infile.read().splitlines()
+    return columns
@@ -0,0 +1,52 @@
+"""Process pool helpers shared by the validation stages."""
+
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+
+def cpu_count():
+    return os.cpu_count() or 1
+
+
+def imap(fn, iterable, n_workers=None, max_pending=None, initializer=None, initargs=()):
+    """
+    Ordered, lazy ``map`` over a process pool.
+
+    Unlike :meth:`concurrent.futures.Executor.map`, tasks are only submitted
+    while fewer than ``max_pending`` of them are in flight, so ``iterable`` can
+    be a generator over more data than fits in memory.
+
+    Args:
+        fn: Picklable function applied to every item.
+        iterable: The items.
+        n_workers: Number of worker processes, the number of CPUs by default.
+            With a single worker everything runs in this process.
+        max_pending: Maximum number of submitted but unconsumed tasks, twice
+            the number of workers by default.
+        initializer: Called with ``initargs`` once in every worker.
+        initargs: Arguments for ``initializer``.
+
+    Yields:
+        The results of ``fn`` in the order of ``iterable``.
+    """
+    n_workers = n_workers or cpu_count()
+    if n_workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for item in iterable:
+            yield fn(item)
+        return
+
+    if max_pending is None:
+        max_pending = 2 * n_workers
+    with ProcessPoolExecutor(
+        max_workers=n_workers, initializer=initializer, initargs=initargs
+    ) as executor:
+        pending = deque()
+        for item in iterable:
+            pending.append(executor.submit(fn, item))
+            if len(pending) >= max_pending:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -0,0 +1,188 @@
+"""
+Opt-in timing of the stages of a command, written as a Chrome trace.
+
+Instrumented code marks its stages with :func:`stage` and counts work with
+:func:`count`. Both do nothing until :func:`enable` is called, for example by
+``pyhf-validation --profile``. The trace can be opened in ``chrome://tracing``
+or https://ui.perfetto.dev.
+"""
+
+import contextlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+_profiler = None
+_disabled_stage = contextlib.nullcontext()
+
+
+def enabled():
+    return _profiler is not None
+
+
+def stage(name):
+    """
+    Return a context manager timing the stage ``name``.
+
+    Stages can be nested and repeated, their totals are summed by name.
+    """
+    if _profiler is None:
+        return _disabled_stage
+    return _profiler.stage(name)
+
+
+def count(name, n=1):
+    """Add ``n`` to the counter ``name``."""
+    if _profiler is not None:
+        _profiler.counters[name] = _profiler.counters.get(name, 0) + n
+
+
+def enable(pstats_dir=None):
+    """Start collecting stages and counters, see :class:`Profiler`."""
+    global _profiler
+    _profiler = Profiler(pstats_dir=pstats_dir)
+    return _profiler
+
+
+def disable():
+    global _profiler
+    _profiler = None
+
+
+def peak_rss():
+    """
+    Return the peak resident set size in bytes of this process and of its
+    finished child processes, ``None`` where it is not available.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None, None
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+    )
+
+
+class Profiler:
+    """
+    Timings of stages and counters of one run.
+
+    Args:
+        pstats_dir: Also run :mod:`cProfile` during every stage, excluding
+            its nested stages, and write the statistics of each stage name to
+            ``{stage}.pstats`` in this directory.
+    """
+
+    def __init__(self, pstats_dir=None):
+        self.pstats_dir = pstats_dir
+        self.start = time.perf_counter_ns()
+        self.events = []
+        self.totals = {}
+        self.counters = {}
+        self._profiles = {}
+        self._stack = []
+
+    def _now(self):
+        return (time.perf_counter_ns() - self.start) / 1000
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        profile = None
+        if self.pstats_dir is not None:
+            import cProfile
+
+            # Only one profile is active at a time, a nested stage pauses
+            # the profile of the enclosing stage
+            profile = self._profiles.setdefault(name, cProfile.Profile())
+            if self._stack and self._stack[-1] is not None:
+                self._stack[-1].disable()
+            profile.enable()
+        self._stack.append(profile)
+        start = self._now()
+        try:
+            yield
+        finally:
+            end = self._now()
+            self._stack.pop()
+            if profile is not None:
+                profile.disable()
+                if self._stack and self._stack[-1] is not None:
+                    self._stack[-1].enable()
+            calls, total = self.totals.get(name, (0, 0.0))
+            self.totals[name] = (calls + 1, total + (end - start) / 1e6)
+            self.events.append(
+                {
+                    "name": name,
+                    "cat": "stage",
+                    "ph": "X",
+                    "ts": start,
+                    "dur": end - start,
+                    "pid": os.getpid(),
+                    "tid": threading.get_ident(),
+                }
+            )
+            self._sample_counters(end)
+
+    def _sample_counters(self, ts):
+        rss, children_rss = peak_rss()
+        args = dict(self.counters)
+        if rss is not None:
+            args["peak RSS (MB)"] = rss / 1024**2
+        self.events.append(
+            {
+                "name": "counters",
+                "ph": "C",
+                "ts": ts,
+                "pid": os.getpid(),
+                "args": args,
+            }
+        )
+
+    def trace(self):
+        """Return the trace as a Chrome trace-event format document."""
+        rss, children_rss = peak_rss()
+        return {
+            "traceEvents": self.events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "stages": {
+                    name: {"calls": calls, "seconds": seconds}
+                    for name, (calls, seconds) in self.totals.items()
+                },
+                "counters": self.counters,
+                "peak_rss_bytes": rss,
+                "peak_children_rss_bytes": children_rss,
+            },
+        }
+
+    def summary(self):
+        """Return a table of the stage totals, counters and peak RSS."""
+        lines = [f"{'stage':<40}{'calls':>8}{'seconds':>12}"]
+        for name, (calls, seconds) in self.totals.items():
+            lines.append(f"{name:<40}{calls:>8}{seconds:>12.3f}")
+        for name, value in self.counters.items():
+            lines.append(f"{name:<40}{value:>20}")
+        rss, children_rss = peak_rss()
+        if rss is not None:
+            lines.append(f"{'peak RSS (MB)':<40}{rss / 1024**2:>20.1f}")
+            lines.append(
+                f"{'peak RSS of workers (MB)':<40}{children_rss / 1024**2:>20.1f}"
+            )
+        return "\n".join(lines)
+
+    def write(self, path):
+        """Write the trace to ``path`` and the cProfile statistics, if any."""
+        self._sample_counters(self._now())
+        with open(path, "w") as outfile:
+            json.dump(self.trace(), outfile)
+        if self._profiles:
+            os.makedirs(self.pstats_dir, exist_ok=True)
+            for name, profile in self._profiles.items():
+                filename = re.sub(r"[^\w.-]+", "_", name) + ".pstats"
+                profile.dump_stats(os.path.join(self.pstats_dir, filename))
@@ -0,0 +1,211 @@
+"""
+ROOT fit results stored in a format that can be read without ROOT.
+
+A reference file is an ``.npz`` file with the parameter names, their fitted
+values and errors, and their correlation matrix. The :class:`ReferenceStore`
+keeps them keyed by the content hash of the ROOT workspace file, so the ROOT
+fit only runs once per workspace.
+"""
+
+import hashlib
+from collections import namedtuple
+
+import numpy as np
+
+from . import profiling
+from .cache import ArrayCache
+
+RootFitResult = namedtuple(
+    "RootFitResult", ["parameters", "values", "errors", "correlation"]
+)
+RootFitResult.__doc__ = """
+Fitted ``values`` and ``errors`` of the ROOT ``parameters`` (nuisance
+parameters and parameters of interest) and their ``correlation`` matrix.
+"""
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 hex digest of the content of a file."""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as infile:
+        for chunk in iter(lambda: infile.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def to_arrays(result):
+    return {
+        "parameters": np.asarray(result.parameters, dtype=str),
+        "values": np.asarray(result.values, dtype=float),
+        "errors": np.asarray(result.errors, dtype=float),
+        "correlation": np.asarray(result.correlation, dtype=float),
+    }
+
+
+def from_arrays(arrays):
+    return RootFitResult(
+        parameters=arrays["parameters"].tolist(),
+        values=arrays["values"],
+        errors=arrays["errors"],
+        correlation=arrays["correlation"],
+    )
+
+
+def save_reference(path, result):
+    """Write a :class:`RootFitResult` to an ``.npz`` reference file."""
+    with open(path, "wb") as outfile:
+        np.savez(outfile, **to_arrays(result))
+
+
+def load_reference(path):
+    """Read a :class:`RootFitResult` from an ``.npz`` reference file."""
+    with np.load(path) as arrays:
+        return from_arrays(arrays)
+
+
+class ReferenceStore:
+    """
+    ROOT fit results keyed by the content hash of the ROOT workspace file.
+
+    Args:
+        cache_dir: Root of the cache, see :class:`hfval.cache.ArrayCache`.
+    """
+
+    def __init__(self, cache_dir=None):
+        self.cache = ArrayCache("root_fits", cache_dir=cache_dir)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.cache.close()
+
+    def get(self, root_workspace):
+        arrays = self.cache.get(file_digest(root_workspace))
+        return None if arrays is None else from_arrays(arrays)
+
+    def put(self, root_workspace, result):
+        self.cache.put(file_digest(root_workspace), to_arrays(result))
+
+    def fit(self, root_workspace, refit=False):
+        """Return the stored fit result, running the ROOT fit if there is none."""
+        result = None if refit else self.get(root_workspace)
+        if result is None:
+            with profiling.stage("root fit"):
+                result = fit_root_workspace(root_workspace)
+            profiling.count("root fits run")
+            self.put(root_workspace, result)
+        return result
+
+
+def fit_root_workspace(root_workspace):
+    """Fit the ``simPdf`` of the ``combined`` workspace to ``obsData`` with RooFit."""
+    import ROOT
+
+    infile = ROOT.TFile.Open(root_workspace)
+    workspace = infile.Get("combined")
+
+    mc = workspace.obj("ModelConfig")
+
+    def exhaust_argset(s):
+        it = s.fwdIterator()
+        while True:
+            n = it.next()
+            if not n:
+                break
+            yield n
+
+    pars = [x.GetName() for x in exhaust_argset(mc.GetNuisanceParameters())] + [
+        x.GetName() for x in exhaust_argset(mc.GetParametersOfInterest())
+    ]
+
+    model = workspace.pdf("simPdf")
+    data = workspace.data("obsData")
+    fit_result = model.fitTo(data, ROOT.RooFit.Save())
+
+    values = [workspace.var(par).getVal() for par in pars]
+    errors = [workspace.var(par).getError() for par in pars]
+
+    # Constant parameters are uncorrelated with everything else
+    floating = {
+        x.GetName(): idx
+        for idx, x in enumerate(exhaust_argset(fit_result.floatParsFinal()))
+    }
+    matrix = fit_result.correlationMatrix()
+    correlation = np.eye(len(pars))
+    for i, par_i in enumerate(pars):
+        if par_i not in floating:
+            continue
+        for j, par_j in enumerate(pars):
+            if par_j in floating:
+                correlation[i, j] = matrix[floating[par_i]][floating[par_j]]
+    infile.Close()
+
+    return RootFitResult(
+        parameters=pars,
+        values=np.asarray(values),
+        errors=np.asarray(errors),
+        correlation=correlation,
+    )
+
+
+def scan_root_workspace(root_workspace, parameters, n_points=21, n_sigma=3.0):
+    """
+    Profile likelihood scans of the ``simPdf`` of a ROOT workspace.
+
+    Every parameter is scanned at ``n_points`` values spanning ``n_sigma``
+    times its fitted error around its fitted value, within its range, like
+    :func:`hfval.scans.profile_scan`.
+
+    Args:
+        root_workspace: Path of the ROOT file of the ``combined`` workspace.
+        parameters: Names of the ROOT parameters to scan.
+        n_points: Number of points of every scan.
+        n_sigma: Half width of the scans in units of the fitted errors.
+
+    Returns:
+        list: :class:`hfval.scans.ProfileScan` in the order of ``parameters``.
+    """
+    import ROOT
+
+    from .scans import ProfileScan, outward_order
+
+    infile = ROOT.TFile.Open(root_workspace)
+    workspace = infile.Get("combined")
+    data = workspace.data("obsData")
+    nll = workspace.pdf("simPdf").createNLL(data)
+    minimizer = ROOT.RooMinimizer(nll)
+    minimizer.setPrintLevel(-1)
+    minimizer.minimize("Minuit2")
+    minimizer.hesse()
+    twice_nll_min = 2 * nll.getVal()
+    nll_parameters = nll.getParameters(data)
+    bestfit = nll_parameters.snapshot()
+
+    scans = []
+    for name in parameters:
+        var = workspace.var(name)
+        center, error = var.getVal(), var.getError()
+        values = np.linspace(
+            max(var.getMin(), center - n_sigma * error),
+            min(var.getMax(), center + n_sigma * error),
+            n_points,
+        )
+        twice_nll = np.full(n_points, np.nan)
+        converged = np.zeros(n_points, dtype=bool)
+        fitted = {}
+        var.setConstant(True)
+        for point, neighbour in outward_order(values, center):
+            # Start from the fit of the neighbouring point
+            nll_parameters.assignValueOnly(
+                fitted[neighbour] if neighbour >= 0 else bestfit
+            )
+            var.setVal(values[point])
+            converged[point] = minimizer.minimize("Minuit2") == 0
+            twice_nll[point] = 2 * nll.getVal()
+            fitted[point] = nll_parameters.snapshot()
+        var.setConstant(False)
+        nll_parameters.assignValueOnly(bestfit)
+        scans.append(ProfileScan(name, values, twice_nll, twice_nll_min, converged))
+    infile.Close()
+    return scans
@@ -0,0 +1,183 @@
+"""
+Parallel rendering of validation figures.
+
+Figures are described by plain data jobs (:class:`BarJob`, :class:`ContourJob`)
+that are drawn by a pool of workers with the object-oriented Agg API. Every
+worker reuses a single figure, so no pyplot state is involved. The pages of a
+PDF are drawn in the calling process, so they keep their vector contours and
+text.
+"""
+
+import html
+import os
+from collections import namedtuple
+
+import numpy as np
+from matplotlib import rc_context
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+from . import profiling
+from .parallel import imap
+
+FIGSIZE = (12, 6)
+RC_PARAMS = {"xtick.labelsize": 14, "ytick.labelsize": 14}
+OUTPUT_FORMATS = ("png", "pdf", "html")
+
+BarJob = namedtuple("BarJob", ["filename", "title", "labels", "values", "ylabel"])
+BarJob.__doc__ = "Bar chart of ``values`` with the tick ``labels``."
+
+ContourJob = namedtuple(
+    "ContourJob",
+    [
+        "filename",
+        "title",
+        "x",
+        "y",
+        "z",
+        "points",
+        "outliers",
+        "vmin",
+        "vmax",
+        "xlim",
+        "ylim",
+        "xlabel",
+        "ylabel",
+        "zlabel",
+    ],
+)
+ContourJob.__doc__ = """
+Filled contours of ``z`` on the ``(x, y)`` grid.
+
+``points`` and ``outliers`` are ``(x, y, value)`` arrays drawn as scatter
+points on top of the contours, with the outlier values written next to them.
+"""
+
+_figure = None
+
+
+def draw_bar(fig, job):
+    x = np.arange(len(job.labels))  # the label locations
+    width = 0.5  # the width of the bars
+    ax = fig.add_subplot(1, 1, 1)
+    ax.set_ylabel(job.ylabel, fontsize=16)
+    ax.set_title(job.title, fontsize=20)
+    ax.bar(x - width / 2, job.values, width)
+    ax.set_xticks(x)
+    ax.set_xticklabels(job.labels, rotation=45, ha="right")
+
+
+def draw_contour(fig, job):
+    ax = fig.add_subplot(1, 1, 1)
+    if job.xlabel is not None:
+        ax.set_xlabel(job.xlabel, fontsize=20)
+    if job.ylabel is not None:
+        ax.set_ylabel(job.ylabel, fontsize=20)
+    ax.set_xlim(*job.xlim)
+    ax.set_ylim(*job.ylim)
+
+    px, py, pc = job.points
+    ax.scatter(px, py, c=pc, edgecolors="w", vmin=job.vmin, vmax=job.vmax)
+    im = ax.contourf(job.x, job.y, job.z, levels=np.linspace(job.vmin, job.vmax, 100))
+    cb = fig.colorbar(im, ax=ax)
+    cb.set_label(label=job.zlabel, fontsize=18)
+    ax.set_title(job.title, fontsize=20)
+
+    ox, oy, oc = job.outliers
+    if len(oc):
+        ax.scatter(ox, oy, c=oc, vmin=0, vmax=20, cmap="cool")
+    for x, y, c in zip(ox, oy, oc):
+        ax.text(x + 5, y + 5, f"{c:.2f}", c="r")
+
+
+DRAW = {BarJob: draw_bar, ContourJob: draw_contour}
+
+
+def render(jobs, output_dir="Plots", output_format="png", name="plots", n_workers=None):
+    """
+    Render figure jobs in a pool of worker processes.
+
+    Args:
+        jobs: Iterable of :class:`BarJob` or :class:`ContourJob`.
+        output_dir: Directory the figures are written to.
+        output_format: ``png`` writes one file per job, ``pdf`` a single
+            multi-page vector ``{name}.pdf``, drawn in this process, and
+            ``html`` the PNGs plus an ``{name}.html`` index of them.
+        name: Name of the PDF or HTML index.
+        n_workers: Number of worker processes, the number of CPUs by default.
+
+    Returns:
+        int: The number of rendered figures.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            f"Unknown output format {output_format}, use one of {OUTPUT_FORMATS}"
+        )
+    os.makedirs(output_dir, exist_ok=True)
+    with profiling.stage(f"render {name}"):
+        if output_format == "pdf":
+            # Vector pages cannot be passed between processes as images, and
+            # pages of separate PDFs would need merging
+            count = _write_pdf(jobs, os.path.join(output_dir, f"{name}.pdf"))
+        else:
+            tasks = ((job, output_dir) for job in jobs)
+            results = imap(
+                _render_task, tasks, n_workers=n_workers, initializer=_init_worker
+            )
+            if output_format == "html":
+                count = _write_html(results, os.path.join(output_dir, f"{name}.html"))
+            else:
+                count = sum(1 for _ in results)
+    profiling.count("figures rendered", count)
+    return count
+
+
+def _init_worker():
+    global _figure
+    _figure = Figure(figsize=FIGSIZE)
+    FigureCanvasAgg(_figure)
+
+
+def _draw(fig, job):
+    fig.clear()
+    DRAW[type(job)](fig, job)
+    fig.tight_layout()
+
+
+def _render_task(task):
+    job, output_dir = task
+    # Not rcParams.update, the worker may be the calling process
+    with rc_context(RC_PARAMS):
+        _draw(_figure, job)
+        _figure.savefig(os.path.join(output_dir, job.filename))
+    return job
+
+
+def _write_pdf(jobs, path):
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    count = 0
+    fig = Figure(figsize=FIGSIZE)
+    FigureCanvasAgg(fig)
+    with rc_context(RC_PARAMS), PdfPages(path) as pdf:
+        for job in jobs:
+            _draw(fig, job)
+            pdf.savefig(fig)
+            count += 1
+    return count
+
+
+def _write_html(results, path):
+    count = 0
+    with open(path, "w") as index:
+        index.write("<!DOCTYPE html>\n<html>\n<body>\n")
+        for job in results:
+            title = html.escape(job.title)
+            src = html.escape(job.filename, quote=True)
+            index.write(
+                f'<figure><a href="{src}"><img src="{src}" alt="{title}" width="600"></a>'
+                f"<figcaption>{title}</figcaption></figure>\n"
+            )
+            count += 1
+        index.write("</body>\n</html>\n")
+    return count
@@ -0,0 +1,186 @@
+"""Columnar comparison of fitted ROOT and pyhf parameters."""
+
+import csv
+import json
+import os
+from collections import namedtuple
+
+import numpy as np
+
+COLUMNS = ("fit", "parameter", "pyhf", "root", "root_error", "abs_diff")
+COLUMNS += ("rel_diff", "pull", "passed")
+REPORT_FORMATS = (".csv", ".json", ".npz", ".parquet")
+
+Tolerance = namedtuple("Tolerance", ["rtol", "atol", "max_pull"])
+Tolerance.__new__.__defaults__ = (1e-2, 1e-3, None)
+Tolerance.__doc__ = """
+A parameter passes if ``|pyhf - root| <= atol + rtol * |root|``, or if
+``max_pull`` is not ``None`` and ``|pull| <= max_pull``.
+"""
+
+
+class ComparisonReport:
+    """
+    Aligned arrays comparing fitted values, one entry per matched parameter.
+
+    ``abs_diff`` is ``pyhf - root``, ``rel_diff`` is ``abs_diff`` divided by
+    the larger of ``|pyhf|`` and ``|root|`` (zero if both are zero), and
+    ``pull`` is ``abs_diff`` divided by the ROOT uncertainty (NaN if it is not
+    positive).
+
+    Args:
+        columns: Dict of the arrays of :data:`COLUMNS`.
+    """
+
+    def __init__(self, columns):
+        for name in COLUMNS:
+            setattr(self, name, np.asarray(columns[name]))
+
+    @classmethod
+    def from_values(
+        cls,
+        parameters,
+        pyhf_values,
+        root_values,
+        root_errors=None,
+        fit="",
+        tolerance=Tolerance(),
+    ):
+        """
+        Compare aligned arrays of fitted values.
+
+        Args:
+            parameters: Names of the parameters.
+            pyhf_values: Fitted values of pyhf.
+            root_values: Fitted values of ROOT.
+            root_errors: Uncertainties of the ROOT values, unknown by default.
+            fit: Label of the fit, repeated for every parameter.
+            tolerance: :class:`Tolerance` of the pass/fail decision.
+        """
+        pyhf = np.asarray(pyhf_values, dtype=float)
+        root = np.asarray(root_values, dtype=float)
+        if root_errors is None:
+            root_errors = np.full(root.shape, np.nan)
+        root_error = np.asarray(root_errors, dtype=float)
+
+        abs_diff = pyhf - root
+        scale = np.maximum(np.abs(pyhf), np.abs(root))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel_diff = np.where(scale > 0, abs_diff / scale, 0.0)
+            pull = np.where(root_error > 0, abs_diff / root_error, np.nan)
+
+        passed = np.abs(abs_diff) <= tolerance.atol + tolerance.rtol * np.abs(root)
+        if tolerance.max_pull is not None:
+            passed |= np.abs(pull) <= tolerance.max_pull
+
+        return cls(
+            {
+                "fit": np.asarray([fit] * len(pyhf), dtype=str),
+                "parameter": np.asarray(parameters, dtype=str),
+                "pyhf": pyhf,
+                "root": root,
+                "root_error": root_error,
+                "abs_diff": abs_diff,
+                "rel_diff": rel_diff,
+                "pull": pull,
+                "passed": passed,
+            }
+        )
+
+    @classmethod
+    def from_index(cls, index, pyhf_values, root_result, fit="", tolerance=Tolerance()):
+        """
+        Compare the parameters matched by a :class:`hfval.names.ParameterIndex`.
+
+        Args:
+            index: Index of the ROOT and pyhf parameters.
+            pyhf_values: Fitted pyhf parameter vector.
+            root_result: :class:`hfval.reference.RootFitResult`.
+            fit: Label of the fit.
+            tolerance: :class:`Tolerance` of the pass/fail decision.
+        """
+        root_idx, pyhf_idx = index.pairs()
+        return cls.from_values(
+            index.pyhf_names[pyhf_idx],
+            np.asarray(pyhf_values, dtype=float)[pyhf_idx],
+            np.asarray(root_result.values, dtype=float)[root_idx],
+            np.asarray(root_result.errors, dtype=float)[root_idx],
+            fit=fit,
+            tolerance=tolerance,
+        )
+
+    @classmethod
+    def concatenate(cls, reports):
+        """Stack many reports, for example of every fit of a patchset."""
+        reports = list(reports)
+        if not reports:
+            return cls.from_values([], [], [])
+        return cls(
+            {
+                name: np.concatenate([getattr(report, name) for report in reports])
+                for name in COLUMNS
+            }
+        )
+
+    def __len__(self):
+        return len(self.parameter)
+
+    @property
+    def n_failed(self):
+        return int(np.count_nonzero(~self.passed))
+
+    def columns(self):
+        return {name: getattr(self, name) for name in COLUMNS}
+
+    def records(self):
+        """Return a list of dicts, one per parameter, of Python scalars."""
+        columns = [getattr(self, name).tolist() for name in COLUMNS]
+        return [dict(zip(COLUMNS, row)) for row in zip(*columns)]
+
+    def write(self, path):
+        """
+        Write the report, in the format given by the suffix of ``path``.
+
+        ``.parquet`` files require ``pyarrow``.
+        """
+        suffix = os.path.splitext(str(path))[1].lower()
+        if suffix == ".csv":
+            with open(path, "w", newline="") as outfile:
+                writer = csv.writer(outfile)
+                writer.writerow(COLUMNS)
+                writer.writerows(
+                    zip(*(getattr(self, name).tolist() for name in COLUMNS))
+                )
+        elif suffix == ".json":
+            # NaN is not valid JSON, unknown pulls are written as null
+            records = [
+                {k: None if v != v else v for k, v in record.items()}
+                for record in self.records()
+            ]
+            with open(path, "w") as outfile:
+                json.dump(records, outfile, indent=1)
+        elif suffix == ".npz":
+            with open(path, "wb") as outfile:
+                np.savez(outfile, **self.columns())
+        elif suffix == ".parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            pq.write_table(pa.table(self.columns()), path)
+        else:
+            raise ValueError(
+                f"Unknown report format {suffix!r}, expected one of {REPORT_FORMATS}"
+            )
+
+    @classmethod
+    def read(cls, path):
+        """Read a report written to an ``.npz`` or ``.json`` file."""
+        if str(path).lower().endswith(".json"):
+            with open(path) as infile:
+                records = json.load(infile)
+            columns = {name: [record[name] for record in records] for name in COLUMNS}
+            for name in ["pyhf", "root", "root_error", "abs_diff", "rel_diff", "pull"]:
+                columns[name] = np.array(columns[name], dtype=float)
+            return cls(columns) if records else cls.concatenate([])
+        with np.load(path) as arrays:
+            return cls({name: arrays[name] for name in COLUMNS})
@@ -0,0 +1,344 @@
+"""
+Profile likelihood scans of pyhf models and their comparison with references.
+
+A scan fixes one parameter at every point of a grid and fits the others. The
+points are fitted outwards from the best fit, each one starting from the
+fitted parameters of its neighbour, and the scans of different parameters run
+in a process pool. Scans are stored in ``.npz`` files, so reference scans, for
+example from ROOT, only need to be computed once.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from . import profiling
+from .fitting import (
+    DEFAULT_MODIFIER_SETTINGS,
+    model_data,
+    parameter_names,
+    set_backend,
+)
+from .parallel import imap
+
+SCAN_FORMATS = (".csv", ".json")
+
+ProfileScan = namedtuple(
+    "ProfileScan", ["parameter", "values", "twice_nll", "twice_nll_min", "converged"]
+)
+ProfileScan.__doc__ = """
+Profile likelihood scan of ``parameter``: ``twice_nll`` is twice the negative
+log-likelihood minimized with the parameter fixed at each of its ``values``,
+``twice_nll_min`` the global minimum and ``converged`` whether each fit
+converged.
+"""
+
+ScanComparison = namedtuple(
+    "ScanComparison",
+    ["parameter", "values", "profile", "reference", "difference", "max_deviation"],
+)
+ScanComparison.__doc__ = """
+Comparison of a scan with a reference scan of the same parameter at the same
+``values``. ``profile`` and ``reference`` are twice the negative
+log-likelihoods relative to their global minima, ``difference`` their
+difference at every point and ``max_deviation`` its largest magnitude.
+"""
+
+
+def outward_order(values, center):
+    """
+    Return ``(point, neighbour)`` pairs visiting the sorted ``values`` from
+    the one closest to ``center`` outwards, where ``neighbour`` is the point
+    visited before on the same side, ``-1`` for the first point.
+
+    >>> outward_order([0.0, 1.0, 2.0, 3.0], 1.2)
+    [(1, -1), (2, 1), (3, 2), (0, 1)]
+    """
+    values = np.asarray(values)
+    if not len(values):
+        return []
+    start = int(np.argmin(np.abs(values - center)))
+    order = [(start, -1)]
+    order += [(i, i - 1) for i in range(start + 1, len(values))]
+    order += [(i, i + 1) for i in range(start - 1, -1, -1)]
+    return order
+
+
+def parameter_widths(model):
+    """
+    Return the width of the constraint of every entry of the parameter vector,
+    NaN for unconstrained parameters.
+    """
+    widths = np.full(model.config.npars, np.nan)
+    for v in model.config.par_map.values():
+        if hasattr(v["paramset"], "width"):
+            widths[v["slice"]] = v["paramset"].width()
+    return widths
+
+
+def scan_grid(model, bestfit, index, n_points=21, n_sigma=3.0):
+    """
+    Return ``n_points`` values of the parameter ``index`` spanning ``n_sigma``
+    times the width of its constraint around its best fit value, within its
+    bounds. Unconstrained parameters are scanned between their bounds.
+    """
+    low, high = model.config.suggested_bounds()[index]
+    width = parameter_widths(model)[index]
+    if np.isfinite(width):
+        low = max(low, bestfit[index] - n_sigma * width)
+        high = min(high, bestfit[index] + n_sigma * width)
+    return np.linspace(low, high, n_points)
+
+
+def profile_scan(model, data, index, values, bestfit, twice_nll_min):
+    """
+    Scan the parameter ``index`` of ``model`` at the given ``values``.
+
+    Points whose fit fails are NaN and not converged, and the next point on
+    their side starts from the last point that was fitted.
+
+    Args:
+        model: The pyhf model.
+        data: Observed and auxiliary data, see :func:`hfval.fitting.model_data`.
+        index: Position of the parameter in the parameter vector.
+        values: Sorted values of the parameter.
+        bestfit: Global best fit, the start of the fit closest to it.
+        twice_nll_min: Twice the negative log-likelihood of ``bestfit``.
+
+    Returns:
+        :class:`ProfileScan`
+    """
+    import pyhf
+
+    tensorlib, _ = pyhf.get_backend()
+    values = np.asarray(values, dtype=float)
+    fixed = list(model.config.suggested_fixed())
+    fixed[index] = True
+    twice_nll = np.full(len(values), np.nan)
+    converged = np.zeros(len(values), dtype=bool)
+    fitted = {}
+    for point, neighbour in outward_order(values, bestfit[index]):
+        init_pars = np.array(fitted[neighbour] if neighbour >= 0 else bestfit)
+        init_pars[index] = values[point]
+        try:
+            pars, fitted_val, result = pyhf.infer.mle.fit(
+                data,
+                model,
+                init_pars=init_pars.tolist(),
+                fixed_params=fixed,
+                return_fitted_val=True,
+                return_result_obj=True,
+            )
+        except pyhf.exceptions.FailedMinimization:
+            profiling.count("scan points failed")
+            fitted[point] = init_pars
+            continue
+        fitted[point] = tensorlib.to_numpy(pars)
+        twice_nll[point] = float(tensorlib.to_numpy(fitted_val))
+        converged[point] = bool(result.success)
+    profiling.count("scan points fitted", len(values))
+    return ProfileScan(
+        parameter_names(model)[index], values, twice_nll, twice_nll_min, converged
+    )
+
+
+def scan_parameters(
+    spec,
+    grids,
+    backend="numpy",
+    optimizer="scipy",
+    n_workers=None,
+    modifier_settings=None,
+):
+    """
+    Scan many parameters of a workspace concurrently, one per task.
+
+    Args:
+        spec: The workspace specification.
+        grids: Dict of the values to scan by parameter name, see
+            :func:`hfval.fitting.parameter_names`, or a callable returning it
+            given the model and the global best fit :class:`FitResult`.
+        backend: pyhf backend used by every worker.
+        optimizer: pyhf optimizer used by every worker.
+        n_workers: Number of worker processes, the number of CPUs by default.
+        modifier_settings: Interpolation codes of the model,
+            :data:`hfval.fitting.DEFAULT_MODIFIER_SETTINGS` by default.
+
+    Returns:
+        tuple: The global best fit :class:`hfval.fitting.FitResult` and a
+        list of :class:`ProfileScan` in the order of ``grids``.
+    """
+    from .fitting import _fit_model
+
+    set_backend(backend, optimizer)
+    model = _model(spec, modifier_settings)
+    with profiling.stage("best fit"):
+        bestfit = _fit_model(model, spec, "bestfit")
+    if callable(grids):
+        grids = grids(model, bestfit)
+    names = bestfit.parameters
+    unknown = [name for name in grids if name not in names]
+    if unknown:
+        raise ValueError(f"Unknown parameters {', '.join(unknown)}")
+
+    tasks = ((names.index(name), values) for name, values in grids.items())
+    with profiling.stage("profile scans"):
+        scans = list(
+            imap(
+                _scan_task,
+                tasks,
+                n_workers=n_workers,
+                initializer=_init_worker,
+                initargs=(
+                    spec,
+                    backend,
+                    optimizer,
+                    modifier_settings,
+                    bestfit.bestfit,
+                    bestfit.twice_nll,
+                ),
+            )
+        )
+    return bestfit, scans
+
+
+def _model(spec, modifier_settings=None):
+    import pyhf
+
+    return pyhf.Workspace(spec).model(
+        modifier_settings=modifier_settings or DEFAULT_MODIFIER_SETTINGS
+    )
+
+
+# The model of every worker process, built once by _init_worker
+_worker = {}
+
+
+def _init_worker(spec, backend, optimizer, modifier_settings, bestfit, twice_nll_min):
+    set_backend(backend, optimizer)
+    model = _model(spec, modifier_settings)
+    _worker.update(
+        model=model,
+        data=model_data(model, spec),
+        bestfit=bestfit,
+        twice_nll_min=twice_nll_min,
+    )
+
+
+def _scan_task(task):
+    index, values = task
+    return profile_scan(
+        _worker["model"],
+        _worker["data"],
+        index,
+        values,
+        _worker["bestfit"],
+        _worker["twice_nll_min"],
+    )
+
+
+def save_scans(path, scans):
+    """Write a list of :class:`ProfileScan` to an ``.npz`` file."""
+    lengths = [len(scan.values) for scan in scans]
+    with open(path, "wb") as outfile:
+        np.savez(
+            outfile,
+            parameters=np.asarray([scan.parameter for scan in scans], dtype=str),
+            offsets=np.concatenate([[0], np.cumsum(lengths)]).astype(np.int64),
+            values=np.concatenate([[]] + [scan.values for scan in scans]),
+            twice_nll=np.concatenate([[]] + [scan.twice_nll for scan in scans]),
+            twice_nll_min=np.asarray([scan.twice_nll_min for scan in scans]),
+            converged=np.concatenate(
+                [np.zeros(0, dtype=bool)] + [scan.converged for scan in scans]
+            ),
+        )
+
+
+def load_scans(path):
+    """Read the list of :class:`ProfileScan` of an ``.npz`` file."""
+    with np.load(path) as arrays:
+        offsets = arrays["offsets"]
+        return [
+            ProfileScan(
+                parameter,
+                arrays["values"][start:end],
+                arrays["twice_nll"][start:end],
+                float(twice_nll_min),
+                arrays["converged"][start:end],
+            )
+            for parameter, start, end, twice_nll_min in zip(
+                arrays["parameters"].tolist(),
+                offsets[:-1],
+                offsets[1:],
+                arrays["twice_nll_min"],
+            )
+        ]
+
+
+def compare_scan(scan, reference):
+    """
+    Compare a scan with a reference scan at the same values.
+
+    Each scan is taken relative to its own global minimum, so references from
+    other programs, whose likelihoods differ by constant terms, compare equal.
+
+    Returns:
+        :class:`ScanComparison`
+    """
+    if len(scan.values) != len(reference.values) or not np.allclose(
+        scan.values, reference.values
+    ):
+        raise ValueError(
+            f"The scans of {scan.parameter} and {reference.parameter}"
+            " have different values"
+        )
+    profile = scan.twice_nll - scan.twice_nll_min
+    expected = reference.twice_nll - reference.twice_nll_min
+    difference = profile - expected
+    return ScanComparison(
+        scan.parameter,
+        scan.values,
+        profile,
+        expected,
+        difference,
+        float(np.max(np.abs(difference), initial=0.0)),
+    )
+
+
+def write_comparisons(path, comparisons):
+    """
+    Write every point of :class:`ScanComparison` in the format given by the
+    suffix of ``path``.
+    """
+    import csv
+    import json
+    import os
+
+    columns = ["parameter", "value", "profile", "reference", "difference"]
+    rows = [
+        (c.parameter, *point)
+        for c in comparisons
+        for point in zip(
+            c.values.tolist(),
+            c.profile.tolist(),
+            c.reference.tolist(),
+            c.difference.tolist(),
+        )
+    ]
+    suffix = os.path.splitext(str(path))[1].lower()
+    if suffix == ".csv":
+        with open(path, "w", newline="") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(columns)
+            writer.writerows(rows)
+    elif suffix == ".json":
+        # NaN is not valid JSON, failed fits are written as null
+        records = [
+            {k: None if v != v else v for k, v in zip(columns, row)} for row in rows
+        ]
+        with open(path, "w") as outfile:
+            json.dump(records, outfile, indent=1)
+    else:
+        raise ValueError(
+            f"Unknown comparison format {suffix!r}, expected one of {SCAN_FORMATS}"
+        )
@@ -0,0 +1,462 @@
+"""
+Fault-tolerant execution of scans split into one task per signal point.
+
+A :class:`Scheduler` dispatches ``(key, payload)`` tasks through an executor,
+retries the failed ones, checkpoints every completed task and skips them when
+the scan is resumed, and merges the results in the order of the tasks. The
+executors run the tasks in a local process pool (:class:`LocalExecutor`), on
+a Dask or Ray cluster (:class:`DaskExecutor`, :class:`RayExecutor`), in a
+``pyhf-validation serve`` process keeping the models cached
+(:class:`ServerExecutor`), or through a queue of files on a shared filesystem
+(:class:`FileQueueExecutor`) drained by ``pyhf-validation worker`` processes
+started on the batch nodes.
+"""
+
+import os
+import pickle
+import socket
+import tempfile
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from . import profiling
+from .parallel import cpu_count
+
+EXECUTORS = ("local", "dask", "ray", "server", "queue")
+
+
+class TaskError(Exception):
+    """A task that failed in a worker, with the formatted traceback."""
+
+
+def make_executor(
+    name="local", n_workers=None, address=None, queue_dir=None, lease=None
+):
+    """
+    Create one of the :data:`EXECUTORS`.
+
+    Args:
+        name: Name of the executor.
+        n_workers: Number of local worker processes of the ``local``
+            executor, and of the local clusters started by ``dask`` and
+            ``ray`` without an ``address``.
+        address: Address of the Dask scheduler, Ray cluster or server, see
+            :func:`hfval.server.make_server`.
+        queue_dir: Shared directory of the ``queue`` executor.
+        lease: Seconds after which the ``queue`` executor puts tasks of
+            crashed workers back in the queue, see :class:`FileQueueExecutor`.
+    """
+    if name == "local":
+        return LocalExecutor(n_workers=n_workers)
+    if name == "dask":
+        return DaskExecutor(address=address, n_workers=n_workers)
+    if name == "ray":
+        return RayExecutor(address=address, n_workers=n_workers)
+    if name == "server":
+        return ServerExecutor(address=address)
+    if name == "queue":
+        if queue_dir is None:
+            raise ValueError("The queue executor needs a queue directory")
+        return FileQueueExecutor(queue_dir, lease=lease)
+    raise ValueError(f"Unknown executor {name!r}, expected one of {EXECUTORS}")
+
+
+class LocalExecutor:
+    """
+    Run tasks in a local process pool, in this process with a single worker.
+
+    Args:
+        n_workers: Number of worker processes, the number of CPUs by default.
+        max_pending: Maximum number of tasks submitted at once, twice the
+            number of workers by default.
+    """
+
+    def __init__(self, n_workers=None, max_pending=None):
+        self.n_workers = n_workers or cpu_count()
+        self.max_pending = max_pending or 2 * self.n_workers
+
+    def run(self, fn, tasks):
+        """
+        Apply ``fn`` to the payload of every ``(key, payload)`` task.
+
+        Yields:
+            tuple: ``(key, result, error)`` in the order the tasks complete,
+            with ``error`` the :class:`TaskError` of a failed task.
+        """
+        if self.n_workers == 1:
+            for key, payload in tasks:
+                try:
+                    yield key, fn(payload), None
+                except Exception:
+                    yield key, None, TaskError(traceback.format_exc())
+            return
+
+        with ProcessPoolExecutor(max_workers=self.n_workers) as executor:
+            pending = {}
+            tasks = iter(tasks)
+            while True:
+                for key, payload in tasks:
+                    pending[executor.submit(fn, payload)] = key
+                    if len(pending) >= self.max_pending:
+                        break
+                if not pending:
+                    return
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    key = pending.pop(future)
+                    try:
+                        yield key, future.result(), None
+                    except Exception as error:
+                        yield key, None, TaskError(_format(error))
+
+    def close(self):
+        pass
+
+
+class DaskExecutor:
+    """
+    Run tasks on a Dask cluster, requires ``dask.distributed``.
+
+    Args:
+        address: Address of the Dask scheduler, a local cluster with
+            ``n_workers`` processes is started if not given.
+        n_workers: Number of workers of the local cluster.
+    """
+
+    def __init__(self, address=None, n_workers=None):
+        from dask.distributed import Client
+
+        if address is None:
+            self.client = Client(n_workers=n_workers or cpu_count())
+        else:
+            self.client = Client(address)
+
+    def run(self, fn, tasks):
+        from dask.distributed import as_completed
+
+        futures = {
+            self.client.submit(fn, payload, pure=False): key for key, payload in tasks
+        }
+        for future in as_completed(futures):
+            key = futures.pop(future)
+            try:
+                yield key, future.result(), None
+            except Exception as error:
+                yield key, None, TaskError(_format(error))
+
+    def close(self):
+        self.client.close()
+
+
+class RayExecutor:
+    """
+    Run tasks on a Ray cluster, requires ``ray``.
+
+    Args:
+        address: Address of the Ray cluster, a local one with ``n_workers``
+            CPUs is started if not given.
+        n_workers: Number of CPUs of the local cluster.
+    """
+
+    def __init__(self, address=None, n_workers=None):
+        import ray
+
+        if address is None:
+            ray.init(num_cpus=n_workers or cpu_count(), ignore_reinit_error=True)
+        else:
+            ray.init(address=address, ignore_reinit_error=True)
+
+    def run(self, fn, tasks):
+        import ray
+
+        # The scheduler retries failed tasks itself
+        remote = ray.remote(max_retries=0)(fn)
+        refs = {remote.remote(payload): key for key, payload in tasks}
+        while refs:
+            done, _ = ray.wait(list(refs), num_returns=1)
+            key = refs.pop(done[0])
+            try:
+                yield key, ray.get(done[0]), None
+            except Exception as error:
+                yield key, None, TaskError(_format(error))
+
+    def close(self):
+        import ray
+
+        ray.shutdown()
+
+
+class ServerExecutor:
+    """
+    Run tasks one at a time in a server started with ``pyhf-validation
+    serve``, which keeps the model of every patched workspace cached.
+
+    The server handles one request at a time, so the tasks run serially: it
+    speeds up repeated runs on the same workspaces, but a grid that is not
+    cached yet runs faster on the ``local`` process pool.
+
+    Only the task functions in :data:`hfval.server.METHODS` can run in the
+    server, the results of the others would not be cached.
+
+    Args:
+        address: Address of the server, see :func:`hfval.server.make_server`.
+    """
+
+    def __init__(self, address=None):
+        from .server import Client
+
+        self.client = Client(address)
+
+    def run(self, fn, tasks):
+        from .server import METHODS, ServerError
+
+        if fn.__name__ not in METHODS:
+            raise ValueError(f"{fn.__name__} cannot run in the server")
+        for key, payload in tasks:
+            try:
+                yield key, self.client.call(fn.__name__, task=payload), None
+            except ServerError as error:
+                yield key, None, TaskError(str(error))
+
+    def close(self):
+        self.client.close()
+
+
+class FileQueueExecutor:
+    """
+    Run tasks through a queue of files in a directory on a shared filesystem.
+
+    Tasks are pickled to ``pending/``, claimed by :func:`run_worker`
+    processes by renaming them to ``running/``, and their results are written
+    to ``done/`` or ``failed/``, where they are collected by :meth:`run`. The
+    function and the results must be picklable, and the function importable
+    by the workers.
+
+    Args:
+        queue_dir: Directory of the queue.
+        poll_interval: Seconds between the checks for finished tasks.
+        lease: Seconds after which a task claimed by a worker that has not
+            finished it is put back in the queue, for workers that crashed.
+            Never by default.
+    """
+
+    def __init__(self, queue_dir, poll_interval=1.0, lease=None):
+        self.queue_dir = queue_dir
+        self.poll_interval = poll_interval
+        self.lease = lease
+        for state in ["pending", "running", "done", "failed"]:
+            os.makedirs(os.path.join(queue_dir, state), exist_ok=True)
+
+    def _path(self, state, name):
+        return os.path.join(self.queue_dir, state, name)
+
+    def run(self, fn, tasks):
+        keys = {}
+        for key, payload in tasks:
+            name = _filename(key, salt="task")
+            keys[name] = key
+            _write_pickle(self._path("pending", name), (key, fn, payload))
+
+        while keys:
+            finished = False
+            for state in ["done", "failed"]:
+                for name in os.listdir(os.path.join(self.queue_dir, state)):
+                    if name not in keys:
+                        continue
+                    path = self._path(state, name)
+                    with open(path, "rb") as infile:
+                        result = pickle.load(infile)
+                    os.remove(path)
+                    finished = True
+                    if state == "done":
+                        yield keys.pop(name), result, None
+                    else:
+                        yield keys.pop(name), None, TaskError(result)
+            if self.lease is not None:
+                self._requeue_expired(keys)
+            if not finished:
+                time.sleep(self.poll_interval)
+
+    def _requeue_expired(self, keys):
+        now = time.time()
+        for name in os.listdir(os.path.join(self.queue_dir, "running")):
+            task = name.split(".", 1)[0] + ".pkl"
+            path = self._path("running", name)
+            try:
+                expired = now - os.path.getmtime(path) > self.lease
+                if task in keys and expired:
+                    os.rename(path, self._path("pending", task))
+            except FileNotFoundError:
+                # Finished in the meantime
+                continue
+
+    def close(self):
+        pass
+
+
+def run_worker(queue_dir, poll_interval=1.0, idle_timeout=None, max_tasks=None):
+    """
+    Run the tasks of a :class:`FileQueueExecutor` queue until it stays empty.
+
+    Args:
+        queue_dir: Directory of the queue.
+        poll_interval: Seconds between the checks for new tasks.
+        idle_timeout: Stop after this many seconds without tasks, never by
+            default.
+        max_tasks: Stop after this many tasks, never by default.
+
+    Returns:
+        int: The number of tasks run.
+    """
+    worker = f"{socket.gethostname()}-{os.getpid()}"
+    pending_dir = os.path.join(queue_dir, "pending")
+    n_tasks = 0
+    idle_since = time.monotonic()
+    while max_tasks is None or n_tasks < max_tasks:
+        claimed = None
+        for name in sorted(os.listdir(pending_dir)):
+            if not name.endswith(".pkl"):
+                # Task file still being written
+                continue
+            running = os.path.join(queue_dir, "running", f"{name[:-4]}.{worker}.pkl")
+            try:
+                # Renaming is atomic, only one worker claims each task
+                os.rename(os.path.join(pending_dir, name), running)
+                # The lease starts when the task is claimed
+                os.utime(running)
+            except FileNotFoundError:
+                continue
+            claimed = name, running
+            break
+        if claimed is None:
+            if (
+                idle_timeout is not None
+                and time.monotonic() - idle_since > idle_timeout
+            ):
+                break
+            time.sleep(poll_interval)
+            continue
+
+        name, running = claimed
+        with open(running, "rb") as infile:
+            key, fn, payload = pickle.load(infile)
+        try:
+            state, result = "done", fn(payload)
+        except Exception:
+            state, result = "failed", traceback.format_exc()
+        _write_pickle(os.path.join(queue_dir, state, name), result)
+        try:
+            os.remove(running)
+        except FileNotFoundError:
+            pass
+        n_tasks += 1
+        idle_since = time.monotonic()
+    return n_tasks
+
+
+class Checkpoint:
+    """
+    Results of completed tasks, one pickle file per task key in ``directory``.
+
+    Files are written atomically, so a crash leaves no partial results.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, _filename(key, salt="checkpoint"))
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def get(self, key):
+        with open(self._path(key), "rb") as infile:
+            return pickle.load(infile)
+
+    def put(self, key, result):
+        _write_pickle(self._path(key), result)
+
+
+class Scheduler:
+    """
+    Run ``fn`` over many tasks with retries, checkpoints and resumption.
+
+    Args:
+        fn: Picklable function applied to the payload of every task.
+        executor: Executor from :func:`make_executor`, a local process pool
+            by default.
+        checkpoint_dir: Directory of the :class:`Checkpoint` of the completed
+            tasks, reused when the scan is resumed. No checkpoints by default.
+        retries: Number of times a failed task is retried.
+    """
+
+    def __init__(self, fn, executor=None, checkpoint_dir=None, retries=2):
+        self.fn = fn
+        self.executor = executor or LocalExecutor()
+        self.checkpoint = Checkpoint(checkpoint_dir) if checkpoint_dir else None
+        self.retries = retries
+        self.failed = {}
+        self.n_resumed = 0
+
+    def run(self, tasks):
+        """
+        Run the ``(key, payload)`` tasks that are not checkpointed yet.
+
+        The keys must be unique and JSON serializable. Tasks that still fail
+        after all retries are left out of the results and their last
+        :class:`TaskError` is kept in :attr:`failed`.
+
+        Returns:
+            list: ``(key, result)`` of the successful tasks, in the order of
+            ``tasks``.
+        """
+        tasks = list(tasks)
+        results = {}
+        pending = []
+        for key, payload in tasks:
+            if self.checkpoint is not None and key in self.checkpoint:
+                results[key] = self.checkpoint.get(key)
+            else:
+                pending.append((key, payload))
+        self.n_resumed = len(results)
+        profiling.count("tasks resumed", self.n_resumed)
+
+        self.failed = {}
+        for attempt in range(self.retries + 1):
+            if attempt:
+                profiling.count("tasks retried", len(pending))
+            payloads = dict(pending)
+            self.failed = {}
+            for key, result, error in self.executor.run(self.fn, pending):
+                if error is not None:
+                    self.failed[key] = error
+                    continue
+                if self.checkpoint is not None:
+                    self.checkpoint.put(key, result)
+                results[key] = result
+                profiling.count("tasks run")
+            pending = [(key, payloads[key]) for key in self.failed]
+            if not pending:
+                break
+        return [(key, results[key]) for key, _ in tasks if key in results]
+
+
+def _filename(key, salt):
+    # Imported here to keep numpy out of the command line startup
+    from .cache import digest
+
+    return digest(key, salt=salt) + ".pkl"
+
+
+def _format(error):
+    return "".join(traceback.format_exception(type(error), error, error.__traceback__))
+
+
+def _write_pickle(path, obj):
+    directory = os.path.dirname(path)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as outfile:
+        pickle.dump(obj, outfile)
+    os.replace(outfile.name, path)
@@ -0,0 +1,383 @@
+"""
+Long-lived process serving fits and hypothesis tests from cached models.
+
+``pyhf-validation serve`` keeps pyhf imported and the models of the
+workspaces it was asked about in an LRU :class:`ModelCache`, so repeated
+validations of the same workspace skip the imports and the model building,
+and repeated tasks are answered from the results kept in memory.
+Requests are JSON documents posted over HTTP, on a Unix socket or on a local
+loopback TCP port, to ``/{method}`` with the method the task function of the
+:class:`hfval.scheduler.Scheduler` it replaces (see :data:`METHODS`). The
+``server`` executor of the scheduler is a :class:`Client`.
+"""
+
+import http.client
+import http.server
+import ipaddress
+import json
+import logging
+import os
+import socket
+import socketserver
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from . import profiling
+from .cache import default_cache_dir, digest, file_identity
+from .fitting import (
+    DEFAULT_MODIFIER_SETTINGS,
+    FitResult,
+    _fit_model,
+    set_backend,
+)
+from .limits import LimitResult, hypotest_model
+
+log = logging.getLogger(__name__)
+
+DEFAULT_MAX_MODELS = 32
+DEFAULT_MAX_RESULTS = 4096
+METHODS = ("fit_patch", "hypotest_patch", "status", "shutdown")
+RESULT_TYPES = {cls.__name__: cls for cls in (FitResult, LimitResult)}
+
+
+class ServerError(Exception):
+    """A request that failed in the server, with the formatted traceback."""
+
+
+def default_address():
+    """The Unix socket ``serve.sock`` in :func:`hfval.cache.default_cache_dir`."""
+    return os.path.join(default_cache_dir(), "serve.sock")
+
+
+def encode(value):
+    """Convert results to JSON, tagging arrays and the :data:`RESULT_TYPES`."""
+    if isinstance(value, np.ndarray):
+        return {"__ndarray__": value.tolist(), "dtype": value.dtype.str}
+    if isinstance(value, tuple) and type(value).__name__ in RESULT_TYPES:
+        return {
+            "__type__": type(value).__name__,
+            **{k: encode(v) for k, v in value._asdict().items()},
+        }
+    if isinstance(value, (list, tuple)):
+        return [encode(v) for v in value]
+    if isinstance(value, dict):
+        return {k: encode(v) for k, v in value.items()}
+    return value
+
+
+def decode(value):
+    """Inverse of :func:`encode`."""
+    if isinstance(value, dict):
+        if "__ndarray__" in value:
+            return np.asarray(value["__ndarray__"], dtype=value["dtype"])
+        if "__type__" in value:
+            fields = {k: decode(v) for k, v in value.items() if k != "__type__"}
+            return RESULT_TYPES[value["__type__"]](**fields)
+        return {k: decode(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [decode(v) for v in value]
+    return value
+
+
+class ModelCache:
+    """
+    LRU cache of pyhf models of background-only workspaces patched with
+    signal patches.
+
+    A model is keyed by a hash of the identity of the workspace file (its
+    path, modification time and size, see :func:`hfval.cache.file_identity`,
+    which also resolves directories and stores to their files), the patch ops
+    and the pyhf backend, so a changed file is read again without hashing its
+    content on every request.
+
+    Args:
+        max_models: Number of models kept.
+    """
+
+    def __init__(self, max_models=DEFAULT_MAX_MODELS):
+        self.max_models = max_models
+        self.hits = 0
+        self.misses = 0
+        self._models = OrderedDict()
+        self._backgrounds = OrderedDict()
+
+    def __len__(self):
+        return len(self._models)
+
+    def get(self, background, ops, backend="numpy"):
+        """
+        Return ``(model, spec)`` of the workspace ``background`` patched with
+        ``ops``, building the model if it is not cached.
+        """
+        import jsonpatch
+        import pyhf
+
+        identity = file_identity(background)
+        key = digest(
+            {"background": identity, "ops": ops, "backend": backend}, salt="model"
+        )
+        if key in self._models:
+            self._models.move_to_end(key)
+            self.hits += 1
+            return self._models[key]
+
+        self.misses += 1
+        spec = self._background(background, identity)
+        if ops:
+            spec = jsonpatch.apply_patch(spec, ops)
+        with profiling.stage("build model"):
+            model = pyhf.Workspace(spec).model(
+                modifier_settings=DEFAULT_MODIFIER_SETTINGS
+            )
+        self._models[key] = (model, spec)
+        while len(self._models) > self.max_models:
+            self._models.popitem(last=False)
+        return model, spec
+
+    def _background(self, path, identity):
+        from .loader import load_background
+
+        key = json.dumps(identity)
+        if key not in self._backgrounds:
+            self._backgrounds[key] = load_background(path)
+            # The specs of the cached models share the background's data
+            while len(self._backgrounds) > 4:
+                self._backgrounds.popitem(last=False)
+        self._backgrounds.move_to_end(key)
+        return self._backgrounds[key]
+
+
+class ValidationService:
+    """
+    The methods of the server.
+
+    The results of the last ``max_results`` tasks are kept too, so a
+    repeated task is answered without computing it again.
+
+    Args:
+        max_models: Size of the :class:`ModelCache`.
+        max_results: Number of results kept.
+    """
+
+    def __init__(self, max_models=DEFAULT_MAX_MODELS, max_results=DEFAULT_MAX_RESULTS):
+        self.models = ModelCache(max_models)
+        self.max_results = max_results
+        self.started = time.time()
+        self.tasks = 0
+        self.results_reused = 0
+        self._results = OrderedDict()
+
+    def call(self, method, params):
+        """Run one of the :data:`METHODS` with the decoded JSON ``params``."""
+        if method in ("status", "shutdown"):
+            return self.status()
+        if method not in ("fit_patch", "hypotest_patch"):
+            raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+        self.tasks += 1
+        task = params["task"]
+        key = digest(
+            {"method": method, "task": task, "background": file_identity(task[1])},
+            salt="result",
+        )
+        if key in self._results:
+            self._results.move_to_end(key)
+            self.results_reused += 1
+            return self._results[key]
+
+        if method == "fit_patch":
+            name, background, ops, backend, optimizer = task
+            set_backend(backend, optimizer)
+            model, spec = self.models.get(background, ops, backend)
+            result = _fit_model(model, spec, name)
+        else:
+            name, background, ops, poi_value, test_stat, backend, optimizer = task
+            set_backend(backend, optimizer)
+            model, spec = self.models.get(background, ops, backend)
+            result = hypotest_model(model, spec, name, poi_value, test_stat)
+        self._results[key] = result
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+        return result
+
+    def status(self):
+        return {
+            "pid": os.getpid(),
+            "uptime": time.time() - self.started,
+            "tasks": self.tasks,
+            "results_reused": self.results_reused,
+            "models": len(self.models),
+            "max_models": self.models.max_models,
+            "hits": self.models.hits,
+            "misses": self.models.misses,
+        }
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        method = self.path.strip("/")
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+            params = json.loads(self.rfile.read(length) or b"{}")
+            body = {"result": encode(self.server.service.call(method, params))}
+            status = 200
+        except Exception:
+            body = {"error": traceback.format_exc()}
+            status = 500
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+        if method == "shutdown":
+            threading.Thread(target=self.server.shutdown).start()
+
+    def address_string(self):
+        # Unix socket clients have no address
+        return str(self.client_address or "local")
+
+    def log_message(self, format, *args):
+        log.debug(format, *args)
+
+
+class _UnixServer(socketserver.UnixStreamServer):
+    def server_bind(self):
+        super().server_bind()
+        # Only the user running the server can connect
+        os.chmod(self.server_address, 0o600)
+
+
+def make_server(address=None, max_models=DEFAULT_MAX_MODELS):
+    """
+    Create the server, listening on ``address``.
+
+    Args:
+        address: Path of a Unix socket, :func:`default_address` by default, or
+            an ``http://host:port`` URL with a loopback host. The server has
+            no authentication and reads the files named in the requests, so
+            it does not listen on other interfaces.
+        max_models: Size of the :class:`ModelCache`.
+
+    Returns:
+        :class:`socketserver.BaseServer` with a ``service`` attribute, whose
+        ``serve_forever`` handles the requests one at a time.
+
+    Raises:
+        ValueError: If the host of an ``http://`` address is not a loopback
+            address.
+    """
+    address = address or default_address()
+    if address.startswith("http://"):
+        url = urlsplit(address)
+        if not _is_loopback(url.hostname):
+            raise ValueError(
+                f"The server only listens on loopback addresses, not {url.hostname}"
+            )
+        server = http.server.HTTPServer((url.hostname, url.port), _Handler)
+    else:
+        if os.path.exists(address):
+            if _is_alive(address):
+                raise RuntimeError(f"A server is already listening on {address}")
+            # Left behind by a server that did not shut down cleanly
+            os.unlink(address)
+        os.makedirs(os.path.dirname(os.path.abspath(address)), exist_ok=True)
+        server = _UnixServer(address, _Handler)
+    server.service = ValidationService(max_models)
+    return server
+
+
+def _is_loopback(host):
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _is_alive(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+
+class _UnixConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout=None):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+class Client:
+    """
+    Client of a server created by :func:`make_server`.
+
+    Args:
+        address: Address of the server, see :func:`make_server`.
+        timeout: Timeout of the requests in seconds, none by default.
+    """
+
+    def __init__(self, address=None, timeout=None):
+        self.address = address or default_address()
+        self.timeout = timeout
+        self._connection = None
+
+    def _connect(self):
+        if self.address.startswith("http://"):
+            url = urlsplit(self.address)
+            return http.client.HTTPConnection(
+                url.hostname, url.port, timeout=self.timeout
+            )
+        return _UnixConnection(self.address, timeout=self.timeout)
+
+    def call(self, method, **params):
+        """
+        Run one of the :data:`METHODS` in the server.
+
+        Raises:
+            ServerError: If the method failed in the server.
+        """
+        body = json.dumps(encode(params))
+        # Reconnect once if the server closed the kept-alive connection
+        for attempt in range(2):
+            if self._connection is None:
+                self._connection = self._connect()
+            try:
+                self._connection.request(
+                    "POST",
+                    f"/{method}",
+                    body=body,
+                    headers={"Content-Type": "application/json"},
+                )
+                response = self._connection.getresponse()
+                data = json.loads(response.read())
+                break
+            except (http.client.RemoteDisconnected, BrokenPipeError):
+                self.close()
+                if attempt:
+                    raise
+        if method == "shutdown":
+            self.close()
+        if "error" in data:
+            raise ServerError(data["error"])
+        return decode(data["result"])
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
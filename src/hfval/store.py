@@ -0,0 +1,350 @@
+"""
+Columnar store of a workspace and its signal patches, read through memory maps.
+
+:func:`write_store` converts the JSON likelihoods once into a directory of
+``.npy`` arrays. Every sample of the background and every sample added by a
+signal patch is a row, with its nominal rates and the data of its modifiers
+concatenated into flat float64 arrays addressed by offsets, and all names are
+interned in a string table. :class:`ColumnarStore` maps the arrays into
+memory, so opening a store takes milliseconds and worker processes reading
+the same store share its pages.
+"""
+
+import json
+import os
+import re
+
+import numpy as np
+
+from . import jsonio, profiling
+from .loader import named_patches
+from .systematics import PatchBatch
+
+STORE_VERSION = 1
+META_FILE = "store.json"
+MODIFIER_TYPES = (
+    "histosys",
+    "normsys",
+    "staterror",
+    "shapesys",
+    "normfactor",
+    "shapefactor",
+    "lumi",
+)
+COLUMNS = {
+    # One entry per sample row, the offsets have one entry more
+    "sample_signal": np.int32,
+    "sample_channel": np.int32,
+    "sample_name": np.int32,
+    "sample_path": np.int32,
+    "sample_offset": np.int64,
+    "sample_modifiers": np.int64,
+    "nominal": np.float64,
+    # One entry per modifier
+    "modifier_name": np.int32,
+    "modifier_type": np.int8,
+    "modifier_offset": np.int64,
+    "modifier_hi": np.float64,
+    "modifier_lo": np.float64,
+    # One entry per signal point
+    "signal_name": np.int32,
+}
+
+_SAMPLE_PATH = re.compile(r"^/channels/(\d+)/samples/(\d+|-)$")
+
+
+def is_store(path):
+    """Return whether ``path`` is a directory written by :func:`write_store`."""
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+def write_store(path, spec, patches=()):
+    """
+    Convert a workspace and its signal patches into a columnar store.
+
+    The samples added by the ``add`` ops of the patches are stored as columns,
+    the other ops are kept as they are.
+
+    Args:
+        path: Directory of the store, created if needed.
+        spec: Background-only workspace specification.
+        patches: Iterable of signal patches or pyhf ``PatchSet`` documents,
+            see :func:`hfval.loader.named_patches`.
+
+    Returns:
+        ColumnarStore: The store that was written.
+    """
+    writer = _StoreWriter()
+    for c, channel in enumerate(spec["channels"]):
+        for s, sample in enumerate(channel["samples"]):
+            writer.add_sample(-1, c, f"/channels/{c}/samples/{s}", sample)
+
+    stored_patches = []
+    for signal, (name, ops) in enumerate(named_patches(patches)):
+        writer.columns["signal_name"].append(writer.intern(name))
+        stored_ops = []
+        for op in ops:
+            match = _SAMPLE_PATH.match(op.get("path", ""))
+            if op["op"] == "add" and match and isinstance(op.get("value"), dict):
+                row = writer.add_sample(signal, int(match[1]), op["path"], op["value"])
+                stored_ops.append({"op": "add", "path": op["path"], "row": row})
+            else:
+                stored_ops.append(op)
+        stored_patches.append(stored_ops)
+
+    os.makedirs(path, exist_ok=True)
+    for name, dtype in COLUMNS.items():
+        np.save(
+            os.path.join(path, f"{name}.npy"),
+            np.asarray(writer.columns[name], dtype=dtype),
+        )
+    meta = {
+        "version": STORE_VERSION,
+        "strings": writer.strings,
+        "channels": [channel["name"] for channel in spec["channels"]],
+        "workspace": {k: v for k, v in spec.items() if k != "channels"},
+        "patches": stored_patches,
+    }
+    with open(os.path.join(path, META_FILE), "w") as outfile:
+        json.dump(meta, outfile)
+    return ColumnarStore(path)
+
+
+class _StoreWriter:
+    def __init__(self):
+        self.columns = {name: [] for name in COLUMNS}
+        self.columns["sample_offset"].append(0)
+        self.columns["sample_modifiers"].append(0)
+        self.columns["modifier_offset"].append(0)
+        self.strings = []
+        self._codes = {}
+
+    def intern(self, name):
+        if name not in self._codes:
+            self._codes[name] = len(self.strings)
+            self.strings.append(name)
+        return self._codes[name]
+
+    def add_sample(self, signal, channel, path, sample):
+        columns = self.columns
+        columns["sample_signal"].append(signal)
+        columns["sample_channel"].append(channel)
+        columns["sample_name"].append(self.intern(sample["name"]))
+        columns["sample_path"].append(self.intern(path))
+        columns["nominal"].extend(sample["data"])
+        columns["sample_offset"].append(len(columns["nominal"]))
+        for modifier in sample.get("modifiers", []):
+            if modifier["type"] not in MODIFIER_TYPES:
+                raise ValueError(f"Unsupported modifier type {modifier['type']!r}")
+            hi, lo = _variations(modifier)
+            columns["modifier_name"].append(self.intern(modifier["name"]))
+            columns["modifier_type"].append(MODIFIER_TYPES.index(modifier["type"]))
+            columns["modifier_hi"].extend(hi)
+            columns["modifier_lo"].extend(lo)
+            columns["modifier_offset"].append(len(columns["modifier_hi"]))
+        columns["sample_modifiers"].append(len(columns["modifier_name"]))
+        return len(columns["sample_signal"]) - 1
+
+
+def _variations(modifier):
+    data = modifier["data"]
+    if modifier["type"] == "histosys":
+        return data["hi_data"], data["lo_data"]
+    if modifier["type"] == "normsys":
+        return [data["hi"]], [data["lo"]]
+    if data is None:
+        return [], []
+    # staterror and shapesys uncertainties
+    return data, [0.0] * len(data)
+
+
+def _ranges(offsets, idx):
+    """Concatenate the positions ``offsets[i]:offsets[i + 1]`` of every ``i`` in ``idx``."""
+    starts = offsets[idx]
+    lengths = offsets[idx + 1] - starts
+    ends = np.cumsum(lengths)
+    total = ends[-1] if len(ends) else 0
+    return np.repeat(starts - (ends - lengths), lengths) + np.arange(total)
+
+
+class ColumnarStore:
+    """
+    Memory-mapped columns of a store written by :func:`write_store`.
+
+    The arrays of :data:`COLUMNS` are attributes, ``strings`` is the string
+    table their ``*_name`` and ``sample_path`` codes refer to. The rows of the
+    background samples have ``sample_signal == -1``.
+
+    Args:
+        path: Directory of the store.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.meta = jsonio.load(os.path.join(path, META_FILE))
+        if self.meta["version"] != STORE_VERSION:
+            raise ValueError(
+                f"{path} is a version {self.meta['version']} store,"
+                f" expected version {STORE_VERSION}"
+            )
+        self.strings = self.meta["strings"]
+        for name in COLUMNS:
+            filename = os.path.join(path, f"{name}.npy")
+            setattr(self, name, np.load(filename, mmap_mode="r"))
+        profiling.count("stores opened")
+
+    def __len__(self):
+        return len(self.sample_signal)
+
+    @property
+    def channels(self):
+        return self.meta["channels"]
+
+    @property
+    def signals(self):
+        return [self.strings[code] for code in self.signal_name]
+
+    def channel_nbins(self):
+        """Return the number of bins of every background channel."""
+        rows = np.flatnonzero(self.sample_signal == -1)
+        nbins = np.diff(self.sample_offset)
+        result = {}
+        for row in rows.tolist():
+            name = self.channels[self.sample_channel[row]]
+            result.setdefault(name, int(nbins[row]))
+        return result
+
+    def sample(self, row):
+        """Return the JSON specification of the sample in row ``row``."""
+        start, end = self.sample_offset[row], self.sample_offset[row + 1]
+        modifiers = []
+        for m in range(self.sample_modifiers[row], self.sample_modifiers[row + 1]):
+            hi = self.modifier_hi[self.modifier_offset[m] : self.modifier_offset[m + 1]]
+            lo = self.modifier_lo[self.modifier_offset[m] : self.modifier_offset[m + 1]]
+            kind = MODIFIER_TYPES[self.modifier_type[m]]
+            if kind == "histosys":
+                data = {"hi_data": hi.tolist(), "lo_data": lo.tolist()}
+            elif kind == "normsys":
+                data = {"hi": float(hi[0]), "lo": float(lo[0])}
+            elif len(hi):
+                data = hi.tolist()
+            else:
+                data = None
+            modifiers.append(
+                {
+                    "name": self.strings[self.modifier_name[m]],
+                    "type": kind,
+                    "data": data,
+                }
+            )
+        return {
+            "name": self.strings[self.sample_name[row]],
+            "data": self.nominal[start:end].tolist(),
+            "modifiers": modifiers,
+        }
+
+    def workspace(self):
+        """Return the background-only workspace specification."""
+        channels = [{"name": name, "samples": []} for name in self.channels]
+        for row in np.flatnonzero(self.sample_signal == -1).tolist():
+            channels[self.sample_channel[row]]["samples"].append(self.sample(row))
+        return {"channels": channels, **self.meta["workspace"]}
+
+    def patches(self):
+        """Yield ``(name, ops)`` for every stored signal patch."""
+        for name, ops in zip(self.signals, self.meta["patches"]):
+            yield name, [
+                (
+                    {"op": "add", "path": op["path"], "value": self.sample(op["row"])}
+                    if "row" in op
+                    else op
+                )
+                for op in ops
+            ]
+
+    def patch_batch(self, rows):
+        """
+        Stack the samples in ``rows`` into a :class:`hfval.systematics.PatchBatch`.
+
+        Only their histosys and normsys modifiers are kept, and the keys are
+        ``(signal, path)`` like for the ops of the signal patches.
+        """
+        rows = np.asarray(rows, dtype=np.intp)
+        nbins = np.diff(self.sample_offset)[rows]
+        max_bins = nbins.max(initial=0)
+        bin_mask = np.arange(max_bins) < nbins[:, np.newaxis]
+        nom = np.zeros((len(rows), max_bins))
+        nom[bin_mask] = self.nominal[_ranges(self.sample_offset, rows)]
+
+        # Owner position in rows of every modifier of the rows
+        modifiers = _ranges(self.sample_modifiers, rows)
+        owner = np.repeat(np.arange(len(rows)), np.diff(self.sample_modifiers)[rows])
+        types = self.modifier_type[modifiers]
+
+        histo = types == MODIFIER_TYPES.index("histosys")
+        n_histo = np.bincount(owner[histo], minlength=len(rows))
+        histo_mask = np.arange(n_histo.max(initial=0)) < n_histo[:, np.newaxis]
+        template_mask = histo_mask[:, :, np.newaxis] & bin_mask[:, np.newaxis, :]
+        values = _ranges(self.modifier_offset, modifiers[histo])
+        if values.size != template_mask.sum():
+            raise ValueError(
+                "Modifier data does not have the same number of bins as the sample"
+            )
+        histo_hi = np.zeros(template_mask.shape)
+        histo_lo = np.zeros(template_mask.shape)
+        histo_hi[template_mask] = self.modifier_hi[values]
+        histo_lo[template_mask] = self.modifier_lo[values]
+
+        norm = types == MODIFIER_TYPES.index("normsys")
+        n_norm = np.bincount(owner[norm], minlength=len(rows))
+        norm_mask = np.arange(n_norm.max(initial=0)) < n_norm[:, np.newaxis]
+        values = self.modifier_offset[modifiers[norm]]
+        norm_hi = np.zeros(norm_mask.shape)
+        norm_lo = np.zeros(norm_mask.shape)
+        norm_hi[norm_mask] = self.modifier_hi[values]
+        norm_lo[norm_mask] = self.modifier_lo[values]
+
+        names = [self.strings[code] for code in self.modifier_name[modifiers]]
+        histo_names = [[] for _ in rows]
+        norm_names = [[] for _ in rows]
+        for position, name, is_histo, is_norm in zip(
+            owner.tolist(), names, histo.tolist(), norm.tolist()
+        ):
+            if is_histo:
+                histo_names[position].append(name)
+            elif is_norm:
+                norm_names[position].append(name)
+
+        signals = self.signals
+        keys = [
+            (signals[signal], self.strings[path])
+            for signal, path in zip(
+                self.sample_signal[rows].tolist(), self.sample_path[rows].tolist()
+            )
+        ]
+        return PatchBatch(
+            keys,
+            nbins,
+            nom,
+            histo_hi,
+            histo_lo,
+            n_histo,
+            norm_hi,
+            norm_lo,
+            n_norm,
+            histo_names,
+            norm_names,
+        )
+
+    def iter_summaries(self, batch_size=256):
+        """
+        Yield the summaries of the signal samples, like
+        :func:`hfval.systematics.iter_summaries` of the patch ops.
+        """
+        rows = np.flatnonzero(self.sample_signal >= 0)
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start : start + batch_size]
+            with profiling.stage("summarize patches"):
+                summaries = list(self.patch_batch(batch).summaries())
+            profiling.count("patch ops processed", len(batch))
+            yield from summaries
@@ -0,0 +1,218 @@
+"""Synthetic HistFactory workspaces and signal patches for tests and benchmarks."""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def make_workspace(
+    n_channels=4, n_bins=5, n_samples=3, n_modifiers=10, seed=0, measurement=True
+):
+    """
+    Make a background-only workspace specification.
+
+    Every channel ``SR_{c}`` has ``n_bins`` bins and ``n_samples`` background
+    samples. Each sample has a staterror and ``n_modifiers`` systematics,
+    alternating between normsys and histosys and shared by all samples and
+    channels, like the experimental systematics of an analysis.
+
+    Args:
+        n_channels: Number of channels.
+        n_bins: Number of bins of every channel.
+        n_samples: Number of background samples in every channel.
+        n_modifiers: Number of normsys and histosys modifiers of every sample.
+        seed: Seed of the random yields and variations.
+        measurement: Also add a ``lumi`` modifier to every sample and a
+            ``mu_bkg`` normfactor to ``bkg_0``, and configure the lumi, the
+            bounds of ``mu_bkg`` and a fixed ``syst_0`` in the measurement,
+            like in the likelihoods of an analysis.
+
+    Returns:
+        dict: The workspace specification, with the parameter of interest
+        ``mu_SIG`` of the signal added by :func:`make_patches`.
+    """
+    rng = np.random.default_rng(seed)
+    channels = []
+    observations = []
+    for c in range(n_channels):
+        samples = []
+        total = np.zeros(n_bins)
+        for s in range(n_samples):
+            nom = rng.uniform(10.0, 100.0, n_bins)
+            total += nom
+            modifiers = [
+                {
+                    "name": f"staterror_SR_{c}",
+                    "type": "staterror",
+                    "data": np.sqrt(nom).tolist(),
+                }
+            ]
+            modifiers += make_modifiers(rng, nom, n_modifiers, prefix="syst")
+            if measurement:
+                modifiers.append({"name": "lumi", "type": "lumi", "data": None})
+                if s == 0:
+                    modifiers.append(
+                        {"name": "mu_bkg", "type": "normfactor", "data": None}
+                    )
+            samples.append(
+                {"name": f"bkg_{s}", "data": nom.tolist(), "modifiers": modifiers}
+            )
+        channels.append({"name": f"SR_{c}", "samples": samples})
+        observations.append({"name": f"SR_{c}", "data": np.round(total).tolist()})
+    parameters = [{"name": "mu_SIG", "bounds": [[0.0, 10.0]], "inits": [1.0]}]
+    if measurement:
+        parameters += [
+            {
+                "name": "lumi",
+                "auxdata": [1.0],
+                "sigmas": [0.017],
+                "bounds": [[0.915, 1.085]],
+                "inits": [1.0],
+            },
+            {"name": "mu_bkg", "bounds": [[0.5, 2.0]], "inits": [1.0]},
+        ]
+        if n_modifiers:
+            parameters.append({"name": "syst_0", "fixed": True, "inits": [0.0]})
+    return {
+        "channels": channels,
+        "observations": observations,
+        "measurements": [
+            {"name": "meas", "config": {"poi": "mu_SIG", "parameters": parameters}}
+        ],
+        "version": "1.0.0",
+    }
+
+
+def make_modifiers(rng, nom, n_modifiers, prefix="syst"):
+    """Make ``n_modifiers`` alternating normsys and histosys modifiers."""
+    modifiers = []
+    for i in range(n_modifiers):
+        if i % 2:
+            modifiers.append(
+                {
+                    "name": f"{prefix}_{i}",
+                    "type": "histosys",
+                    "data": {
+                        "hi_data": (nom * rng.uniform(1.0, 1.3, nom.size)).tolist(),
+                        "lo_data": (nom * rng.uniform(0.7, 1.0, nom.size)).tolist(),
+                    },
+                }
+            )
+        else:
+            modifiers.append(
+                {
+                    "name": f"{prefix}_{i}",
+                    "type": "normsys",
+                    "data": {
+                        "hi": float(rng.uniform(1.0, 1.3)),
+                        "lo": float(rng.uniform(0.7, 1.0)),
+                    },
+                }
+            )
+    return modifiers
+
+
+def signal_masses(n_points):
+    """Return ``n_points`` distinct ``(m1, m2)`` pairs on a triangular grid."""
+    masses = []
+    m1 = 300
+    while len(masses) < n_points:
+        for m2 in range(0, m1 - 100, 50):
+            masses.append((m1, m2))
+        m1 += 100
+    return masses[:n_points]
+
+
+def make_patches(workspace, n_points=20, n_modifiers=10, seed=1):
+    """
+    Make a signal patch adding a sample to every channel for each mass point.
+
+    The signal of the point ``(m1, m2)`` is named ``signal_{m1}_{m2}``, so the
+    signal template is ``signal_{a}_{b}``.
+
+    Args:
+        workspace: Specification from :func:`make_workspace`.
+        n_points: Number of signal points.
+        n_modifiers: Number of normsys and histosys modifiers of the signal.
+        seed: Seed of the random yields and variations.
+
+    Returns:
+        list: One list of JSON patch ops per signal point.
+    """
+    rng = np.random.default_rng(seed)
+    patches = []
+    for m1, m2 in signal_masses(n_points):
+        name = f"signal_{m1}_{m2}"
+        ops = []
+        for c, channel in enumerate(workspace["channels"]):
+            nom = rng.uniform(0.5, 20.0, len(channel["samples"][0]["data"]))
+            modifiers = [{"name": "mu_SIG", "type": "normfactor", "data": None}]
+            modifiers += make_modifiers(rng, nom, n_modifiers, prefix="sig_syst")
+            ops.append(
+                {
+                    "op": "add",
+                    "path": f"/channels/{c}/samples/{len(channel['samples'])}",
+                    "value": {
+                        "name": name,
+                        "data": nom.tolist(),
+                        "modifiers": modifiers,
+                    },
+                }
+            )
+        patches.append(ops)
+    return patches
+
+
+def make_patchset(workspace, patches):
+    """Wrap signal patches from :func:`make_patches` in a pyhf ``PatchSet``."""
+    return {
+        "metadata": {
+            "description": "synthetic signal patches",
+            # The digest pyhf checks before applying a patch to the workspace
+            "digests": {"sha256": workspace_digest(workspace)},
+            "labels": ["m1", "m2"],
+            # The schema requires a HEPData record, there is none for synthetic data
+            "references": {"hepdata": "ins0000000"},
+        },
+        "patches": [
+            {
+                "metadata": {
+                    "name": patch[0]["value"]["name"],
+                    "values": [
+                        int(mass) for mass in patch[0]["value"]["name"].split("_")[1:]
+                    ],
+                },
+                "patch": patch,
+            }
+            for patch in patches
+        ],
+        "version": "1.0.0",
+    }
+
+
+def workspace_digest(workspace):
+    """SHA-256 digest of a workspace, like :func:`pyhf.utils.digest`."""
+    stringified = json.dumps(workspace, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(stringified.encode("utf8")).hexdigest()
+
+
+def write_likelihoods(directory, workspace, patches, patchset=False):
+    """
+    Write ``BkgOnly.json`` and the signal patches to ``directory``.
+
+    The patches are written as one ``patch_{name}.json`` file each, or as a
+    single ``patchset.json`` if ``patchset`` is true.
+    """
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, "BkgOnly.json"), "w") as outfile:
+        json.dump(workspace, outfile)
+    if patchset:
+        with open(os.path.join(directory, "patchset.json"), "w") as outfile:
+            json.dump(make_patchset(workspace, patches), outfile)
+        return
+    for patch in patches:
+        name = patch[0]["value"]["name"]
+        with open(os.path.join(directory, f"patch_{name}.json"), "w") as outfile:
+            json.dump(patch, outfile)
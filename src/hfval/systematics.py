@@ -0,0 +1,710 @@
+"""Relative size of the systematic variations of HistFactory samples."""
+
+from collections import namedtuple
+from itertools import chain, islice
+
+import numpy as np
+
+from . import profiling
+from .cache import digest
+
+# Bump to invalidate cached summaries when their computation changes
+SUMMARY_VERSION = 1
+
+WorkspaceSysts = namedtuple(
+    "WorkspaceSysts",
+    [
+        "samples",
+        "channels",
+        "nbins",
+        "nom",
+        "rel",
+        "histosys",
+        "normsys",
+        "staterror",
+        "shapesys",
+    ],
+)
+WorkspaceSysts.__doc__ = """
+Result of :func:`workspace_systs`.
+
+``nom``, ``rel`` and the absolute uncertainties of each modifier type added in
+quadrature (``histosys``, ``normsys``, ``staterror``, ``shapesys``) have shape
+``(n_samples, n_channels, max_bins)``, indexed like ``samples`` and
+``channels``, and are NaN for samples missing in a channel and for the bins
+beyond the ``nbins`` of a channel.
+"""
+
+
+def handle_deltas(delta_up, delta_dn):
+    nom_is_center = np.bitwise_or(
+        np.bitwise_and(delta_up > 0, delta_dn > 0),
+        np.bitwise_and(delta_up <= 0, delta_dn <= 0),
+    )
+    span = delta_dn + delta_up
+    maxdel = np.maximum(np.abs(delta_dn), np.abs(delta_dn))
+    abs_unc = np.where(nom_is_center, span, maxdel)
+    return abs_unc
+
+
+def process_patch(p):
+    nom = np.asarray(p["value"]["data"])
+
+    # histosys
+    hid = np.asarray(
+        [
+            m["data"]["hi_data"]
+            for m in p["value"]["modifiers"]
+            if m["type"] == "histosys"
+        ]
+    )
+    lod = np.asarray(
+        [
+            m["data"]["lo_data"]
+            for m in p["value"]["modifiers"]
+            if m["type"] == "histosys"
+        ]
+    )
+    delta_up = hid - nom
+    delta_dn = nom - lod
+    histo_deltas = handle_deltas(delta_up, delta_dn)
+
+    hi = np.asarray(
+        [m["data"]["hi"] for m in p["value"]["modifiers"] if m["type"] == "normsys"]
+    )
+    lo = np.asarray(
+        [m["data"]["lo"] for m in p["value"]["modifiers"] if m["type"] == "normsys"]
+    )
+    delta_up = np.asarray([delta * nom - nom for delta in hi])
+    delta_dn = np.asarray([delta * nom - nom for delta in lo])
+    norm_deltas = handle_deltas(delta_up, delta_dn)
+
+    stat_deltas = np.zeros_like(
+        histo_deltas
+    )  # Don't consider the stat error for this calculation
+
+    systs = np.concatenate([histo_deltas, norm_deltas, stat_deltas])
+    inquad = np.sqrt(np.sum(np.square(systs), axis=0))
+    rel = inquad / nom
+    rel = np.where(nom == 0, np.ones_like(nom), rel)
+    return rel, nom
+
+
+def signal_name(patch, metadata=None):
+    """
+    Return the name of a signal patch.
+
+    A patch of a pyhf ``PatchSet`` is named by its ``metadata``, a patch file
+    after the sample its first op adds.
+    """
+    if metadata is not None:
+        return metadata["name"]
+    value = patch[0].get("value") if patch else None
+    return value.get("name", "") if isinstance(value, dict) else ""
+
+
+def add_ops(patches):
+    """
+    Yield ``(signal, op)`` for every ``add`` op of the signal patches, named
+    by :func:`signal_name`.
+    """
+    for patch in patches:
+        if "value" not in patch[0]:
+            continue
+        signal = signal_name(patch)
+        for op in patch:
+            if op["op"] == "add":
+                yield signal, op
+
+
+class PatchBatch:
+    """
+    The ``add`` ops of many signal patches stacked into padded tensors.
+
+    Row ``k`` of every tensor belongs to ``keys[k] == (signal, path)``. The
+    nominal rates have shape ``(n_ops, max_bins)``, the histosys templates
+    ``(n_ops, max_histosys, max_bins)`` and the normsys factors
+    ``(n_ops, max_normsys)``. Padded entries are zero and excluded by the
+    ``*_mask`` properties.
+    """
+
+    def __init__(
+        self,
+        keys,
+        nbins,
+        nom,
+        histo_hi,
+        histo_lo,
+        n_histo,
+        norm_hi,
+        norm_lo,
+        n_norm,
+        histo_names,
+        norm_names,
+    ):
+        self.keys = keys
+        self.nbins = nbins
+        self.nom = nom
+        self.histo_hi = histo_hi
+        self.histo_lo = histo_lo
+        self.n_histo = n_histo
+        self.norm_hi = norm_hi
+        self.norm_lo = norm_lo
+        self.n_norm = n_norm
+        self.histo_names = histo_names
+        self.norm_names = norm_names
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_ops(cls, ops):
+        """Stack an iterable of ``(signal, op)`` pairs, see :func:`add_ops`."""
+        keys = []
+        noms = []
+        hi_data = []
+        lo_data = []
+        hi = []
+        lo = []
+        histo_names = []
+        norm_names = []
+        for signal, op in ops:
+            value = op["value"]
+            keys.append((signal, op["path"]))
+            noms.append(value["data"])
+            op_histo_names = []
+            op_norm_names = []
+            for m in value["modifiers"]:
+                if m["type"] == "histosys":
+                    hi_data.append(m["data"]["hi_data"])
+                    lo_data.append(m["data"]["lo_data"])
+                    op_histo_names.append(m["name"])
+                elif m["type"] == "normsys":
+                    hi.append(m["data"]["hi"])
+                    lo.append(m["data"]["lo"])
+                    op_norm_names.append(m["name"])
+            histo_names.append(op_histo_names)
+            norm_names.append(op_norm_names)
+
+        nbins = np.asarray([len(n) for n in noms], dtype=int)
+        n_histo = np.asarray([len(n) for n in histo_names], dtype=int)
+        n_norm = np.asarray([len(n) for n in norm_names], dtype=int)
+        n_ops = len(keys)
+        max_bins = nbins.max(initial=0)
+        max_histo = n_histo.max(initial=0)
+        max_norm = n_norm.max(initial=0)
+
+        # Boolean masks enumerate the valid entries in the same (op, modifier,
+        # bin) order as the flattened JSON lists
+        bin_mask = np.arange(max_bins) < nbins[:, np.newaxis]
+        histo_mask = np.arange(max_histo) < n_histo[:, np.newaxis]
+        norm_mask = np.arange(max_norm) < n_norm[:, np.newaxis]
+        template_mask = histo_mask[:, :, np.newaxis] & bin_mask[:, np.newaxis, :]
+
+        nom = np.zeros((n_ops, max_bins))
+        nom[bin_mask] = _flatten(noms, bin_mask.sum())
+        histo_hi = np.zeros((n_ops, max_histo, max_bins))
+        histo_lo = np.zeros((n_ops, max_histo, max_bins))
+        histo_hi[template_mask] = _flatten(hi_data, template_mask.sum())
+        histo_lo[template_mask] = _flatten(lo_data, template_mask.sum())
+        norm_hi = np.zeros((n_ops, max_norm))
+        norm_lo = np.zeros((n_ops, max_norm))
+        norm_hi[norm_mask] = np.asarray(hi, dtype=float)
+        norm_lo[norm_mask] = np.asarray(lo, dtype=float)
+
+        return cls(
+            keys,
+            nbins,
+            nom,
+            histo_hi,
+            histo_lo,
+            n_histo,
+            norm_hi,
+            norm_lo,
+            n_norm,
+            histo_names,
+            norm_names,
+        )
+
+    @classmethod
+    def from_patches(cls, patches):
+        """Stack the ``add`` ops of a list of signal patch files."""
+        return cls.from_ops(add_ops(patches))
+
+    @property
+    def bin_mask(self):
+        return np.arange(self.nom.shape[1]) < self.nbins[:, np.newaxis]
+
+    @property
+    def histo_mask(self):
+        return np.arange(self.histo_hi.shape[1]) < self.n_histo[:, np.newaxis]
+
+    @property
+    def norm_mask(self):
+        return np.arange(self.norm_hi.shape[1]) < self.n_norm[:, np.newaxis]
+
+    def deltas(self):
+        """
+        Return the histosys and normsys uncertainties from :func:`handle_deltas`.
+
+        The arrays have shapes ``(n_ops, max_histosys, max_bins)`` and
+        ``(n_ops, max_normsys, max_bins)`` and are zero for padded modifiers.
+        """
+        nom = self.nom[:, np.newaxis, :]
+        histo_deltas = handle_deltas(self.histo_hi - nom, nom - self.histo_lo)
+        norm_hi = self.norm_hi[:, :, np.newaxis]
+        norm_lo = self.norm_lo[:, :, np.newaxis]
+        norm_deltas = handle_deltas(norm_hi * nom - nom, norm_lo * nom - nom)
+        histo_deltas = np.where(self.histo_mask[:, :, np.newaxis], histo_deltas, 0.0)
+        norm_deltas = np.where(self.norm_mask[:, :, np.newaxis], norm_deltas, 0.0)
+        return histo_deltas, norm_deltas
+
+    def rel_systs(self):
+        """
+        Return the relative size of the systematics added in quadrature.
+
+        Equivalent to applying :func:`process_patch` to every op, with the
+        result padded to ``(n_ops, max_bins)``.
+        """
+        histo_deltas, norm_deltas = self.deltas()
+        squares = np.square(np.concatenate([histo_deltas, norm_deltas], axis=1))
+        # The zero padding between and after the modifiers does not change the
+        # bin-wise sequential sum over modifiers
+        inquad = np.sqrt(np.sum(squares, axis=1))
+
+        # For a single bin, process_patch sums a contiguous column, which numpy
+        # does pairwise, so the exact layout of the modifiers matters
+        single_bin = self.nbins == 1
+        if single_bin.any():
+            groups = np.stack([self.n_histo, self.n_norm], axis=1)[single_bin]
+            idx_single = np.flatnonzero(single_bin)
+            for n_histo, n_norm in np.unique(groups, axis=0):
+                idx = idx_single[(groups[:, 0] == n_histo) & (groups[:, 1] == n_norm)]
+                systs = np.concatenate(
+                    [
+                        histo_deltas[idx, :n_histo, 0],
+                        norm_deltas[idx, :n_norm, 0],
+                        np.zeros((idx.size, n_histo)),
+                    ],
+                    axis=1,
+                )
+                inquad[idx, 0] = np.sqrt(np.sum(np.square(systs), axis=1))
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel = inquad / self.nom
+        rel = np.where(self.nom == 0, np.ones_like(self.nom), rel)
+        return rel
+
+    def to_dict(self, rel=None):
+        """
+        Return ``{signal: {path: (rel, nom)}}`` with unpadded arrays.
+
+        Args:
+            rel: Precomputed result of :meth:`rel_systs`, computed if not given.
+        """
+        if rel is None:
+            rel = self.rel_systs()
+        data = {}
+        for k, (signal, path) in enumerate(self.keys):
+            nbins = self.nbins[k]
+            data.setdefault(signal, {})[path] = (rel[k, :nbins], self.nom[k, :nbins])
+        return data
+
+    def summaries(self, rel=None):
+        """
+        Yield the unpadded results of every op as ``(key, summary)``.
+
+        The summary holds the relative size of the systematics in quadrature
+        (``rel``), the nominal rates (``nom``) and the relative size of each
+        histosys and normsys modifier with their names.
+
+        Args:
+            rel: Precomputed result of :meth:`rel_systs`, computed if not given.
+        """
+        if rel is None:
+            rel = self.rel_systs()
+        histo_deltas, norm_deltas = self.deltas()
+        nom = self.nom[:, np.newaxis, :]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            histo_rel_size = np.absolute(histo_deltas) / (1.0 * nom)
+            norm_rel_size = np.absolute(norm_deltas) / (1.0 * nom)
+        for k, key in enumerate(self.keys):
+            nbins = self.nbins[k]
+            yield key, {
+                "rel": rel[k, :nbins],
+                "nom": self.nom[k, :nbins],
+                "histo_rel_size": histo_rel_size[k, : self.n_histo[k], :nbins],
+                "norm_rel_size": norm_rel_size[k, : self.n_norm[k], :nbins],
+                "histo_names": np.asarray(self.histo_names[k], dtype=str),
+                "norm_names": np.asarray(self.norm_names[k], dtype=str),
+            }
+
+
+class ModifierVariations:
+    """
+    The histosys and normsys variations of many samples in a compact form.
+
+    Unlike :class:`PatchBatch` nothing is padded: the nominal rates of all
+    samples are concatenated into ``nom``, sample ``k`` owning the bins
+    ``bin_offsets[k]:bin_offsets[k + 1]``. A normsys modifier is two scalars,
+    ``norm_hi`` and ``norm_lo``, only broadcast to the bins of its sample when
+    needed. The histosys deltas to the nominal rates, ``hi_data - nom`` and
+    ``nom - lo_data``, are stored in compressed sparse row format: modifier
+    ``m`` has the deltas ``histo_up`` and ``histo_dn`` at the bins
+    ``histo_bins`` of its sample in ``histo_indptr[m]:histo_indptr[m + 1]``,
+    bins where both deltas are zero are not stored. ``histo_owner`` and
+    ``norm_owner`` are the samples of the modifiers.
+    """
+
+    def __init__(
+        self,
+        keys,
+        bin_offsets,
+        nom,
+        histo_owner,
+        histo_indptr,
+        histo_bins,
+        histo_up,
+        histo_dn,
+        norm_owner,
+        norm_hi,
+        norm_lo,
+        histo_names,
+        norm_names,
+    ):
+        self.keys = keys
+        self.bin_offsets = bin_offsets
+        self.nom = nom
+        self.histo_owner = histo_owner
+        self.histo_indptr = histo_indptr
+        self.histo_bins = histo_bins
+        self.histo_up = histo_up
+        self.histo_dn = histo_dn
+        self.norm_owner = norm_owner
+        self.norm_hi = norm_hi
+        self.norm_lo = norm_lo
+        self.histo_names = histo_names
+        self.norm_names = norm_names
+
+    def __len__(self):
+        return len(self.keys)
+
+    @classmethod
+    def from_ops(cls, ops):
+        """Compress an iterable of ``(signal, op)`` pairs, see :func:`add_ops`."""
+        keys = []
+        noms = []
+        hi_data = []
+        lo_data = []
+        histo_owner = []
+        hi = []
+        lo = []
+        norm_owner = []
+        histo_names = []
+        norm_names = []
+        for k, (signal, op) in enumerate(ops):
+            value = op["value"]
+            keys.append((signal, op["path"]))
+            noms.append(value["data"])
+            for m in value["modifiers"]:
+                if m["type"] == "histosys":
+                    hi_data.append(m["data"]["hi_data"])
+                    lo_data.append(m["data"]["lo_data"])
+                    histo_owner.append(k)
+                    histo_names.append(m["name"])
+                elif m["type"] == "normsys":
+                    hi.append(m["data"]["hi"])
+                    lo.append(m["data"]["lo"])
+                    norm_owner.append(k)
+                    norm_names.append(m["name"])
+
+        nbins = np.asarray([len(n) for n in noms], dtype=np.int64)
+        bin_offsets = np.concatenate([[0], np.cumsum(nbins)])
+        nom = _flatten(noms, bin_offsets[-1])
+        histo_owner = np.asarray(histo_owner, dtype=np.int64)
+
+        # Bin positions in nom of the flattened templates
+        lengths = nbins[histo_owner]
+        ends = np.cumsum(lengths)
+        total = ends[-1] if len(ends) else 0
+        position = np.repeat(bin_offsets[histo_owner] - (ends - lengths), lengths)
+        position += np.arange(total)
+        histo_up = _flatten(hi_data, total) - nom[position]
+        histo_dn = nom[position] - _flatten(lo_data, total)
+
+        keep = (histo_up != 0) | (histo_dn != 0)
+        modifier = np.repeat(np.arange(len(histo_owner)), lengths)
+        histo_indptr = np.zeros(len(histo_owner) + 1, dtype=np.int64)
+        np.cumsum(
+            np.bincount(modifier[keep], minlength=len(histo_owner)),
+            out=histo_indptr[1:],
+        )
+        histo_bins = (position - bin_offsets[histo_owner][modifier])[keep]
+
+        return cls(
+            keys,
+            bin_offsets,
+            nom,
+            histo_owner.astype(np.int32),
+            histo_indptr,
+            histo_bins.astype(np.int32),
+            histo_up[keep],
+            histo_dn[keep],
+            np.asarray(norm_owner, dtype=np.int32),
+            np.asarray(hi, dtype=float),
+            np.asarray(lo, dtype=float),
+            histo_names,
+            norm_names,
+        )
+
+    @property
+    def nbins(self):
+        return np.diff(self.bin_offsets)
+
+    @property
+    def bin_mask(self):
+        nbins = self.nbins
+        return np.arange(nbins.max(initial=0)) < nbins[:, np.newaxis]
+
+    @property
+    def nbytes(self):
+        """Size of the arrays in bytes."""
+        return sum(
+            getattr(self, name).nbytes
+            for name in (
+                "bin_offsets",
+                "nom",
+                "histo_owner",
+                "histo_indptr",
+                "histo_bins",
+                "histo_up",
+                "histo_dn",
+                "norm_owner",
+                "norm_hi",
+                "norm_lo",
+            )
+        )
+
+    def padded(self, values):
+        """Pad a flat per-bin array like ``nom`` to ``(n_samples, max_bins)``."""
+        bin_mask = self.bin_mask
+        result = np.zeros(bin_mask.shape)
+        result[bin_mask] = values
+        return result
+
+    def squares(self):
+        """
+        Return the histosys and normsys uncertainties from :func:`handle_deltas`
+        squared and summed over the modifiers of each bin, as flat arrays
+        aligned with ``nom``.
+        """
+        modifier = np.repeat(
+            np.arange(len(self.histo_owner)), np.diff(self.histo_indptr)
+        )
+        position = self.bin_offsets[self.histo_owner][modifier] + self.histo_bins
+        histo = np.bincount(
+            position,
+            weights=np.square(handle_deltas(self.histo_up, self.histo_dn)),
+            minlength=len(self.nom),
+        )
+
+        # A normsys uncertainty is nom times a factor of the modifier, which
+        # only depends on the sign of nom
+        factors = []
+        for sign in (1.0, -1.0):
+            delta = handle_deltas(sign * (self.norm_hi - 1), sign * (self.norm_lo - 1))
+            factors.append(
+                np.bincount(self.norm_owner, np.square(delta), minlength=len(self))
+            )
+        owner = np.repeat(np.arange(len(self)), self.nbins)
+        factor = np.where(self.nom > 0, factors[0][owner], factors[1][owner])
+        norm = np.where(self.nom != 0, factor * np.square(self.nom), 0.0)
+        return histo, norm
+
+    def rel_systs(self):
+        """
+        Return the relative size of the systematics added in quadrature, like
+        :meth:`PatchBatch.rel_systs` up to rounding, as a flat array aligned
+        with ``nom``.
+        """
+        histo, norm = self.squares()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rel = np.sqrt(histo + norm) / self.nom
+        return np.where(self.nom == 0, 1.0, rel)
+
+
+def workspace_systs(spec, include_stat=True):
+    """
+    Relative size of the systematics of every sample of a workspace.
+
+    The histosys and normsys uncertainties are combined like in
+    :func:`process_patch`. The staterror uncertainty of a bin is shared by
+    the samples with the same staterror modifier in a channel, as in pyhf, so
+    a sample gets its nominal rate times the combined relative uncertainty
+    ``sqrt(sum(data**2)) / sum(nom)``. The shapesys data are absolute
+    uncertainties of the sample.
+
+    Args:
+        spec: The workspace specification or :class:`pyhf.Workspace`.
+        include_stat: Add the staterror and shapesys uncertainties to ``rel``.
+
+    Returns:
+        :class:`WorkspaceSysts`
+    """
+    ops = []
+    samples = {}
+    sample_idx = []
+    channel_idx = []
+    for c, channel in enumerate(spec["channels"]):
+        for s, sample in enumerate(channel["samples"]):
+            ops.append(
+                (
+                    channel["name"],
+                    {"path": f"/channels/{c}/samples/{s}", "value": sample},
+                )
+            )
+            sample_idx.append(samples.setdefault(sample["name"], len(samples)))
+            channel_idx.append(c)
+    variations = ModifierVariations.from_ops(ops)
+    nom = variations.padded(variations.nom)
+    n_ops, max_bins = nom.shape
+
+    # Stack the per-bin data of the staterror and shapesys modifiers
+    stat_rows = {"staterror": [], "shapesys": []}
+    stat_data = {"staterror": [], "shapesys": []}
+    stat_groups = {}
+    groups = []
+    for k, (_, op) in enumerate(ops):
+        for m in op["value"]["modifiers"]:
+            if m["type"] in stat_rows:
+                stat_rows[m["type"]].append(k)
+                stat_data[m["type"]].append(m["data"])
+            if m["type"] == "staterror":
+                key = (channel_idx[k], m["name"])
+                groups.append(stat_groups.setdefault(key, len(stat_groups)))
+
+    bin_mask = variations.bin_mask
+    squares = {}
+    for modifier_type, rows in stat_rows.items():
+        rows = np.asarray(rows, dtype=int)
+        data = np.zeros((rows.size, max_bins))
+        data[bin_mask[rows]] = _flatten(stat_data[modifier_type], bin_mask[rows].sum())
+        if modifier_type == "staterror":
+            # Combine the uncertainties of the samples sharing a modifier
+            groups = np.asarray(groups, dtype=int)
+            sigma2 = np.zeros((len(stat_groups), max_bins))
+            total = np.zeros((len(stat_groups), max_bins))
+            np.add.at(sigma2, groups, np.square(data))
+            np.add.at(total, groups, nom[rows])
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rel_stat = np.where(total != 0, np.sqrt(sigma2) / total, 0.0)
+            data = rel_stat[groups] * nom[rows]
+        squares[modifier_type] = np.zeros((n_ops, max_bins))
+        np.add.at(squares[modifier_type], rows, np.square(data))
+
+    histo_squares, norm_squares = variations.squares()
+    squares["histosys"] = variations.padded(histo_squares)
+    squares["normsys"] = variations.padded(norm_squares)
+
+    inquad = squares["histosys"] + squares["normsys"]
+    if include_stat:
+        inquad = inquad + squares["staterror"] + squares["shapesys"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel = np.sqrt(inquad) / nom
+    rel = np.where(nom == 0, np.ones_like(nom), rel)
+
+    # Scatter the (sample, channel) rows into dense arrays
+    nbins = np.asarray([len(ch["samples"][0]["data"]) for ch in spec["channels"]])
+    padded = np.arange(max_bins) >= nbins[:, np.newaxis]
+
+    def dense(values):
+        result = np.full((len(samples), len(nbins), max_bins), np.nan)
+        result[sample_idx, channel_idx] = values
+        result[:, padded] = np.nan
+        return result
+
+    return WorkspaceSysts(
+        samples=list(samples),
+        channels=[channel["name"] for channel in spec["channels"]],
+        nbins=nbins,
+        nom=dense(nom),
+        rel=dense(rel),
+        histosys=dense(np.sqrt(squares["histosys"])),
+        normsys=dense(np.sqrt(squares["normsys"])),
+        staterror=dense(np.sqrt(squares["staterror"])),
+        shapesys=dense(np.sqrt(squares["shapesys"])),
+    )
+
+
+def op_digest(op):
+    """Content hash of a patch op, the cache key of its summary."""
+    return digest(op, salt=f"systematics-{SUMMARY_VERSION}")
+
+
+def summarize_ops(ops, cache=None):
+    """
+    Summarize ``(signal, op)`` pairs, see :meth:`PatchBatch.summaries`.
+
+    Ops found in ``cache`` (an :class:`hfval.cache.ArrayCache`) are reused,
+    the others are computed in a single batch and added to the cache.
+
+    Returns:
+        list: ``(key, summary)`` in the order of ``ops``.
+    """
+    results = []
+    missing = []
+    for signal, op in ops:
+        key = (signal, op["path"])
+        if cache is not None:
+            op_key = op_digest(op)
+            summary = cache.get(op_key)
+            if summary is not None:
+                results.append((key, summary))
+                continue
+        else:
+            op_key = None
+        missing.append((len(results), op_key, (signal, op)))
+        results.append(None)
+
+    batch = PatchBatch.from_ops(item for _, _, item in missing)
+    for (idx, op_key, _), (key, summary) in zip(missing, batch.summaries()):
+        results[idx] = (key, summary)
+        if cache is not None:
+            cache.put(op_key, summary)
+    return results
+
+
+def iter_summaries(ops, cache=None, batch_size=256):
+    """
+    Yield the summaries of :func:`summarize_ops`, ``batch_size`` ops at a time.
+
+    Only one batch of ops and summaries is held in memory at once.
+    """
+    ops = iter(ops)
+    while True:
+        batch = list(islice(ops, batch_size))
+        if not batch:
+            return
+        with profiling.stage("summarize patches"):
+            summaries = summarize_ops(batch, cache=cache)
+        profiling.count("patch ops processed", len(batch))
+        yield from summaries
+
+
+def process_patches(patches):
+    """
+    Apply :func:`process_patch` to every ``add`` op of the signal patches.
+
+    Returns:
+        dict: ``{signal: {path: (rel, nom)}}``, computed in one vectorized pass.
+    """
+    return PatchBatch.from_patches(patches).to_dict()
+
+
+def _flatten(rows, count):
+    flat = np.fromiter(chain.from_iterable(rows), dtype=float)
+    if flat.size != count:
+        raise ValueError(
+            "Modifier data does not have the same number of bins as the sample"
+        )
+    return flat
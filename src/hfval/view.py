@@ -0,0 +1,339 @@
+"""
+Lazy views of JSON workspaces that only parse the channels they are asked for.
+
+:func:`index_workspace` scans a workspace once for the byte range of every
+channel and observation, and tables the bin counts of the channels and the
+names and types of the modifiers of their samples. A :class:`WorkspaceView`
+answers channel metadata and parameter names from this index, parses single
+channels from their byte ranges on demand, and only builds a pyhf workspace,
+pruned to the selected channels, when a fit needs one.
+"""
+
+import contextlib
+import gzip
+import json
+import os
+
+import numpy as np
+
+from . import jsonio, profiling
+from .cache import digest, file_identity
+from .loader import read_bytes, split_archive_path
+
+# pyhf orders the parameters by the type of their modifier, then by name
+MODIFIER_TYPES = (
+    "histosys",
+    "lumi",
+    "normfactor",
+    "normsys",
+    "shapefactor",
+    "shapesys",
+    "staterror",
+)
+# Modifiers with one parameter per bin
+BINNED_TYPES = ("shapefactor", "shapesys", "staterror")
+INDEX_FIELDS = {
+    "channels": [
+        {
+            "name": True,
+            "samples": [
+                {"name": True, "data": len, "modifiers": [{"name": True, "type": True}]}
+            ],
+        }
+    ],
+    "observations": [{"name": True}],
+    "measurements": True,
+    "version": True,
+}
+
+_INDEXED_ARRAYS = ("channels", "observations")
+
+
+def index_workspace(raw):
+    """
+    Index a JSON workspace document.
+
+    Args:
+        raw: The document, ``bytes`` or a buffer like a memoryview.
+
+    Returns:
+        dict: Arrays that can be kept in an :class:`hfval.cache.ArrayCache`:
+        ``channel_name``, ``channel_range`` (the ``[start, end)`` byte range
+        of every channel), ``channel_nbins``, ``observation_name``,
+        ``observation_range``, ``sample_channel``, ``sample_name``,
+        ``modifier_sample``, ``modifier_name``, ``modifier_type`` and
+        ``meta``, the JSON of the measurements and the version.
+    """
+    ranges = _element_ranges(raw)
+    spec = jsonio.extract(raw, INDEX_FIELDS)
+    channels = spec.get("channels", [])
+    observations = spec.get("observations", [])
+    if len(channels) != len(ranges["channels"]) or len(observations) != len(
+        ranges["observations"]
+    ):
+        raise ValueError("The channels and observations must be arrays of objects")
+
+    samples = [(c, s) for c, channel in enumerate(channels) for s in channel["samples"]]
+    modifiers = [(i, m) for i, (_, s) in enumerate(samples) for m in s["modifiers"]]
+    return {
+        "channel_name": np.asarray([c["name"] for c in channels], dtype=str),
+        "channel_range": np.asarray(ranges["channels"], dtype=np.int64).reshape(-1, 2),
+        "channel_nbins": np.asarray(
+            [c["samples"][0]["data"] if c["samples"] else 0 for c in channels],
+            dtype=np.int64,
+        ),
+        "observation_name": np.asarray([o["name"] for o in observations], dtype=str),
+        "observation_range": np.asarray(ranges["observations"], dtype=np.int64).reshape(
+            -1, 2
+        ),
+        "sample_channel": np.asarray([c for c, _ in samples], dtype=np.int32),
+        "sample_name": np.asarray([s["name"] for _, s in samples], dtype=str),
+        "modifier_sample": np.asarray([i for i, _ in modifiers], dtype=np.int32),
+        "modifier_name": np.asarray([m["name"] for _, m in modifiers], dtype=str),
+        "modifier_type": np.asarray([m["type"] for _, m in modifiers], dtype=str),
+        "meta": np.asarray(
+            json.dumps(
+                {
+                    "measurements": spec.get("measurements", []),
+                    "version": spec.get("version", "1.0.0"),
+                }
+            )
+        ),
+    }
+
+
+def _element_ranges(raw):
+    # Byte ranges of the objects in the top-level channels and observations,
+    # from the positions of the quotes and brackets of the document
+    buf = np.frombuffer(raw, dtype=np.uint8)
+    quotes = np.flatnonzero(buf == 0x22)
+    escaped = [
+        q
+        for q in quotes[buf[np.maximum(quotes - 1, 0)] == 0x5C].tolist()
+        if _n_backslashes(buf, q) % 2
+    ]
+    quotes = np.setdiff1d(quotes, escaped)
+    brackets = np.flatnonzero(
+        (buf == 0x5B) | (buf == 0x5D) | (buf == 0x7B) | (buf == 0x7D)
+    )
+    # Brackets after an odd number of quotes are inside strings
+    brackets = brackets[np.searchsorted(quotes, brackets) % 2 == 0]
+    opening = (buf[brackets] == 0x5B) | (buf[brackets] == 0x7B)
+    # Depth after every bracket, and before every string
+    depth = np.cumsum(np.where(opening, 1, -1))
+    string_depth = np.concatenate([[0], depth])[np.searchsorted(brackets, quotes[::2])]
+
+    ranges = {name: [] for name in _INDEXED_ARRAYS}
+    for start, end in zip(
+        quotes[::2][string_depth == 1].tolist(),
+        quotes[1::2][string_depth == 1].tolist(),
+    ):
+        key = json.loads(bytes(raw[start : end + 1]))
+        if key not in ranges:
+            continue
+        first = np.searchsorted(brackets, end)
+        if first == len(brackets) or buf[brackets[first]] != 0x5B:
+            continue
+        last = first + np.argmax(depth[first:] == 1)
+        inside = slice(first + 1, last)
+        starts = brackets[inside][opening[inside] & (depth[inside] == 3)]
+        ends = brackets[inside][~opening[inside] & (depth[inside] == 2)] + 1
+        ranges[key] = list(zip(starts.tolist(), ends.tolist()))
+    return ranges
+
+
+def _n_backslashes(buf, position):
+    n = 0
+    while position - n > 0 and buf[position - n - 1] == 0x5C:
+        n += 1
+    return n
+
+
+def prune_channels(spec, channels):
+    """
+    Keep only ``channels`` and their observations in a workspace specification.
+
+    Like ``pyhf.Workspace.prune`` keeping rather than removing channels, but
+    without validating the workspace.
+    """
+    unknown = set(channels) - {c["name"] for c in spec["channels"]}
+    if unknown:
+        raise ValueError(f"Unknown channels {', '.join(sorted(unknown))}")
+    return {
+        **spec,
+        "channels": [c for c in spec["channels"] if c["name"] in channels],
+        "observations": [
+            o for o in spec.get("observations", []) if o["name"] in channels
+        ],
+    }
+
+
+class WorkspaceView:
+    """
+    Lazy view of a JSON workspace, see :func:`index_workspace`.
+
+    Args:
+        path: A ``.json`` or ``.json.gz`` file, a directory containing
+            ``BkgOnly.json``, a path inside a tarball or a columnar store.
+            Plain files are read through a memory map whenever a channel is
+            parsed, the others are kept in memory.
+        cache: :class:`hfval.cache.ArrayCache` keeping the index by the
+            identity of the file, so views of unchanged files skip the scan.
+    """
+
+    def __init__(self, path="BkgOnly.json", cache=None):
+        from .store import ColumnarStore, is_store
+
+        self._raw = None
+        if os.path.isdir(path) and is_store(path):
+            # Stores have no JSON to index, the workspace is encoded once
+            self._raw = json.dumps(ColumnarStore(path).workspace()).encode()
+        elif os.path.isdir(path):
+            path = os.path.join(path, "BkgOnly.json")
+        if self._raw is None:
+            archive, _ = split_archive_path(path)
+            if archive is not None or path.endswith(".gz"):
+                raw, name = read_bytes(path)
+                self._raw = gzip.decompress(raw) if name.endswith(".gz") else raw
+        self.path = path
+
+        key = digest(file_identity(path), salt="workspace index")
+        index = cache.get(key) if cache is not None else None
+        if index is None:
+            with profiling.stage("index workspace"), self._document() as raw:
+                index = index_workspace(raw)
+            if cache is not None:
+                cache.put(key, index)
+        self.index = index
+        self.channels = index["channel_name"].tolist()
+        self._channel = {name: c for c, name in enumerate(self.channels)}
+        self._observation = {
+            name: o for o, name in enumerate(index["observation_name"].tolist())
+        }
+        meta = json.loads(str(index["meta"]))
+        self.measurements = meta["measurements"]
+        self.version = meta["version"]
+
+    @contextlib.contextmanager
+    def _document(self):
+        if self._raw is not None:
+            yield self._raw
+        else:
+            with jsonio.mapped(self.path) as view:
+                yield view
+
+    def _channel_indices(self, channels):
+        if channels is None:
+            return np.arange(len(self.channels))
+        unknown = [name for name in channels if name not in self._channel]
+        if unknown:
+            raise ValueError(f"Unknown channels {', '.join(unknown)}")
+        return np.asarray([self._channel[name] for name in channels], dtype=int)
+
+    def channel_nbins(self):
+        """Return the number of bins of every channel, like ``Workspace.channel_nbins``."""
+        return dict(zip(self.channels, self.index["channel_nbins"].tolist()))
+
+    def modifiers(self, channels=None):
+        """
+        Return the sorted ``(name, type)`` pairs of the modifiers of the
+        samples of ``channels``, all channels by default.
+        """
+        selected = np.isin(
+            self.index["sample_channel"][self.index["modifier_sample"]],
+            self._channel_indices(channels),
+        )
+        return sorted(
+            set(
+                zip(
+                    self.index["modifier_name"][selected].tolist(),
+                    self.index["modifier_type"][selected].tolist(),
+                )
+            )
+        )
+
+    def parameter_names(self, channels=None):
+        """
+        Return the name of every entry of the parameter vector of the model of
+        ``channels``, all channels by default, like
+        :func:`hfval.fitting.parameter_names` without building the model.
+        """
+        indices = self._channel_indices(channels)
+        modifier_channel = self.index["sample_channel"][self.index["modifier_sample"]]
+        selected = np.isin(modifier_channel, indices)
+        rows = sorted(
+            zip(
+                self.index["channel_name"][modifier_channel[selected]].tolist(),
+                self.index["sample_name"][
+                    self.index["modifier_sample"][selected]
+                ].tolist(),
+                self.index["modifier_name"][selected].tolist(),
+                self.index["modifier_type"][selected].tolist(),
+                self.index["channel_nbins"][modifier_channel[selected]].tolist(),
+            )
+        )
+        # pyhf visits the modifiers of the sorted channels and samples, and
+        # registers parameters by modifier type in the order they appear,
+        # except for the staterrors of all channels, which it registers by name
+        first = {}
+        npars = {}
+        for position, (_, _, name, kind, nbins) in enumerate(rows):
+            if kind == "staterror":
+                position = name
+            first.setdefault((name, MODIFIER_TYPES.index(kind)), position)
+            n = nbins if kind in BINNED_TYPES else 1
+            npars[name] = max(npars.get(name, 1), n)
+        order = {}
+        for (name, rank), position in first.items():
+            order[name] = min(order.get(name, (rank, position)), (rank, position))
+
+        names = []
+        for name in sorted(order, key=order.get):
+            if npars[name] > 1 or "staterror" in name:
+                names += [f"{name}_{i}" for i in range(npars[name])]
+            else:
+                names.append(name)
+        return names
+
+    def channel(self, name):
+        """Parse the channel ``name`` from its byte range."""
+        start, end = self.index["channel_range"][self._channel_indices([name])[0]]
+        profiling.count("channels parsed")
+        with self._document() as raw:
+            return jsonio.loads(raw[start:end])
+
+    def observation(self, name):
+        """Parse the observation of the channel ``name`` from its byte range."""
+        start, end = self.index["observation_range"][self._observation[name]]
+        with self._document() as raw:
+            return jsonio.loads(raw[start:end])
+
+    def sample(self, channel, name):
+        """Return the sample ``name`` of ``channel``, parsing only the channel."""
+        for sample in self.channel(channel)["samples"]:
+            if sample["name"] == name:
+                return sample
+        raise KeyError(f"No sample {name} in channel {channel}")
+
+    def spec(self, channels=None):
+        """
+        Return the workspace specification pruned to ``channels``, all
+        channels by default, parsing only those channels. The channels keep
+        their order in the workspace, like with :func:`prune_channels`.
+        """
+        indices = np.sort(self._channel_indices(channels))
+        names = [self.channels[c] for c in indices.tolist()]
+        return {
+            "channels": [self.channel(name) for name in names],
+            "observations": [
+                self.observation(name) for name in names if name in self._observation
+            ],
+            "measurements": self.measurements,
+            "version": self.version,
+        }
+
+    def workspace(self, channels=None):
+        """Build the ``pyhf.Workspace`` of :meth:`spec`, for example to fit it."""
+        import pyhf
+
+        return pyhf.Workspace(self.spec(channels))
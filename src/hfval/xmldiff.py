@@ -0,0 +1,270 @@
+"""Comparison of HistFactory XML+ROOT inputs with their JSON workspace."""
+
+import csv
+import json
+import os
+from collections import namedtuple
+
+from .parallel import imap
+
+Difference = namedtuple(
+    "Difference",
+    [
+        "channel",
+        "sample",
+        "modifier",
+        "type",
+        "field",
+        "status",
+        "n_values",
+        "n_failed",
+        "max_abs_diff",
+        "max_rel_diff",
+    ],
+)
+Difference.__doc__ = """
+Comparison of one array of a channel, like the ``hi_data`` of a histosys
+modifier of a sample or the nominal ``data`` of a sample (with an empty
+``modifier`` and the ``type`` ``"nominal"``), converted from XML and in the
+reference workspace. The observed data of a channel has an empty ``sample``
+and the ``type`` ``"observation"``.
+
+``status`` is ``"ok"``, ``"differs"`` if ``n_failed`` of the ``n_values``
+values are out of tolerance, ``"length"`` if the arrays have different
+lengths, or ``"missing in xml"`` or ``"missing in reference"``.
+``max_abs_diff`` and ``max_rel_diff`` are the largest absolute and relative
+differences (relative to the larger magnitude), NaN if nothing was compared.
+"""
+
+STATUSES = ("ok", "differs", "length", "missing in xml", "missing in reference")
+DIFF_FORMATS = (".csv", ".json")
+
+
+def channel_inputs(configfile):
+    """Return the paths of the channel XML files of a top-level XML file."""
+    import xml.etree.ElementTree as ET
+
+    toplvl = ET.parse(configfile)
+    return [x.text for x in toplvl.findall("Input") if x.text]
+
+
+def read_channel(task):
+    """
+    Convert a single channel XML file like ``pyhf xml2json``.
+
+    Args:
+        task: ``(basedir, mounts, path)`` with the directory relative paths in
+            the XML files are resolved against, the mounts of
+            :func:`pyhf.readxml.parse` and the path of the channel XML file.
+
+    Returns:
+        dict: The channel with its ``samples`` and its observed ``data``.
+    """
+    import xml.etree.ElementTree as ET
+    from pathlib import Path
+
+    from pyhf import readxml
+
+    basedir, mounts, path = task
+    # The resolvers and process_channel(xml, resolver) are the pyhf 0.7 API
+    resolver = readxml.resolver_factory(
+        Path(basedir), [(Path(host), Path(mount)) for host, mount in mounts]
+    )
+    name, data, samples, _ = readxml.process_channel(ET.parse(resolver(path)), resolver)
+    return {"name": name, "samples": samples, "data": data}
+
+
+def payloads(sample):
+    """
+    Yield ``(modifier, type, field, values)`` for every array of a sample.
+
+    Modifiers without data, like normfactors, yield empty ``values``.
+    """
+    yield "", "nominal", "data", sample["data"]
+    for modifier in sample["modifiers"]:
+        name, kind, data = modifier["name"], modifier["type"], modifier["data"]
+        if kind == "histosys":
+            yield name, kind, "hi_data", data["hi_data"]
+            yield name, kind, "lo_data", data["lo_data"]
+        elif kind == "normsys":
+            yield name, kind, "hi", [data["hi"]]
+            yield name, kind, "lo", [data["lo"]]
+        elif data is None:
+            yield name, kind, "", []
+        else:
+            yield name, kind, "data", data
+
+
+def _arrays(channel, observed):
+    arrays = {("", "", "observation", "data"): observed}
+    for sample in channel["samples"]:
+        for modifier, kind, field, values in payloads(sample):
+            arrays[(sample["name"], modifier, kind, field)] = values
+    return arrays
+
+
+def diff_channel(channel, reference, reference_observed, rtol=1e-6, atol=0.0):
+    """
+    Compare a converted channel with the channel of the reference workspace.
+
+    All arrays of the channel are compared in one vectorized pass, a value
+    ``x`` passes if ``|x - r| <= atol + rtol * |r|`` for the reference ``r``.
+
+    Args:
+        channel: Channel from :func:`read_channel`.
+        reference: The channel of the same name of the reference workspace.
+        reference_observed: The observed data of the reference channel.
+        rtol: Relative tolerance.
+        atol: Absolute tolerance.
+
+    Returns:
+        list: :class:`Difference` of every array, in the order of the
+        converted channel followed by the arrays missing in it.
+    """
+    import numpy as np
+
+    converted = _arrays(channel, channel["data"])
+    expected = _arrays(reference, reference_observed)
+
+    rows = []
+    compared = []
+    for key, values in converted.items():
+        if key not in expected:
+            rows.append((key, "missing in reference", len(values)))
+        elif len(values) != len(expected[key]):
+            rows.append((key, "length", len(values)))
+        else:
+            rows.append((key, None, len(values)))
+            compared.append(key)
+    rows += [
+        (key, "missing in xml", len(values))
+        for key, values in expected.items()
+        if key not in converted
+    ]
+
+    lengths = np.asarray([len(converted[key]) for key in compared], dtype=int)
+    flat = np.fromiter(
+        (v for key in compared for v in converted[key]),
+        dtype=float,
+        count=lengths.sum(),
+    )
+    flat_ref = np.fromiter(
+        (v for key in compared for v in expected[key]), dtype=float, count=lengths.sum()
+    )
+    abs_diff = np.abs(flat - flat_ref)
+    scale = np.maximum(np.abs(flat), np.abs(flat_ref))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel_diff = np.where(scale > 0, abs_diff / scale, 0.0)
+    failed = ~(abs_diff <= atol + rtol * np.abs(flat_ref))
+
+    # Reduce the flat arrays to one value per compared array
+    nonempty = lengths > 0
+    starts = (np.cumsum(lengths) - lengths)[nonempty]
+    max_abs = np.full(len(compared), np.nan)
+    max_rel = np.full(len(compared), np.nan)
+    n_failed = np.zeros(len(compared), dtype=int)
+    if starts.size:
+        max_abs[nonempty] = np.maximum.reduceat(abs_diff, starts)
+        max_rel[nonempty] = np.maximum.reduceat(rel_diff, starts)
+        n_failed[nonempty] = np.add.reduceat(failed.astype(int), starts)
+    results = dict(zip(compared, zip(n_failed.tolist(), max_abs, max_rel)))
+
+    differences = []
+    for key, status, n_values in rows:
+        if status is None:
+            n, max_abs_diff, max_rel_diff = results[key]
+            status = "differs" if n else "ok"
+        else:
+            n, max_abs_diff, max_rel_diff = n_values, np.nan, np.nan
+        differences.append(
+            Difference(
+                reference["name"],
+                *key,
+                status,
+                n_values,
+                n,
+                float(max_abs_diff),
+                float(max_rel_diff),
+            )
+        )
+    return differences
+
+
+def diff_workspace(
+    configfile,
+    reference,
+    basedir=None,
+    mounts=(),
+    rtol=1e-6,
+    atol=0.0,
+    n_workers=None,
+):
+    """
+    Convert the channels of an XML workspace in a process pool and compare
+    them with a reference JSON workspace, see :func:`diff_channel`.
+
+    Args:
+        configfile: Path of the top-level XML file.
+        reference: The reference workspace specification.
+        basedir: Directory relative paths in the XML files are resolved
+            against, the current directory by default like ``pyhf xml2json``.
+        mounts: ``(host path, path in the XML files)`` pairs.
+        rtol: Relative tolerance.
+        atol: Absolute tolerance.
+        n_workers: Number of worker processes, the number of CPUs by default.
+
+    Yields:
+        list: The :class:`Difference` of each channel in the order of the XML
+        file, followed by a missing channel :class:`Difference` for each
+        channel of the reference that is not in the XML file.
+    """
+    basedir = basedir or os.getcwd()
+    reference_channels = {c["name"]: c for c in reference["channels"]}
+    observations = {o["name"]: o["data"] for o in reference["observations"]}
+    tasks = (
+        (basedir, [tuple(map(str, mount)) for mount in mounts], path)
+        for path in channel_inputs(configfile)
+    )
+    seen = set()
+    for channel in imap(read_channel, tasks, n_workers=n_workers):
+        seen.add(channel["name"])
+        if channel["name"] not in reference_channels:
+            yield [_missing_channel(channel["name"], "missing in reference")]
+            continue
+        yield diff_channel(
+            channel,
+            reference_channels[channel["name"]],
+            observations.get(channel["name"], []),
+            rtol=rtol,
+            atol=atol,
+        )
+    for name in reference_channels:
+        if name not in seen:
+            yield [_missing_channel(name, "missing in xml")]
+
+
+def _missing_channel(name, status):
+    nan = float("nan")
+    return Difference(name, "", "", "channel", "", status, 0, 0, nan, nan)
+
+
+def write_differences(path, differences):
+    """Write :class:`Difference` rows, in the format given by the suffix of ``path``."""
+    suffix = os.path.splitext(str(path))[1].lower()
+    if suffix == ".csv":
+        with open(path, "w", newline="") as outfile:
+            writer = csv.writer(outfile)
+            writer.writerow(Difference._fields)
+            writer.writerows(differences)
+    elif suffix == ".json":
+        # NaN is not valid JSON, differences of nothing are written as null
+        records = [
+            {k: None if v != v else v for k, v in d._asdict().items()}
+            for d in differences
+        ]
+        with open(path, "w") as outfile:
+            json.dump(records, outfile, indent=1)
+    else:
+        raise ValueError(
+            f"Unknown difference format {suffix!r}, expected one of {DIFF_FORMATS}"
+        )
@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+CHANNEL_NBINS = [1, 3, 2, 5]
+
+
+def make_op(rng, path, name, nbins, n_histo, n_norm):
+    nom = rng.uniform(0.0, 10.0, nbins)
+    nom[rng.random(nbins) < 0.1] = 0.0
+    modifiers = [{"name": "mu_SIG", "type": "normfactor", "data": None}]
+    for i in range(n_histo):
+        modifiers.append(
+            {
+                "name": f"histo_{i}",
+                "type": "histosys",
+                "data": {
+                    "hi_data": (nom * rng.uniform(0.5, 1.5, nbins)).tolist(),
+                    "lo_data": (nom * rng.uniform(0.5, 1.5, nbins)).tolist(),
+                },
+            }
+        )
+    for i in range(n_norm):
+        modifiers.append(
+            {
+                "name": f"norm_{i}",
+                "type": "normsys",
+                "data": {"hi": rng.uniform(0.8, 1.3), "lo": rng.uniform(0.7, 1.2)},
+            }
+        )
+    return {
+        "op": "add",
+        "path": path,
+        "value": {"name": name, "data": nom.tolist(), "modifiers": modifiers},
+    }
+
+
+@pytest.fixture
+def patches():
+    rng = np.random.default_rng(42)
+    patches = []
+    for i in range(20):
+        name = f"signal_{300 + 100 * (i % 5)}_{50 * (i // 5)}"
+        patches.append(
+            [
+                make_op(
+                    rng,
+                    f"/channels/{c}/samples/1",
+                    name,
+                    nbins=nbins,
+                    n_histo=int(rng.integers(1, 12)),
+                    n_norm=int(rng.integers(1, 12)),
+                )
+                for c, nbins in enumerate(CHANNEL_NBINS)
+            ]
+            + [{"op": "remove", "path": "/channels/3/samples/0/modifiers/0"}]
+        )
+    return patches
+
+
+@pytest.fixture
+def background():
+    rng = np.random.default_rng(7)
+    channels = []
+    observations = []
+    for c, nbins in enumerate(CHANNEL_NBINS):
+        nom = rng.uniform(20.0, 100.0, nbins)
+        channels.append(
+            {
+                "name": f"SR_{c}",
+                "samples": [
+                    {
+                        "name": "background",
+                        "data": nom.tolist(),
+                        "modifiers": [
+                            {
+                                "name": "bkg_norm",
+                                "type": "normsys",
+                                "data": {"hi": 1.1, "lo": 0.9},
+                            },
+                            {
+                                "name": "bkg_shape",
+                                "type": "histosys",
+                                "data": {
+                                    "hi_data": (nom * 1.05).tolist(),
+                                    "lo_data": (nom * 0.97).tolist(),
+                                },
+                            },
+                            {
+                                "name": f"staterror_SR_{c}",
+                                "type": "staterror",
+                                "data": np.sqrt(nom).tolist(),
+                            },
+                        ],
+                    }
+                ],
+            }
+        )
+        observations.append({"name": f"SR_{c}", "data": np.round(nom).tolist()})
+    return {
+        "channels": channels,
+        "observations": observations,
+        "measurements": [
+            {
+                "name": "meas",
+                "config": {
+                    "poi": "mu_SIG",
+                    "parameters": [
+                        {
+                            "name": "mu_SIG",
+                            "bounds": [[0.0, 10.0]],
+                            "inits": [1.0],
+                        }
+                    ],
+                },
+            }
+        ],
+        "version": "1.0.0",
+    }
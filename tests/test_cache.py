@@ -0,0 +1,103 @@
+import json
+import os
+
+import numpy as np
+
+from hfval.cache import ArrayCache, digest, file_identity
+from hfval.loader import reduce_patch
+from hfval.store import write_store
+from hfval.systematics import summarize_ops
+
+
+def test_digest_canonical():
+    assert digest({"a": 1, "b": [1.0, 2.0]}) == digest({"b": [1.0, 2.0], "a": 1})
+    assert digest({"a": 1}) != digest({"a": 2})
+    assert digest({"a": 1}, salt="v2") != digest({"a": 1})
+
+
+def test_file_identity(tmp_path, background, patches):
+    # Directories are identified by the BkgOnly.json they contain
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    identity = file_identity(str(tmp_path))
+    assert identity == file_identity(str(tmp_path / "BkgOnly.json"))
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background, indent=1))
+    assert file_identity(str(tmp_path)) != identity
+
+    # Stores by their files, also when they are overwritten in place
+    store = str(tmp_path / "store")
+    write_store(store, background, patches[:2])
+    identity = file_identity(store)
+    write_store(store, background, patches[:3])
+    assert file_identity(store) != identity
+
+
+def test_array_cache_roundtrip(tmp_path):
+    with ArrayCache("test", cache_dir=tmp_path) as cache:
+        assert cache.get("missing") is None
+        cache.put("key", {"rel": np.arange(3.0), "names": np.asarray(["a", "b"])})
+        assert "key" in cache
+        value = cache.get("key")
+        assert np.array_equal(value["rel"], np.arange(3.0))
+        assert value["names"].tolist() == ["a", "b"]
+
+    stats = ArrayCache("test", cache_dir=tmp_path).stats()
+    assert (stats["entries"], stats["hits"], stats["misses"]) == (1, 1, 1)
+
+
+def test_array_cache_lru_eviction(tmp_path):
+    cache = ArrayCache("test", cache_dir=tmp_path)
+    for idx in range(3):
+        cache.put(f"key_{idx}", {"data": np.zeros(1000)})
+        os.utime(cache._filename(f"key_{idx}"), (idx, idx))
+    entry_size = cache.stats()["bytes"] // 3
+
+    # Reading key_0 makes key_1 the least recently used entry
+    cache.get("key_0")
+    cache.max_bytes = 3 * entry_size
+    cache.put("key_3", {"data": np.ones(1000)})
+    assert "key_1" not in cache
+    assert all(f"key_{idx}" in cache for idx in (0, 2, 3))
+    assert cache.evictions == 1
+
+    cache.clear()
+    assert cache.stats()["entries"] == 0
+
+
+def test_summarize_ops_cached(tmp_path, patches):
+    ops = [item for patch in patches for item in reduce_patch(patch)]
+    expected = summarize_ops(ops)
+
+    with ArrayCache("systematics", cache_dir=tmp_path) as cache:
+        summarize_ops(ops, cache=cache)
+        assert cache.misses == len(ops)
+
+    ops[0][1]["value"]["data"][0] += 1.0
+    with ArrayCache("systematics", cache_dir=tmp_path) as cache:
+        summaries = summarize_ops(ops, cache=cache)
+        assert (cache.hits, cache.misses) == (len(ops) - 1, 1)
+
+    assert [key for key, _ in summaries] == [key for key, _ in expected]
+    for (_, summary), (_, reference) in zip(summaries[1:], expected[1:]):
+        assert summary.keys() == reference.keys()
+        for name in summary:
+            np.testing.assert_array_equal(summary[name], reference[name])
+    assert summaries[0][1]["nom"][0] == expected[0][1]["nom"][0] + 1.0
+
+
+def test_cache_commands(script_runner, tmp_path):
+    with ArrayCache("systematics", cache_dir=tmp_path) as cache:
+        cache.put("key", {"data": np.zeros(10)})
+        cache.get("key")
+
+    ret = script_runner.run(
+        "pyhf-validation", "cache", "info", "--cache-dir", str(tmp_path)
+    )
+    assert ret.success
+    assert "systematics: 1 entries" in ret.stdout
+    assert "1 hits" in ret.stdout
+
+    ret = script_runner.run(
+        "pyhf-validation", "cache", "clear", "--cache-dir", str(tmp_path)
+    )
+    assert ret.success
+    assert ArrayCache("systematics", cache_dir=tmp_path).stats()["entries"] == 0
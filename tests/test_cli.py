@@ -1,7 +1,10 @@
+import json
 import shlex
 import hfval
 import time
 
+import pytest
+
 
 def test_version(script_runner):
     command = "pyhf-validation --version"
@@ -16,3 +19,116 @@ def test_version(script_runner):
     assert ret.stderr == ""
     # make sure it took less than a second
     assert elapsed < 1.0
+
+
+@pytest.mark.parametrize(
+    "command",
+    [
+        "pyhf-validation --help",
+        "pyhf-validation validate-systs --help",
+        "pyhf-validation validate-workspace --help",
+        "pyhf-validation compare-nuisance --help",
+        "pyhf-validation compare-fitted-nuisance --help",
+        "pyhf-validation export-root-fit --help",
+        "pyhf-validation convert --help",
+        "pyhf-validation scan --help",
+        "pyhf-validation profile-scan --help",
+        "pyhf-validation limits --help",
+        "pyhf-validation worker --help",
+        "pyhf-validation xml-diff --help",
+        "pyhf-validation serve --help",
+        "pyhf-validation cache --help",
+        "pyhf-validation cache info --help",
+        "pyhf-validation cache clear --help",
+    ],
+)
+def test_help(script_runner, command):
+    script_runner.run(*shlex.split(command))
+    start = time.time()
+    ret = script_runner.run(*shlex.split(command))
+    elapsed = time.time() - start
+    assert ret.success
+    assert "Usage:" in ret.stdout
+    # make sure it took less than a second
+    assert elapsed < 1.0
+
+
+def test_validate_systs(script_runner, tmp_path, patches, background):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    for idx, patch in enumerate(patches[:6]):
+        (tmp_path / f"patch_{idx:02d}.json").write_text(json.dumps(patch))
+
+    command = "pyhf-validation validate-systs --signal_template signal_{a}_{b} --v_max 4 --n_workers 1 --output_format pdf"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "Outliers (> 1.0):" in ret.stdout
+    assert (tmp_path / "Plots" / "rel_systs.pdf").exists()
+    assert (tmp_path / "Plots" / "outliers.pdf").exists()
+
+
+def test_convert(script_runner, tmp_path, patches, background):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    for idx, patch in enumerate(patches[:6]):
+        (tmp_path / f"patch_{idx:02d}.json").write_text(json.dumps(patch))
+
+    command = "pyhf-validation convert --output store"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "4 background and 24 signal samples of 6 signal points" in ret.stdout
+
+    command = "pyhf-validation validate-systs --signal_template signal_{a}_{b} --n_workers 1 --output_format pdf"
+    from_json = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    from_store = script_runner.run(
+        *shlex.split(command), "--store", "store", cwd=tmp_path
+    )
+    assert from_json.success and from_store.success
+    assert from_store.stdout == from_json.stdout
+
+
+def test_convert_patchset(script_runner, tmp_path, patches, background):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    # The PatchSet names the signal points, not the names of the added samples
+    for patch in patches[:6]:
+        for op in patch:
+            if op["op"] == "add":
+                op["value"]["name"] = "signal"
+    patchset = {
+        "metadata": {},
+        "patches": [
+            {"metadata": {"name": f"signal_{300 + 100 * idx}_0"}, "patch": patch}
+            for idx, patch in enumerate(patches[:6])
+        ],
+    }
+    (tmp_path / "patchset.json").write_text(json.dumps(patchset))
+
+    ret = script_runner.run(
+        "pyhf-validation", "convert", "--output", "store", cwd=tmp_path
+    )
+    assert ret.success
+
+    command = "pyhf-validation validate-systs --signal_template signal_{a}_{b} --v_max 4 --n_workers 1 --output_format png"
+    from_json = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    json_plots = sorted(path.name for path in (tmp_path / "Plots").iterdir())
+    from_store = script_runner.run(
+        *shlex.split(command), "--store", "store", cwd=tmp_path
+    )
+    assert from_json.success and from_store.success
+    assert from_store.stdout == from_json.stdout
+    assert sorted(path.name for path in (tmp_path / "Plots").iterdir()) == json_plots
+    assert "signal_300_0" in from_json.stdout
+
+
+def test_validate_workspace(script_runner, tmp_path, patches, background):
+    import numpy as np
+
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    (tmp_path / "patch.json").write_text(json.dumps(patches[0]))
+
+    command = "pyhf-validation validate-workspace --patch patch.json --outlier-threshold 0.5 --output systs.npz"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "2 samples in 4 channels with 11 bins" in ret.stdout
+    assert "Outliers (> 0.5):" in ret.stdout
+    with np.load(tmp_path / "systs.npz") as arrays:
+        assert arrays["rel"].shape == (2, 4, 5)
+        assert arrays["samples"].tolist()[0] == "background"
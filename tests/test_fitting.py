@@ -0,0 +1,196 @@
+import json
+import shlex
+
+import numpy as np
+import pytest
+
+from hfval.fitting import (
+    FitCache,
+    fit,
+    fit_many,
+    fit_patches,
+    fit_patches_many,
+    parameter_names,
+    patched_specs,
+    set_backend,
+)
+
+
+@pytest.fixture
+def signal_specs(background, patches):
+    return list(patched_specs(background, patches[:3]))
+
+
+def test_patched_specs(background, patches):
+    patchset = {
+        "metadata": {"references": {}, "description": "", "digests": {}},
+        "version": "1.0.0",
+        "patches": [
+            {"metadata": {"name": f"point_{idx}", "values": [idx]}, "patch": patch}
+            for idx, patch in enumerate(patches[:2])
+        ],
+    }
+    names = [name for name, _ in patched_specs(background, [patches[0], patchset])]
+    assert names == [patches[0][0]["value"]["name"], "point_0", "point_1"]
+
+
+def test_fit(signal_specs):
+    set_backend("numpy", "scipy")
+    name, spec = signal_specs[0]
+    result = fit(spec, name=name)
+    assert result.name == name
+    assert result.converged
+    assert result.n_calls > 0
+    assert result.wall_time > 0
+    assert (result.backend, result.optimizer) == ("numpy", "scipy")
+    assert len(result.parameters) == len(result.bestfit)
+    assert "staterror_SR_0_0" in result.parameters
+    assert "mu_SIG" in result.parameters
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_fit_many(signal_specs, n_workers):
+    results = list(fit_many(signal_specs, n_workers=n_workers))
+    assert [result.name for result in results] == [name for name, _ in signal_specs]
+    assert all(result.converged for result in results)
+
+
+@pytest.mark.parametrize("warm_start", ["previous", "background", None])
+def test_fit_patches(background, patches, signal_specs, warm_start):
+    set_backend("numpy", "scipy")
+    reference = [fit(spec, name=name) for name, spec in signal_specs]
+    results = list(fit_patches(background, patches[:3], warm_start=warm_start))
+    assert [result.name for result in results] == [name for name, _ in signal_specs]
+    for result, expected in zip(results, reference):
+        assert result.converged
+        assert result.parameters == expected.parameters
+        assert result.twice_nll == pytest.approx(expected.twice_nll, rel=1e-4)
+    with pytest.raises(ValueError):
+        next(fit_patches(background, patches[:1], warm_start="nearest"))
+
+
+@pytest.mark.parametrize("warm_start", ["previous", "background"])
+def test_fit_patches_measurement(background, patches, warm_start):
+    # A lumi modifier, and bounded and fixed parameters in the measurement
+    for channel in background["channels"]:
+        channel["samples"][0]["modifiers"].append(
+            {"name": "lumi", "type": "lumi", "data": None}
+        )
+    background["measurements"][0]["config"]["parameters"] += [
+        {
+            "name": "lumi",
+            "auxdata": [1.0],
+            "sigmas": [0.017],
+            "bounds": [[0.9, 1.1]],
+            "inits": [1.0],
+        },
+        {"name": "bkg_norm", "bounds": [[-2.0, 2.0]]},
+        {"name": "bkg_shape", "fixed": True, "inits": [0.5]},
+    ]
+    set_backend("numpy", "scipy")
+    reference = [
+        fit(spec, name=name) for name, spec in patched_specs(background, patches[:2])
+    ]
+    results = list(fit_patches(background, patches[:2], warm_start=warm_start))
+    for result, expected in zip(results, reference):
+        assert result.converged
+        assert result.parameters == expected.parameters
+        assert result.twice_nll == pytest.approx(expected.twice_nll, rel=1e-4)
+        assert result.bestfit[result.parameters.index("bkg_shape")] == 0.5
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_fit_patches_many(background, patches, n_workers):
+    patchset = {
+        "patches": [
+            {"metadata": {"name": f"point_{idx}"}, "patch": patch}
+            for idx, patch in enumerate(patches[:3])
+        ]
+    }
+    results = list(fit_patches_many(background, [patchset], n_workers=n_workers))
+    assert [result.name for result in results] == ["point_0", "point_1", "point_2"]
+    assert all(result.converged for result in results)
+
+
+def test_fit_cache(tmp_path, signal_specs):
+    with FitCache(cache_dir=str(tmp_path)) as cache:
+        results = list(fit_many(signal_specs[:2], n_workers=1, cache=cache))
+        assert cache.reused == 0
+        cached = list(fit_many(signal_specs[:2], n_workers=1, cache=cache))
+        assert cache.reused == 2
+    for result, expected in zip(cached, results):
+        assert result.name == expected.name
+        assert result.parameters == expected.parameters
+        np.testing.assert_array_equal(result.bestfit, expected.bestfit)
+        assert result.twice_nll == expected.twice_nll
+
+    name, spec = signal_specs[0]
+    key = FitCache.key(spec)
+    assert FitCache.key(spec, backend="jax") != key
+    assert FitCache.key(spec, {"normsys": {"interpcode": "code1"}}) != key
+
+    # Other observed data is a miss, warm-started from the similar fits
+    changed = json.loads(json.dumps(spec))
+    changed["observations"][0]["data"][0] += 1
+    assert FitCache.key(changed) != key
+    with FitCache(cache_dir=str(tmp_path)) as cache:
+        assert cache.get(FitCache.key(changed)) is None
+        start_values = cache.start_values(changed)
+        # The fit of the same model structure is the closest match
+        assert start_values == dict(zip(results[0].parameters, results[0].bestfit))
+        result = next(fit_many([(name, changed)], n_workers=1, cache=cache))
+        # Warm starts are no hits, and the similar fits only index the result
+        assert (cache.cache.hits, cache.cache.misses) == (0, 2)
+        similar_key = FitCache.similar_keys(changed)[0]
+        assert list(cache.cache.get(similar_key, count=False)) == ["key"]
+    assert result.converged
+    assert result.n_calls < results[0].n_calls
+
+    # Entries beyond the size limit are evicted
+    with FitCache(cache_dir=str(tmp_path), max_bytes=1) as cache:
+        cache.put(key, results[0])
+        assert cache.get(key) is None
+
+
+def test_fit_minuit(signal_specs):
+    pytest.importorskip("iminuit")
+    set_backend("numpy", "minuit")
+    try:
+        result = fit(signal_specs[0][1])
+    finally:
+        set_backend("numpy", "scipy")
+    reference = fit(signal_specs[0][1])
+    assert result.optimizer == "minuit"
+    assert np.allclose(result.bestfit, reference.bestfit, atol=1e-2)
+
+
+def test_parameter_names(signal_specs):
+    import pyhf
+
+    model = pyhf.Workspace(signal_specs[0][1]).model()
+    names = parameter_names(model)
+    assert len(names) == model.config.npars
+    assert names[model.config.poi_index] == "mu_SIG"
+
+
+def test_compare_fitted_nuisance_pyhf_only(
+    script_runner, tmp_path, background, patches
+):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    for idx, patch in enumerate(patches[:2]):
+        (tmp_path / f"patch_{idx}.json").write_text(json.dumps(patch))
+
+    command = "pyhf-validation compare-fitted-nuisance --pyhf-json BkgOnly.json --patch patch_0.json --patch patch_1.json --n-workers 1"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert ret.stdout.count("function calls, converged") == 2
+
+    ret = script_runner.run(
+        *shlex.split(command), "--warm-start", "previous", cwd=tmp_path
+    )
+    assert ret.success
+    assert ret.stdout.count("function calls, converged") == 2
+
+    command = "pyhf-validation compare-fitted-nuisance --pyhf-json BkgOnly.json --patch patch_0.json --root-workspace a.root --root-workspace b.root --n-workers 1"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert not ret.success
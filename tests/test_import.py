@@ -1,5 +1,21 @@
+import subprocess
+import sys
+
 import hfval
 
+HEAVY_MODULES = ["ROOT", "matplotlib", "scipy", "pyhf", "jax", "torch", "tensorflow"]
+
 
 def test_import():
     assert hfval
+
+
+def test_commandline_lazy_imports():
+    code = (
+        "import sys, hfval.commandline;"
+        f"print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    ret = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert ret.stdout.strip() == ""
@@ -0,0 +1,45 @@
+import numpy as np
+import scipy.interpolate
+
+from hfval.interpolate import MassPlaneInterpolator
+
+
+def test_matches_griddata():
+    rng = np.random.default_rng(3)
+    points = rng.uniform(0, 1000, (40, 2))
+    values = rng.uniform(0, 2, (40, 6))
+    values[rng.random(values.shape) < 0.2] = 0.0
+    nonzero = values != 0
+
+    interpolator = MassPlaneInterpolator(points, resolution=50)
+    z = interpolator(values, nonzero)
+    assert z.shape == (6, 50, 50)
+    x, y = np.mgrid[
+        points[:, 0].min() : points[:, 0].max() : 50j,
+        points[:, 1].min() : points[:, 1].max() : 50j,
+    ]
+    for ibin in range(6):
+        selected = nonzero[:, ibin]
+        expected = scipy.interpolate.griddata(
+            points[selected], values[selected, ibin], (x, y)
+        )
+        np.testing.assert_allclose(z[ibin], expected, rtol=1e-12, atol=1e-12)
+
+
+def test_triangulation_reused():
+    points = [[0, 0], [1, 0], [0, 1], [1, 1], [0.5, 0.2]]
+    values = np.arange(1.0, 21.0).reshape(5, 4)
+    values[4, 1] = 0.0
+    interpolator = MassPlaneInterpolator(points, resolution=10)
+    interpolator(values, values != 0)
+    interpolator(values * 2, values != 0)
+    assert len(interpolator._triangulations) == 2
+
+
+def test_degenerate_points():
+    points = [[0, 0], [1, 1], [2, 2], [0, 2]]
+    values = np.ones((4, 2))
+    values[3, 1] = 0.0  # leaves three collinear points in the second bin
+    z = MassPlaneInterpolator(points, resolution=5)(values, values != 0)
+    assert not np.isnan(z[0]).all()
+    assert np.isnan(z[1]).all()
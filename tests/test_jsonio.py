@@ -0,0 +1,85 @@
+import gzip
+import json
+
+import pytest
+
+from hfval import jsonio
+from hfval.loader import CHANNEL_FIELDS, channel_nbins, load_background, load_json
+
+
+def installed_backends():
+    backends = []
+    for backend in jsonio.BACKENDS:
+        try:
+            __import__(backend)
+        except ImportError:
+            continue
+        backends.append(backend)
+    return backends
+
+
+@pytest.fixture(params=installed_backends())
+def backend(request):
+    previous = jsonio.get_backend()
+    yield jsonio.set_backend(request.param)
+    jsonio.set_backend(previous)
+
+
+def test_load(tmp_path, background, backend):
+    path = tmp_path / "BkgOnly.json"
+    path.write_text(json.dumps(background))
+    assert jsonio.load(str(path)) == background
+    assert jsonio.loads(path.read_bytes()) == background
+
+
+def test_load_empty(tmp_path, backend):
+    path = tmp_path / "empty.json"
+    path.write_text("")
+    with pytest.raises(ValueError):
+        jsonio.load(str(path))
+
+
+def test_loads_nan(backend):
+    assert jsonio.loads(b"[NaN]")[0] != jsonio.loads(b"[NaN]")[0]
+
+
+def test_extract(tmp_path, background, backend):
+    path = tmp_path / "BkgOnly.json"
+    path.write_text(json.dumps(background))
+    spec = jsonio.extract_file(str(path), CHANNEL_FIELDS)
+    assert list(spec) == ["channels"]
+    assert spec["channels"][0] == {
+        "name": background["channels"][0]["name"],
+        "samples": [
+            {"data": len(sample["data"])}
+            for sample in background["channels"][0]["samples"]
+        ],
+    }
+
+    fields = {"channels": [{"samples": [{"modifiers": [{"data": True}]}]}]}
+    spec = jsonio.extract_file(str(path), fields)
+    modifiers = background["channels"][1]["samples"][0]["modifiers"]
+    assert spec["channels"][1]["samples"][0]["modifiers"] == [
+        {"data": modifier["data"]} for modifier in modifiers
+    ]
+
+
+def test_load_json_fields(tmp_path, background):
+    path = tmp_path / "BkgOnly.json.gz"
+    path.write_bytes(gzip.compress(json.dumps(background).encode()))
+    assert load_json(str(path)) == background
+    expected = {
+        channel["name"]: len(channel["samples"][0]["data"])
+        for channel in background["channels"]
+    }
+    assert channel_nbins(load_json(str(path), fields=CHANNEL_FIELDS)) == expected
+    assert channel_nbins(background) == expected
+
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    spec = load_background(str(tmp_path), fields=CHANNEL_FIELDS)
+    assert channel_nbins(spec) == expected
+
+
+def test_set_backend():
+    with pytest.raises(ValueError):
+        jsonio.set_backend("yaml")
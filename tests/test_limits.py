@@ -0,0 +1,157 @@
+import json
+import shlex
+import threading
+
+import jsonpatch
+import numpy as np
+import pytest
+
+from hfval.limits import (
+    LimitResult,
+    compare_limits,
+    hypotest_patch,
+    limit_records,
+    load_table,
+    write_table,
+)
+from hfval.scheduler import run_worker
+
+
+@pytest.fixture
+def results():
+    return [
+        LimitResult("signal_300_0", 1.0, 0.02, np.array([0.01, 0.02, 0.04, 0.1, 0.2])),
+        LimitResult("signal_400_0", 1.0, 0.3, np.array([0.1, 0.2, 0.3, 0.5, 0.7])),
+    ]
+
+
+def test_hypotest_patch_changed_workspace(tmp_path, background, patches):
+    # Workers read a workspace that changed in place again
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    task = ("signal", str(tmp_path), patches[0], 1.0, "qtilde", "numpy", "scipy")
+    before = hypotest_patch(task).cls_obs
+    for observation in background["observations"]:
+        observation["data"] = [2 * value for value in observation["data"]]
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    assert hypotest_patch(task).cls_obs != pytest.approx(before)
+
+
+def test_hypotest_patch(tmp_path, background, patches):
+    import pyhf
+
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    task = (
+        "signal",
+        str(tmp_path / "BkgOnly.json"),
+        patches[0],
+        1.0,
+        "qtilde",
+        "numpy",
+        "scipy",
+    )
+    result = hypotest_patch(task)
+    # The second point of the same structure is not validated again
+    assert hypotest_patch(task).cls_obs == result.cls_obs
+
+    workspace = pyhf.Workspace(jsonpatch.apply_patch(background, patches[0]))
+    model = workspace.model(
+        modifier_settings={
+            "normsys": {"interpcode": "code4"},
+            "histosys": {"interpcode": "code4p"},
+        }
+    )
+    cls_obs, cls_exp = pyhf.infer.hypotest(
+        1.0, workspace.data(model), model, return_expected_set=True
+    )
+    assert result.cls_obs == pytest.approx(float(cls_obs))
+    assert result.cls_exp == pytest.approx(np.asarray(cls_exp, dtype=float))
+
+
+@pytest.mark.parametrize("suffix", [".csv", ".json"])
+def test_table_roundtrip(tmp_path, results, suffix):
+    write_table(tmp_path / f"table{suffix}", limit_records(results))
+    table = load_table(tmp_path / f"table{suffix}")
+    assert list(table) == ["signal_300_0", "signal_400_0"]
+    assert table["signal_400_0"]["cls_exp_p1"] == 0.5
+    assert "poi_value" not in table["signal_400_0"]
+
+
+def test_compare_limits(tmp_path, results):
+    (tmp_path / "published.json").write_text(
+        json.dumps(
+            {
+                "signal_300_0": {"cls_obs": 0.025, "cls_exp": 0.04},
+                "signal_400_0": {"cls_obs": 0.35},
+                "signal_500_0": {"cls_obs": 0.9},
+            }
+        )
+    )
+    table = load_table(tmp_path / "published.json")
+    comparisons = compare_limits(results, table, atol=0.01)
+    assert [(c.name, c.column, c.passed) for c in comparisons] == [
+        ("signal_300_0", "cls_obs", True),
+        ("signal_300_0", "cls_exp", True),
+        ("signal_400_0", "cls_obs", False),
+    ]
+    assert comparisons[2].difference == pytest.approx(-0.05)
+    assert all(c.passed for c in compare_limits(results, table, rtol=0.2, atol=0.0))
+
+
+def test_limits_cli(script_runner, tmp_path, background, patches):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    for i, patch in enumerate(patches[:4]):
+        (tmp_path / f"patch_{i}.json").write_text(json.dumps(patch))
+    command = "pyhf-validation limits --checkpoint-dir checkpoints --n-workers 1 --output limits.csv --signal-template signal_{a}_{b}"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "4 of 4 signal points finished, 0 from checkpoints" in ret.stdout
+    assert (tmp_path / "Plots" / "limits_cls_obs.png").exists()
+    table = load_table(tmp_path / "limits.csv")
+    assert len(table) == 4
+
+    # Compare with a reference table, resuming from the checkpoints
+    reference = [{"name": name, **values} for name, values in table.items()]
+    reference[1]["cls_obs"] += 0.1
+    name = reference[1]["name"]
+    write_table(tmp_path / "published.csv", reference)
+    command = "pyhf-validation limits --checkpoint-dir checkpoints --n-workers 1 --reference published.csv --signal-template signal_{a}_{b}"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert not ret.success
+    assert "4 from checkpoints" in ret.stdout
+    assert "1 of 24 CLs values of 4 signal points differ" in ret.stdout
+    assert f"{name} cls_obs" in ret.stdout
+    assert (tmp_path / "Plots" / "limits_cls_obs_delta.png").exists()
+    assert (tmp_path / "Plots" / "limits_cls_exp_delta.png").exists()
+
+    # Checkpoints of a changed patch are not reused
+    patches[0][0]["value"]["data"][0] *= 2
+    (tmp_path / "patch_0.json").write_text(json.dumps(patches[0]))
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert "4 of 4 signal points finished, 3 from checkpoints" in ret.stdout
+
+
+def test_limits_queue_lease(script_runner, tmp_path, background, patches):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    (tmp_path / "patch_0.json").write_text(json.dumps(patches[0]))
+    command = "pyhf-validation limits --executor queue --queue-dir queue --lease 0"
+    rets = []
+    collector = threading.Thread(
+        target=lambda: rets.append(
+            script_runner.run(*shlex.split(command), cwd=tmp_path)
+        )
+    )
+    collector.start()
+
+    # A worker claims the signal point and crashes before finishing it
+    queue = tmp_path / "queue"
+    claimed = False
+    while not claimed:
+        for path in (queue / "pending").glob("*.pkl"):
+            path.rename(queue / "running" / f"{path.stem}.crashed.pkl")
+            claimed = True
+
+    # The expired point is put back in the queue for the next worker
+    assert run_worker(str(queue), poll_interval=0.01, max_tasks=1) == 1
+    collector.join()
+    assert rets[0].success
+    assert "1 of 1 signal points finished" in rets[0].stdout
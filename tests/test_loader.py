@@ -0,0 +1,94 @@
+import gzip
+import io
+import json
+import tarfile
+
+import pytest
+
+from hfval.loader import (
+    channel_name,
+    iter_patch_ops,
+    load_background,
+    reduce_patch,
+    split_archive_path,
+)
+
+
+@pytest.fixture
+def patch_dir(tmp_path, patches, background):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    for idx, patch in enumerate(patches):
+        (tmp_path / f"patch_{idx:02d}.json").write_text(json.dumps(patch))
+    return tmp_path
+
+
+def expected_ops(patches):
+    return [item for patch in patches for item in reduce_patch(patch)]
+
+
+def test_reduce_patch(patches):
+    reduced = reduce_patch(patches[0])
+    assert len(reduced) == 4
+    signal, op = reduced[0]
+    assert signal == patches[0][0]["value"]["name"]
+    assert {m["type"] for m in op["value"]["modifiers"]} == {"histosys", "normsys"}
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_iter_patch_ops_directory(patch_dir, patches, n_workers):
+    ops = list(iter_patch_ops([str(patch_dir)], n_workers=n_workers))
+    assert ops == expected_ops(patches)
+
+
+def test_iter_patch_ops_glob_and_gzip(tmp_path, patches):
+    for idx, patch in enumerate(patches):
+        with gzip.open(tmp_path / f"patch_{idx:02d}.json.gz", "wt") as outfile:
+            json.dump(patch, outfile)
+    ops = list(iter_patch_ops([str(tmp_path / "patch_*")], n_workers=1))
+    assert ops == expected_ops(patches)
+
+
+def test_iter_patch_ops_patchset(tmp_path, patches):
+    patchset = {
+        "metadata": {"references": {}, "description": "", "digests": {}},
+        "version": "1.0.0",
+        "patches": [
+            {"metadata": {"name": f"point_{idx}", "values": [idx]}, "patch": patch}
+            for idx, patch in enumerate(patches)
+        ],
+    }
+    (tmp_path / "patchset.json").write_text(json.dumps(patchset))
+    ops = list(iter_patch_ops([str(tmp_path / "patchset.json")], n_workers=2))
+    # The signals are named after the patches, like in columnar stores
+    assert ops == [
+        item
+        for idx, patch in enumerate(patches)
+        for item in reduce_patch(patch, f"point_{idx}")
+    ]
+
+
+def test_tarball(tmp_path, patches, background):
+    archive = tmp_path / "likelihoods.tar.gz"
+    with tarfile.open(archive, "w:gz") as tar:
+        for name, doc in [("RegionA/BkgOnly.json", background)] + [
+            (f"RegionA/patch_{idx:02d}.json", patch)
+            for idx, patch in enumerate(patches)
+        ]:
+            raw = json.dumps(doc).encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(raw)
+            tar.addfile(info, io.BytesIO(raw))
+
+    assert split_archive_path(f"{archive}/RegionA") == (str(archive), "RegionA")
+    assert load_background(f"{archive}/RegionA/BkgOnly.json") == background
+    ops = list(iter_patch_ops([f"{archive}/RegionA"], n_workers=2))
+    assert ops == expected_ops(patches)
+    assert list(iter_patch_ops([f"{archive}/RegionB"], n_workers=1)) == []
+    with pytest.raises(FileNotFoundError):
+        load_background(f"{archive}/RegionB/BkgOnly.json")
+
+
+def test_load_background_directory(patch_dir, background):
+    spec = load_background(str(patch_dir))
+    assert spec == background
+    assert channel_name(spec, "/channels/2/samples/1") == "SR_2"
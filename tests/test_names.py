@@ -0,0 +1,69 @@
+import json
+
+import numpy as np
+
+from hfval.names import DEFAULT_RULES, ParameterIndex, Rule, load_rules, translate
+
+
+def test_translate_is_anchored():
+    # The old replace chain turned "alpha_jet_binning" into "jetning"
+    assert translate(["alpha_jet_binning", "alpha_lumi_extra"]) == [
+        ("jet_binning", None),
+        ("lumi_extra", None),
+    ]
+    assert translate(["gamma_shape_SR_bin_0"]) == [("shape_SR", 0)]
+
+
+def test_parameter_index():
+    root_names = [
+        "alpha_syst",
+        "gamma_stat_SR_bin_0",
+        "gamma_stat_SR_bin_1",
+        "gamma_shape_bin_0",
+        "lumi",
+        "alpha_root_only",
+        "mu_SIG",
+    ]
+    pyhf_names = [
+        "mu_SIG",
+        "Lumi",
+        "syst",
+        "staterror_SR_0",
+        "staterror_SR_1",
+        "shape",
+        "pyhf_only",
+    ]
+    index = ParameterIndex(root_names, pyhf_names)
+    assert index.root_to_pyhf.tolist() == [2, 3, 4, 5, 1, -1, 0]
+    assert index.pyhf_to_root.tolist() == [6, 4, 0, 1, 2, 3, -1]
+    assert index.unmatched_root().tolist() == ["root_only"]
+    assert index.unmatched_pyhf().tolist() == ["pyhf_only"]
+
+    root_values = np.arange(len(root_names), dtype=float)
+    root_idx, pyhf_idx = index.pairs()
+    aligned = np.full(len(pyhf_names), np.nan)
+    aligned[pyhf_idx] = root_values[root_idx]
+    assert np.array_equal(aligned[:6], [6.0, 4.0, 0.0, 1.0, 2.0, 3.0])
+
+
+def test_load_rules(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps([{"pattern": "^ATLAS_(?P<name>.+)$", "name": r"\1"}]))
+    rules = load_rules(path)
+    assert rules[0] == Rule("^ATLAS_(?P<name>.+)$", r"\1")
+    assert rules[1:] == DEFAULT_RULES
+
+    index = ParameterIndex(["ATLAS_lumi", "alpha_syst"], ["lumi", "syst"], rules=rules)
+    assert index.root_to_pyhf.tolist() == [0, 1]
+
+
+def test_parameter_index_from_model(background):
+    import pyhf
+
+    model = pyhf.Workspace(background).model(poi_name=None)
+    root_names = ["alpha_bkg_norm", "alpha_bkg_shape"] + [
+        f"gamma_stat_SR_3_bin_{i}" for i in range(5)
+    ]
+    index = ParameterIndex.from_model(root_names, model)
+    assert (index.root_to_pyhf >= 0).all()
+    assert len(index.unmatched_pyhf()) == model.config.npars - len(root_names)
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from hfval.loader import reduce_patch
+from hfval.outliers import OutlierTracker, SummaryLog, TopK, read_summary_log
+from hfval.systematics import iter_summaries, summarize_ops
+
+
+@pytest.fixture
+def ops(patches):
+    return [item for patch in patches for item in reduce_patch(patch)]
+
+
+def test_top_k():
+    rng = np.random.default_rng(1)
+    noms = rng.uniform(size=100)
+    tracker = OutlierTracker(threshold=0.0, k=5)
+    for idx, nom in enumerate(noms):
+        tracker.update(f"signal_{idx}", "/channels/0/samples/1", [1.0], [nom])
+    top = tracker.overall
+    assert top.count == 100
+    assert [o.nom for o in top.items()] == sorted(noms, reverse=True)[:5]
+
+    by_rel = TopK(k=3, key="rel")
+    for o in top.items():
+        by_rel.push(o._replace(rel=-o.nom))
+    top_noms = [o.nom for o in top.items()]
+    assert [o.rel for o in by_rel.items()] == [-nom for nom in top_noms[:1:-1]]
+
+
+def test_outlier_tracker(ops):
+    summaries = summarize_ops(ops)
+    tracker = OutlierTracker(threshold=1.0, k=4)
+    expected = []
+    for (signal, path), summary in summaries:
+        tracker.update(signal, path, summary["rel"], summary["nom"])
+        for b, (r, n) in enumerate(zip(summary["rel"], summary["nom"])):
+            if r > 1.0:
+                expected.append((n, path))
+
+    assert len(expected) > 4
+    assert tracker.overall.count == len(expected)
+    assert [o.nom for o in tracker.overall.items()] == sorted(
+        (n for n, _ in expected), reverse=True
+    )[:4]
+    for path, top in tracker.by_channel.items():
+        noms = sorted((n for n, p in expected if p == path), reverse=True)
+        assert top.count == len(noms)
+        assert [o.nom for o in top.items()] == noms[:4]
+
+
+def test_summary_log(tmp_path, ops):
+    summaries = summarize_ops(ops)
+    assert [key for key, _ in iter_summaries(ops, batch_size=3)] == [
+        key for key, _ in summaries
+    ]
+
+    with SummaryLog(tmp_path / "log") as log:
+        for (signal, path), summary in iter_summaries(ops, batch_size=7):
+            log.append(signal, path, summary["rel"], summary["nom"])
+        rel = log.channel("/channels/3/samples/1", 5)
+        signals, paths = log.signals, log.paths
+
+    assert rel.shape == (len(signals), 5)
+    for (signal, path), summary in summaries:
+        if path == "/channels/3/samples/1":
+            np.testing.assert_array_equal(rel[signals.index(signal)], summary["rel"])
+
+    columns = read_summary_log(tmp_path / "log")
+    assert (columns["signals"], columns["paths"]) == (signals, paths)
+    assert len(columns["rel"]) == sum(len(summary["rel"]) for _, summary in summaries)
+    np.testing.assert_array_equal(
+        columns["nom"], np.concatenate([summary["nom"] for _, summary in summaries])
+    )
@@ -0,0 +1,69 @@
+import json
+import pstats
+import shlex
+
+import pytest
+
+from hfval import profiling
+
+
+@pytest.fixture
+def profiler(tmp_path):
+    profiler = profiling.enable(pstats_dir=str(tmp_path / "pstats"))
+    yield profiler
+    profiling.disable()
+
+
+def test_disabled():
+    assert not profiling.enabled()
+    with profiling.stage("stage"):
+        profiling.count("counter")
+    assert profiling.stage("a") is profiling.stage("b")
+
+
+def test_profiler(tmp_path, profiler):
+    with profiling.stage("outer"):
+        for _ in range(3):
+            with profiling.stage("inner"):
+                sum(range(1000))
+        profiling.count("items", 3)
+    profiling.count("items")
+
+    assert profiler.counters == {"items": 4}
+    assert profiler.totals["inner"][0] == 3
+    assert profiler.totals["outer"][1] >= profiler.totals["inner"][1]
+
+    path = tmp_path / "trace.json"
+    profiler.write(str(path))
+    trace = json.loads(path.read_text())
+    stages = [event for event in trace["traceEvents"] if event["ph"] == "X"]
+    assert [event["name"] for event in stages] == ["inner"] * 3 + ["outer"]
+    outer = stages[-1]
+    for inner in stages[:-1]:
+        assert outer["ts"] <= inner["ts"]
+        assert inner["ts"] + inner["dur"] <= outer["ts"] + outer["dur"]
+    assert trace["otherData"]["counters"] == {"items": 4}
+    assert "peak RSS (MB)" in profiler.summary()
+
+    # The nested stages are left out of the profile of the outer stage
+    inner_stats = pstats.Stats(str(tmp_path / "pstats" / "inner.pstats"))
+    outer_stats = pstats.Stats(str(tmp_path / "pstats" / "outer.pstats"))
+    assert any(
+        func[2] == "<built-in method builtins.sum>" for func in inner_stats.stats
+    )
+    assert not any(
+        func[2] == "<built-in method builtins.sum>" for func in outer_stats.stats
+    )
+
+
+def test_profile_cli(script_runner, tmp_path, background):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    command = "pyhf-validation --profile validate-workspace"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "workspace systematics" in ret.stderr
+
+    trace = json.loads((tmp_path / "hfval-profile.json").read_text())
+    names = {event["name"] for event in trace["traceEvents"]}
+    assert {"pyhf-validation validate-workspace", "workspace systematics"} <= names
+    assert trace["otherData"]["counters"]["files parsed"] == 1
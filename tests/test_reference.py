@@ -0,0 +1,83 @@
+import json
+import shlex
+
+import numpy as np
+import pytest
+
+from hfval.reference import (
+    ReferenceStore,
+    RootFitResult,
+    load_reference,
+    save_reference,
+)
+
+
+@pytest.fixture
+def root_result():
+    return RootFitResult(
+        parameters=["alpha_bkg_norm", "gamma_stat_SR_0_bin_0", "mu_SIG"],
+        values=np.array([0.1, 1.02, 0.5]),
+        errors=np.array([0.9, 0.05, 0.3]),
+        correlation=np.array([[1.0, 0.2, -0.1], [0.2, 1.0, 0.0], [-0.1, 0.0, 1.0]]),
+    )
+
+
+def test_reference_roundtrip(tmp_path, root_result):
+    path = tmp_path / "reference.npz"
+    save_reference(path, root_result)
+    result = load_reference(path)
+    assert result.parameters == root_result.parameters
+    for field in ["values", "errors", "correlation"]:
+        assert np.array_equal(getattr(result, field), getattr(root_result, field))
+
+
+def test_reference_store(tmp_path, root_result):
+    root_workspace = tmp_path / "combined.root"
+    root_workspace.write_bytes(b"workspace")
+    with ReferenceStore(cache_dir=tmp_path / "cache") as store:
+        assert store.get(root_workspace) is None
+        store.put(root_workspace, root_result)
+        assert store.get(root_workspace).parameters == root_result.parameters
+        # A cached result is returned without running the ROOT fit
+        assert store.fit(root_workspace).parameters == root_result.parameters
+
+        # The results are keyed by the content of the workspace file
+        root_workspace.write_bytes(b"changed workspace")
+        assert store.get(root_workspace) is None
+
+
+def test_compare_fitted_nuisance_root_reference(
+    script_runner, tmp_path, background, patches, root_result
+):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    (tmp_path / "patch_0.json").write_text(json.dumps(patches[0]))
+    save_reference(tmp_path / "reference.npz", root_result)
+
+    command = "pyhf-validation compare-fitted-nuisance --pyhf-json BkgOnly.json --patch patch_0.json --root-reference reference.npz --n-workers 1"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "bkg_norm" in ret.stdout
+    assert "staterror_SR_0_0" in ret.stdout
+    assert "missing from pyhf file" not in ret.stdout
+
+    command = "pyhf-validation compare-fitted-nuisance --pyhf-json BkgOnly.json --patch patch_0.json --root-reference reference.npz --n-workers 1 --report report.json"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    records = json.loads((tmp_path / "report.json").read_text())
+    assert [record["parameter"] for record in records] == [
+        "bkg_norm",
+        "staterror_SR_0_0",
+        "mu_SIG",
+    ]
+    assert "mu_SIG" in ret.stdout
+
+    # The number of references is checked before running the fits
+    (tmp_path / "broken.json").write_text("{}")
+    command = "pyhf-validation compare-fitted-nuisance --pyhf-json BkgOnly.json --pyhf-json broken.json --root-reference reference.npz --n-workers 1"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert not ret.success
+    assert "got 1 values for 2 pyhf fits" in ret.stderr
+
+    command = "pyhf-validation compare-fitted-nuisance --pyhf-json BkgOnly.json --patch patch_0.json --root-reference reference.npz --root-workspace combined.root --n-workers 1"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert not ret.success
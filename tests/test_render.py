@@ -0,0 +1,70 @@
+import re
+
+import numpy as np
+import pytest
+
+from hfval.render import BarJob, ContourJob, render
+
+
+@pytest.fixture
+def jobs():
+    x, y = np.mgrid[0:10:20j, 0:5:20j]
+    return [
+        BarJob(
+            filename="bar.png",
+            title="signal: SR (Bin 1), Norm & Histo",
+            labels=["histo_0", "norm_1"],
+            values=np.array([0.6, 0.8]),
+            ylabel="Relative Syst Size",
+        ),
+        ContourJob(
+            filename="contour.png",
+            title="SR (Bin 1)",
+            x=x,
+            y=y,
+            z=x * y / 10,
+            points=np.array([[0.0, 10.0, 5.0], [0.0, 5.0, 2.0], [0.0, 5.0, 1.0]]),
+            outliers=np.array([[10.0], [5.0], [5.0]]),
+            vmin=0,
+            vmax=4,
+            xlim=(-1, 11),
+            ylim=(-1, 6),
+            xlabel="x label",
+            ylabel=None,
+            zlabel="rel",
+        ),
+    ]
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_render_png(tmp_path, jobs, n_workers):
+    import matplotlib
+
+    labelsize = matplotlib.rcParams["xtick.labelsize"]
+    assert render(jobs, output_dir=tmp_path, n_workers=n_workers) == 2
+    # The settings of the figures do not leak into the calling process
+    assert matplotlib.rcParams["xtick.labelsize"] == labelsize
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["bar.png", "contour.png"]
+
+
+def test_render_pdf(tmp_path, jobs):
+    assert render(jobs, output_dir=tmp_path, output_format="pdf", n_workers=1) == 2
+    assert [p.name for p in tmp_path.iterdir()] == ["plots.pdf"]
+    pdf = (tmp_path / "plots.pdf").read_bytes()
+    assert len(re.findall(rb"/Type\s*/Page\b(?!s)", pdf)) == 2
+    # The pages are vector graphics with text, matplotlib only rasterizes the
+    # many levels of the colorbar
+    assert b"/Font" in pdf
+    assert len(re.findall(rb"/Subtype\s*/Image", pdf)) == 1
+
+
+def test_render_html(tmp_path, jobs):
+    render(jobs, output_dir=tmp_path, output_format="html", name="index", n_workers=1)
+    index = (tmp_path / "index.html").read_text()
+    assert 'src="bar.png"' in index and 'src="contour.png"' in index
+    assert (tmp_path / "contour.png").exists()
+
+
+def test_render_unknown_format(tmp_path, jobs):
+    with pytest.raises(ValueError):
+        render(jobs, output_dir=tmp_path, output_format="svg")
@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from hfval.names import ParameterIndex
+from hfval.reference import RootFitResult
+from hfval.report import ComparisonReport, Tolerance
+
+
+@pytest.fixture
+def report():
+    return ComparisonReport.from_values(
+        ["a", "b", "c", "d"],
+        pyhf_values=[1.0, 1e-9, 0.0, 2.0],
+        root_values=[1.001, -1e-9, 0.0, 1.0],
+        root_errors=[0.1, 0.5, 0.0, 0.5],
+        fit="signal",
+    )
+
+
+def test_comparison_report(report):
+    assert np.allclose(report.abs_diff, [-1e-3, 2e-9, 0.0, 1.0])
+    # The relative difference is bounded near zero instead of dividing by pyhf
+    assert np.allclose(report.rel_diff, [-1e-3 / 1.001, 2.0, 0.0, 0.5])
+    assert np.allclose(report.pull[[0, 1, 3]], [-1e-2, 4e-9, 2.0])
+    assert np.isnan(report.pull[2])
+    assert report.passed.tolist() == [True, True, True, False]
+    assert report.n_failed == 1
+    assert report.fit.tolist() == ["signal"] * 4
+
+    loose = ComparisonReport.from_values(
+        report.parameter,
+        report.pyhf,
+        report.root,
+        report.root_error,
+        tolerance=Tolerance(rtol=0.0, atol=0.0, max_pull=2.0),
+    )
+    assert loose.passed.tolist() == [True, True, True, True]
+
+
+def test_comparison_report_from_index():
+    index = ParameterIndex(
+        ["alpha_syst", "mu_SIG", "alpha_missing"], ["mu_SIG", "syst"]
+    )
+    root_result = RootFitResult(
+        parameters=index.root_names.tolist(),
+        values=np.array([0.5, 1.0, 3.0]),
+        errors=np.array([1.0, 0.2, 1.0]),
+        correlation=np.eye(3),
+    )
+    report = ComparisonReport.from_index(index, [1.1, 0.4], root_result)
+    assert report.parameter.tolist() == ["syst", "mu_SIG"]
+    assert np.allclose(report.abs_diff, [-0.1, 0.1])
+    assert np.allclose(report.pull, [-0.1, 0.5])
+
+
+@pytest.mark.parametrize("suffix", [".npz", ".json"])
+def test_comparison_report_roundtrip(tmp_path, report, suffix):
+    stacked = ComparisonReport.concatenate([report, report])
+    assert len(stacked) == 8
+    path = tmp_path / f"report{suffix}"
+    stacked.write(path)
+    result = ComparisonReport.read(path)
+    for name, column in stacked.columns().items():
+        np.testing.assert_array_equal(getattr(result, name), column)
+
+
+def test_comparison_report_csv(tmp_path, report):
+    import csv
+
+    path = tmp_path / "report.csv"
+    report.write(path)
+    with open(path) as infile:
+        rows = list(csv.DictReader(infile))
+    assert [row["parameter"] for row in rows] == ["a", "b", "c", "d"]
+    assert rows[3]["passed"] == "False"
+
+    with pytest.raises(ValueError):
+        report.write(tmp_path / "report.txt")
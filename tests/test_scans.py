@@ -0,0 +1,142 @@
+import json
+import shlex
+
+import jsonpatch
+import numpy as np
+import pytest
+
+from hfval.fitting import model_data
+from hfval.scans import (
+    ProfileScan,
+    compare_scan,
+    load_scans,
+    profile_scan,
+    save_scans,
+    scan_grid,
+    scan_parameters,
+    write_comparisons,
+)
+
+
+@pytest.fixture
+def spec(background, patches):
+    return jsonpatch.apply_patch(background, patches[0])
+
+
+def test_scan_parameters(spec):
+    def grids(model, bestfit):
+        assert bestfit.converged
+        index = bestfit.parameters.index("bkg_norm")
+        values = scan_grid(model, bestfit.bestfit, index, n_points=5, n_sigma=2.0)
+        assert values[0] == pytest.approx(bestfit.bestfit[index] - 2.0)
+        return {"mu_SIG": np.linspace(0.0, 2.0, 5), "bkg_norm": values}
+
+    bestfit, scans = scan_parameters(spec, grids, n_workers=1)
+    assert [scan.parameter for scan in scans] == ["mu_SIG", "bkg_norm"]
+    for scan in scans:
+        assert scan.converged.all()
+        assert scan.twice_nll_min == bestfit.twice_nll
+        # The best fit is the minimum of every profile
+        assert (scan.twice_nll >= bestfit.twice_nll - 1e-6).all()
+    # Symmetric around the best fit for a normal constraint
+    profile = scans[1].twice_nll - bestfit.twice_nll
+    assert profile[2] == pytest.approx(0.0, abs=1e-4)
+    assert profile[0] == pytest.approx(profile[4], rel=0.1)
+
+    with pytest.raises(ValueError):
+        scan_parameters(spec, {"unknown": [0.0]}, n_workers=1)
+
+
+def test_profile_scan_failure(monkeypatch, spec):
+    import pyhf
+
+    model = pyhf.Workspace(spec).model()
+    data = model_data(model, spec)
+    index = model.config.poi_index
+    bestfit, twice_nll_min = pyhf.infer.mle.fit(data, model, return_fitted_val=True)
+    values = np.linspace(0.0, 2.0, 5)
+
+    # The fit of the point at 1.0 fails, the one at 1.5 starts from the last
+    # good neighbour at 0.5
+    fit = pyhf.infer.mle.fit
+    starts = {}
+
+    def failing_fit(data, model, init_pars, **kwargs):
+        starts[init_pars[index]] = init_pars
+        if init_pars[index] == 1.0:
+            raise pyhf.exceptions.FailedMinimization(None)
+        return fit(data, model, init_pars=init_pars, **kwargs)
+
+    monkeypatch.setattr(pyhf.infer.mle, "fit", failing_fit)
+    scan = profile_scan(model, data, index, values, bestfit, float(twice_nll_min))
+    assert scan.converged.tolist() == [True, True, False, True, True]
+    assert np.isnan(scan.twice_nll[2])
+    assert np.isfinite(scan.twice_nll[[0, 1, 3, 4]]).all()
+    assert (
+        np.delete(starts[1.5], index).tolist() == np.delete(starts[1.0], index).tolist()
+    )
+
+
+def test_compare_scans(tmp_path):
+    values = np.linspace(-1.0, 1.0, 5)
+    scans = [
+        ProfileScan("bkg_norm", values, 10.0 + values**2, 10.0, np.ones(5, dtype=bool)),
+        ProfileScan(
+            "mu_SIG", values[:3], 10.0 + values[:3] ** 2, 10.0, np.ones(3, bool)
+        ),
+    ]
+    save_scans(tmp_path / "scans.npz", scans)
+    loaded = load_scans(tmp_path / "scans.npz")
+    assert [scan.parameter for scan in loaded] == ["bkg_norm", "mu_SIG"]
+    assert np.array_equal(loaded[1].twice_nll, scans[1].twice_nll)
+
+    # A constant offset of the likelihood does not matter
+    reference = ProfileScan("alpha_bkg_norm", values, 3.0 + values**2, 3.0, None)
+    comparison = compare_scan(scans[0], reference)
+    assert comparison.max_deviation == pytest.approx(0.0)
+
+    reference = reference._replace(twice_nll=reference.twice_nll + [0, 0, 0, 0.5, 0])
+    comparison = compare_scan(scans[0], reference)
+    assert comparison.max_deviation == pytest.approx(0.5)
+    assert comparison.difference[3] == pytest.approx(-0.5)
+
+    with pytest.raises(ValueError):
+        compare_scan(scans[1], reference)
+
+    write_comparisons(tmp_path / "report.csv", [comparison])
+    lines = (tmp_path / "report.csv").read_text().splitlines()
+    assert lines[0] == "parameter,value,profile,reference,difference"
+    assert len(lines) == 6
+
+
+def test_profile_scan_cli(script_runner, tmp_path, spec):
+    (tmp_path / "workspace.json").write_text(json.dumps(spec))
+    command = "pyhf-validation profile-scan --pyhf-json workspace.json --parameter bkg_norm --parameter mu_SIG --n-points 5 --n-workers 1 --output scans.npz"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "bkg_norm: 5 points" in ret.stdout
+
+    # ROOT names of a reference exported with a different likelihood offset
+    scans = load_scans(tmp_path / "scans.npz")
+    scans[0] = scans[0]._replace(parameter="alpha_bkg_norm")
+    scans = [
+        scan._replace(
+            twice_nll=scan.twice_nll + 5.0, twice_nll_min=scan.twice_nll_min + 5.0
+        )
+        for scan in scans
+    ]
+    save_scans(tmp_path / "reference.npz", scans)
+    command = "pyhf-validation profile-scan --pyhf-json workspace.json --reference reference.npz --n-workers 1 --report report.json"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "bkg_norm: max deviation" in ret.stdout
+    records = json.loads((tmp_path / "report.json").read_text())
+    assert len(records) == 10
+    assert max(abs(record["difference"]) for record in records) < 1e-3
+
+    scans[1] = scans[1]._replace(twice_nll=scans[1].twice_nll + np.arange(5))
+    save_scans(tmp_path / "reference.npz", scans)
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert not ret.success
+    assert "mu_SIG: max deviation 4 at" in ret.stdout
+    assert "1 of 2 scans deviate" in ret.stderr
@@ -0,0 +1,158 @@
+import json
+import os
+import shlex
+import threading
+
+import pytest
+
+from hfval.scheduler import (
+    FileQueueExecutor,
+    LocalExecutor,
+    Scheduler,
+    TaskError,
+    make_executor,
+    run_worker,
+)
+
+
+def square(payload):
+    return payload**2
+
+
+def flaky_square(payload):
+    # Fails the first time it is called for a value, in any process
+    value, marker = payload
+    if not os.path.exists(marker):
+        open(marker, "w").close()
+        raise RuntimeError(f"first attempt at {value}")
+    return value**2
+
+
+def broken(payload):
+    raise RuntimeError("broken")
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_retries(tmp_path, n_workers):
+    tasks = [(f"point_{i}", (i, str(tmp_path / f"{i}.marker"))) for i in range(5)]
+    scheduler = Scheduler(
+        flaky_square, executor=LocalExecutor(n_workers=n_workers), retries=1
+    )
+    assert scheduler.run(tasks) == [(f"point_{i}", i**2) for i in range(5)]
+    assert not scheduler.failed
+
+
+def test_failed():
+    scheduler = Scheduler(broken, executor=LocalExecutor(n_workers=1), retries=2)
+    assert scheduler.run([("a", 1), ("b", 2)]) == []
+    assert set(scheduler.failed) == {"a", "b"}
+    assert isinstance(scheduler.failed["a"], TaskError)
+    assert "RuntimeError: broken" in str(scheduler.failed["a"])
+
+
+def test_resume(tmp_path):
+    checkpoint = str(tmp_path / "checkpoints")
+    tasks = [(f"point_{i}", i) for i in range(4)]
+    executor = LocalExecutor(n_workers=1)
+    scheduler = Scheduler(square, executor=executor, checkpoint_dir=checkpoint)
+    assert scheduler.run(tasks[:2]) == [("point_0", 0), ("point_1", 1)]
+
+    # Resuming only runs the tasks without a checkpoint
+    calls = []
+    scheduler = Scheduler(
+        lambda x: calls.append(x) or square(x),
+        executor=executor,
+        checkpoint_dir=checkpoint,
+    )
+    assert scheduler.run(tasks) == [(f"point_{i}", i**2) for i in range(4)]
+    assert scheduler.n_resumed == 2
+    assert calls == [2, 3]
+
+
+def test_file_queue(tmp_path):
+    queue = str(tmp_path / "queue")
+    executor = FileQueueExecutor(queue, poll_interval=0.01)
+    worker = threading.Thread(
+        target=run_worker, args=(queue,), kwargs={"poll_interval": 0.01, "max_tasks": 4}
+    )
+    worker.start()
+    scheduler = Scheduler(square, executor=executor, retries=0)
+    tasks = [(f"point_{i}", i) for i in range(4)]
+    assert scheduler.run(tasks) == [(f"point_{i}", i**2) for i in range(4)]
+    worker.join()
+    for state in ["pending", "running", "done", "failed"]:
+        assert os.listdir(os.path.join(queue, state)) == []
+
+
+def test_file_queue_lease(tmp_path):
+    queue = str(tmp_path / "queue")
+    executor = FileQueueExecutor(queue, poll_interval=0.01, lease=0.0)
+    results = []
+    collector = threading.Thread(
+        target=lambda: results.extend(executor.run(square, [("point", 3)]))
+    )
+    collector.start()
+
+    # A worker claims the task and crashes before finishing it
+    pending = os.path.join(queue, "pending")
+    claimed = False
+    while not claimed:
+        for name in os.listdir(pending):
+            if name.endswith(".pkl"):
+                running = os.path.join(queue, "running", f"{name[:-4]}.crashed.pkl")
+                os.rename(os.path.join(pending, name), running)
+                claimed = True
+
+    # The expired task is put back in the queue for the next worker
+    assert run_worker(queue, poll_interval=0.01, max_tasks=1) == 1
+    collector.join()
+    assert results == [("point", 9, None)]
+
+
+def test_make_executor(tmp_path):
+    assert isinstance(make_executor("local", n_workers=1), LocalExecutor)
+    assert isinstance(
+        make_executor("queue", queue_dir=str(tmp_path)), FileQueueExecutor
+    )
+    with pytest.raises(ValueError):
+        make_executor("queue")
+    with pytest.raises(ValueError):
+        make_executor("slurm")
+
+
+def test_scan(script_runner, tmp_path, background, patches):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    for idx, patch in enumerate(patches[:2]):
+        (tmp_path / f"patch_{idx}.json").write_text(json.dumps(patch))
+
+    command = "pyhf-validation scan --n-workers 1 --checkpoint-dir checkpoints --output scan.json"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "2 of 2 fits finished, 0 from checkpoints" in ret.stdout
+    records = json.loads((tmp_path / "scan.json").read_text())
+    assert [record["name"] for record in records] == [
+        patch[0]["value"]["name"] for patch in patches[:2]
+    ]
+    assert "mu_SIG" in records[0]["bestfit"]
+
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "2 of 2 fits finished, 2 from checkpoints" in ret.stdout
+    assert json.loads((tmp_path / "scan.json").read_text()) == records
+
+    # Checkpoints of another patch, workspace or optimizer are not reused
+    patches[1][0]["value"]["data"][0] *= 2
+    (tmp_path / "patch_1.json").write_text(json.dumps(patches[1]))
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "2 of 2 fits finished, 1 from checkpoints" in ret.stdout
+    background["channels"][0]["samples"][0]["data"][0] *= 2
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "2 of 2 fits finished, 0 from checkpoints" in ret.stdout
+    ret = script_runner.run(
+        *shlex.split(command), "--optimizer", "minuit", cwd=tmp_path
+    )
+    assert ret.success
+    assert "0 from checkpoints" in ret.stdout
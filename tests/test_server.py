@@ -0,0 +1,146 @@
+import json
+import shlex
+import subprocess
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from hfval.fitting import FitResult, fit_patch
+from hfval.limits import LimitResult, hypotest_patch
+from hfval.scheduler import Scheduler, make_executor
+from hfval.server import Client, ServerError, decode, encode, make_server
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = make_server(str(tmp_path / "serve.sock"), max_models=2)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+    yield server
+    server.shutdown()
+    thread.join()
+    server.server_close()
+
+
+def test_encode():
+    result = LimitResult("signal", 1.0, 0.1, np.array([0.1, 0.2, 0.3, 0.4, 0.5]))
+    decoded = decode(json.loads(json.dumps(encode({"results": [result]}))))
+    assert decoded["results"][0].name == "signal"
+    assert decoded["results"][0].cls_exp.tolist() == result.cls_exp.tolist()
+
+
+def test_server(tmp_path, server, background, patches):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    client = Client(server.server_address)
+    bkg = str(tmp_path / "BkgOnly.json")
+    task = ("signal", bkg, patches[0], "numpy", "scipy")
+
+    result = client.call("fit_patch", task=task)
+    assert isinstance(result, FitResult)
+    assert result.twice_nll == pytest.approx(fit_patch(task).twice_nll, rel=1e-4)
+    client.call("fit_patch", task=task)
+    limit = client.call("hypotest_patch", task=task[:3] + (1.0, "qtilde") + task[3:])
+    assert isinstance(limit, LimitResult)
+    assert limit.cls_obs == pytest.approx(
+        hypotest_patch(task[:3] + (1.0, "qtilde") + task[3:]).cls_obs
+    )
+
+    status = client.call("status")
+    assert (status["tasks"], status["results_reused"]) == (3, 1)
+    assert (status["hits"], status["misses"]) == (1, 1)
+
+    # Only max_models models are kept
+    for patch in patches[1:4]:
+        client.call("fit_patch", task=("signal", bkg, patch, "numpy", "scipy"))
+    assert client.call("status")["models"] == 2
+
+    with pytest.raises(ServerError, match="Unknown method"):
+        client.call("unknown")
+    with pytest.raises(ServerError, match="FileNotFoundError"):
+        client.call("fit_patch", task=("signal", "missing.json", [], "numpy", "scipy"))
+
+
+def test_server_changed_directory(tmp_path, server, background, patches):
+    # A background directory changed in place is read again
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    client = Client(server.server_address)
+    task = ("signal", str(tmp_path), patches[0], "numpy", "scipy")
+    before = client.call("fit_patch", task=task)
+    for observation in background["observations"]:
+        observation["data"] = [2 * value for value in observation["data"]]
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    after = client.call("fit_patch", task=task)
+    assert after.twice_nll != pytest.approx(before.twice_nll)
+    status = client.call("status")
+    assert (status["results_reused"], status["misses"]) == (0, 2)
+
+
+def test_server_loopback(script_runner):
+    make_server("http://127.0.0.1:0").server_close()
+    with pytest.raises(ValueError, match="only listens on loopback"):
+        make_server("http://0.0.0.0:0")
+    ret = script_runner.run(
+        "pyhf-validation", "serve", "--address", "http://192.0.2.1:8080"
+    )
+    assert not ret.success
+    assert "only listens on loopback addresses, not 192.0.2.1" in ret.stderr
+
+
+def test_server_executor(tmp_path, server, background, patches):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    bkg = str(tmp_path / "BkgOnly.json")
+    tasks = [
+        ("signal_0", ("signal_0", bkg, patches[0], "numpy", "scipy")),
+        ("signal_1", ("signal_1", "missing.json", patches[1], "numpy", "scipy")),
+    ]
+    executor = make_executor("server", address=server.server_address)
+    scheduler = Scheduler(fit_patch, executor=executor, retries=0)
+    results = scheduler.run(tasks)
+    executor.close()
+    assert [key for key, _ in results] == ["signal_0"]
+    assert list(scheduler.failed) == ["signal_1"]
+    with pytest.raises(ValueError, match="cannot run in the server"):
+        list(executor.run(sorted, []))
+
+
+def test_serve_cli(script_runner, tmp_path, background, patches):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    for i, patch in enumerate(patches[:2]):
+        (tmp_path / f"patch_{i}.json").write_text(json.dumps(patch))
+    address = str(tmp_path / "serve.sock")
+    process = subprocess.Popen(
+        ["pyhf-validation", "serve", "--address", address],
+        cwd=tmp_path,
+    )
+    try:
+        for _ in range(200):
+            ret = script_runner.run(
+                "pyhf-validation", "serve", "--status", "--address", address
+            )
+            if ret.success:
+                break
+            time.sleep(0.1)
+        assert "tasks: 0" in ret.stdout
+
+        command = f"pyhf-validation limits --executor server --address {address}"
+        for _ in range(2):
+            ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+            assert ret.success
+            assert "2 of 2 signal points finished" in ret.stdout
+        ret = script_runner.run(
+            "pyhf-validation", "serve", "--stop", "--address", address
+        )
+        assert ret.success
+        assert "results_reused: 2" in ret.stdout
+        process.wait(timeout=10)
+    finally:
+        process.kill()
+    assert not (tmp_path / "serve.sock").exists()
+
+    ret = script_runner.run(
+        "pyhf-validation", "serve", "--status", "--address", address
+    )
+    assert not ret.success
+    assert "No server is listening" in ret.stderr
@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+import pytest
+
+from hfval.loader import load_background, reduce_patch
+from hfval.store import ColumnarStore, is_store, write_store
+from hfval.systematics import iter_summaries
+
+
+@pytest.fixture
+def store(tmp_path, background, patches):
+    return write_store(str(tmp_path / "store"), background, patches)
+
+
+def test_round_trip(tmp_path, store, background, patches):
+    assert is_store(store.path)
+    assert not is_store(str(tmp_path))
+    reopened = ColumnarStore(store.path)
+    assert isinstance(reopened.nominal, np.memmap)
+    assert reopened.workspace() == background
+    assert load_background(store.path) == background
+    assert [ops for _, ops in reopened.patches()] == patches
+    assert reopened.signals == [patch[0]["value"]["name"] for patch in patches]
+    assert reopened.channel_nbins() == {
+        channel["name"]: len(channel["samples"][0]["data"])
+        for channel in background["channels"]
+    }
+
+
+def test_patchset(tmp_path, background, patches):
+    patchset = {
+        "metadata": {},
+        "patches": [
+            {"metadata": {"name": f"point_{idx}"}, "patch": patch}
+            for idx, patch in enumerate(patches[:3])
+        ],
+    }
+    store = write_store(str(tmp_path / "store"), background, [patchset])
+    assert list(store.patches()) == [
+        (f"point_{idx}", patch) for idx, patch in enumerate(patches[:3])
+    ]
+
+
+def test_summaries(store, patches):
+    ops = [item for patch in patches for item in reduce_patch(patch)]
+    expected = list(iter_summaries(ops))
+    summaries = list(store.iter_summaries(batch_size=7))
+    assert [key for key, _ in summaries] == [key for key, _ in expected]
+    for (_, summary), (_, reference) in zip(summaries, expected):
+        assert summary.keys() == reference.keys()
+        for name in summary:
+            np.testing.assert_array_equal(summary[name], reference[name])
+
+
+def test_unsupported_modifier(tmp_path, background):
+    background = json.loads(json.dumps(background))
+    modifier = {"name": "custom", "type": "custom", "data": None}
+    background["channels"][0]["samples"][0]["modifiers"].append(modifier)
+    with pytest.raises(ValueError):
+        write_store(str(tmp_path / "store"), background)
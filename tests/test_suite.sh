@@ -3,20 +3,17 @@
 ROOT_WORKSPACE=$1
 PYHF_JSON=$2
 
-# Get the location of this testing script to make other paths relative to it
-scriptDir=$(dirname -- "$(readlink -f -- "${BASH_SOURCE[@]}")")
-
-# Test the python script compare_nuisance.py
-echo "################## Testing python script compare_nuisance.py with sample input files ##################"
-python "${scriptDir}"/../scripts/compare_nuisance.py \
+# Test pyhf-validation compare-nuisance
+echo "################## Testing pyhf-validation compare-nuisance with sample input files ###################"
+pyhf-validation compare-nuisance \
   --root-workspace "${ROOT_WORKSPACE}" \
   --pyhf-json "${PYHF_JSON}" \
 #  | tee compare_nuisance_output.txt
 
 echo "#######################################################################################################"
 
-# Test the python script compare_fitted_nuisance.py
-echo "############### Testing python script compare_fitted_nuisance.py with sample input files ##############"
-python "${scriptDir}"/../scripts/compare_fitted_nuisance.py \
+# Test pyhf-validation compare-fitted-nuisance
+echo "############### Testing pyhf-validation compare-fitted-nuisance with sample input files ###############"
+pyhf-validation compare-fitted-nuisance \
   --root-workspace "${ROOT_WORKSPACE}" \
   --pyhf-json "${PYHF_JSON}"
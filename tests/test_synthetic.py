@@ -0,0 +1,60 @@
+import pyhf
+import pytest
+
+from hfval.fitting import fit_patches
+from hfval.loader import iter_patch_ops, load_background
+from hfval.synthetic import (
+    make_patches,
+    make_patchset,
+    make_workspace,
+    signal_masses,
+    write_likelihoods,
+)
+
+
+def test_synthetic_workspace():
+    workspace = make_workspace(n_channels=3, n_bins=4, n_samples=2, n_modifiers=5)
+    patches = make_patches(workspace, n_points=7, n_modifiers=3)
+    assert len(set(signal_masses(50))) == 50
+
+    ws = pyhf.Workspace(workspace)
+    assert ws.channel_nbins == {"SR_0": 4, "SR_1": 4, "SR_2": 4}
+    patchset = pyhf.PatchSet(make_patchset(workspace, patches))
+    assert len(patchset) == 7
+    assert patchset.digests["sha256"] == pyhf.utils.digest(workspace)
+    model = patchset.apply(ws, "signal_300_0").model()
+    assert model.config.samples == ["bkg_0", "bkg_1", "signal_300_0"]
+    # The staterror, five systematics, lumi and mu_bkg shared by all samples,
+    # and the POI
+    assert len(model.config.parameters) == 3 + 5 + 3 + 2 + 1
+    assert model.config.suggested_fixed()[model.config.par_slice("syst_0")] == [True]
+
+    workspace = make_workspace(n_modifiers=5, measurement=False)
+    model = pyhf.Workspace(workspace).model(poi_name=None)
+    assert "lumi" not in model.config.parameters
+
+
+@pytest.mark.parametrize("warm_start", ["previous", "background"])
+def test_synthetic_fit_patches(warm_start):
+    workspace = make_workspace(n_channels=2, n_bins=3, n_samples=2, n_modifiers=4)
+    patches = make_patches(workspace, n_points=2, n_modifiers=2)
+    for result in fit_patches(workspace, patches, warm_start=warm_start):
+        assert result.converged
+        assert result.bestfit[result.parameters.index("syst_0")] == 0.0
+        assert 0.915 <= result.bestfit[result.parameters.index("lumi")] <= 1.085
+
+
+def test_write_likelihoods(tmp_path):
+    workspace = make_workspace(n_channels=2)
+    patches = make_patches(workspace, n_points=3)
+    write_likelihoods(tmp_path / "files", workspace, patches)
+    write_likelihoods(tmp_path / "patchset", workspace, patches, patchset=True)
+
+    assert load_background(str(tmp_path / "files")) == workspace
+    for path in [tmp_path / "files", tmp_path / "patchset" / "patchset.json"]:
+        ops = list(iter_patch_ops([str(path)], n_workers=1))
+        assert sorted(signal for signal, _ in ops[::2]) == [
+            "signal_300_0",
+            "signal_300_100",
+            "signal_300_50",
+        ]
@@ -0,0 +1,154 @@
+import numpy as np
+import pytest
+
+from hfval.systematics import (
+    ModifierVariations,
+    PatchBatch,
+    add_ops,
+    process_patch,
+    process_patches,
+    workspace_systs,
+)
+
+
+def test_process_patches_identical(patches):
+    batched = process_patches(patches)
+    assert len(batched) == len(patches)
+    for patch in patches:
+        signal = patch[0]["value"]["name"]
+        for op in patch:
+            if op["op"] != "add":
+                continue
+            with np.errstate(divide="ignore", invalid="ignore"):
+                rel, nom = process_patch(op)
+            batched_rel, batched_nom = batched[signal][op["path"]]
+            assert np.array_equal(batched_rel, rel)
+            assert np.array_equal(batched_nom, nom)
+
+
+def test_patch_batch_shapes(patches):
+    batch = PatchBatch.from_patches(patches)
+    assert len(batch) == 80
+    assert batch.nom.shape == (80, batch.nbins.max())
+    assert batch.histo_hi.shape == (80, batch.n_histo.max(), batch.nbins.max())
+    assert batch.norm_hi.shape == (80, batch.n_norm.max())
+    assert batch.bin_mask.sum() == batch.nbins.sum()
+    assert [len(names) for names in batch.histo_names] == batch.n_histo.tolist()
+    histo_deltas, norm_deltas = batch.deltas()
+    assert not histo_deltas[~batch.histo_mask].any()
+    assert not norm_deltas[~batch.norm_mask].any()
+
+
+def test_patch_batch_bin_mismatch(patches):
+    patches[0][0]["value"]["modifiers"][1]["data"]["hi_data"].append(1.0)
+    with pytest.raises(ValueError):
+        PatchBatch.from_patches(patches)
+
+
+def test_modifier_variations(patches):
+    # A histosys changing one bin, and a sample with a negative rate
+    patches[0][0]["value"]["modifiers"][1]["data"]["hi_data"] = list(
+        patches[0][0]["value"]["data"]
+    )
+    patches[1][0]["value"]["data"][0] = -2.0
+    batch = PatchBatch.from_patches(patches)
+    variations = ModifierVariations.from_ops(add_ops(patches))
+    assert variations.keys == batch.keys
+    assert np.array_equal(variations.nbins, batch.nbins)
+    assert np.array_equal(variations.padded(variations.nom), batch.nom)
+    assert variations.histo_names == [n for names in batch.histo_names for n in names]
+    assert len(variations.norm_hi) == batch.n_norm.sum()
+
+    histo_deltas, norm_deltas = batch.deltas()
+    histo, norm = variations.squares()
+    assert np.allclose(
+        variations.padded(histo), np.sum(np.square(histo_deltas), axis=1)
+    )
+    assert np.allclose(variations.padded(norm), np.sum(np.square(norm_deltas), axis=1))
+    assert np.allclose(variations.rel_systs(), batch.rel_systs()[batch.bin_mask])
+
+
+def test_modifier_variations_sparse():
+    # Wide samples with many histosys modifiers affecting a few bins each
+    rng = np.random.default_rng(0)
+    nbins = 200
+    ops = []
+    for k in range(10):
+        nom = rng.uniform(1.0, 10.0, nbins)
+        modifiers = []
+        for i in range(50):
+            hi = nom.copy()
+            lo = nom.copy()
+            changed = rng.choice(nbins, 5, replace=False)
+            hi[changed] *= 1.1
+            lo[changed] *= 0.9
+            modifiers.append(
+                {
+                    "name": f"histo_{i}",
+                    "type": "histosys",
+                    "data": {"hi_data": hi.tolist(), "lo_data": lo.tolist()},
+                }
+            )
+            modifiers.append(
+                {"name": f"norm_{i}", "type": "normsys", "data": {"hi": 1.1, "lo": 0.9}}
+            )
+        path = f"/channels/{k}/samples/0"
+        ops.append(
+            ("signal", {"path": path, "value": {"data": nom, "modifiers": modifiers}})
+        )
+    batch = PatchBatch.from_ops(ops)
+    variations = ModifierVariations.from_ops(ops)
+    assert len(variations.histo_up) == 10 * 50 * 5
+    dense = batch.nom.nbytes + batch.histo_hi.nbytes + batch.histo_lo.nbytes
+    assert variations.nbytes * 10 < dense
+    assert np.allclose(variations.rel_systs(), batch.rel_systs()[batch.bin_mask])
+
+
+def test_workspace_systs(background, patches):
+    import jsonpatch
+
+    spec = jsonpatch.apply_patch(background, patches[0])
+    # A second background sample sharing the staterror of the first channel
+    channel = spec["channels"][0]
+    extra = {
+        "name": "other",
+        "data": [30.0],
+        "modifiers": [
+            {"name": "staterror_SR_0", "type": "staterror", "data": [4.0]},
+            {"name": "other_shape", "type": "shapesys", "data": [3.0]},
+        ],
+    }
+    channel["samples"].append(extra)
+
+    result = workspace_systs(spec)
+    assert result.samples == [
+        "background",
+        patches[0][0]["value"]["name"],
+        "other",
+    ]
+    assert result.channels == ["SR_0", "SR_1", "SR_2", "SR_3"]
+    assert result.nbins.tolist() == [1, 3, 2, 5]
+    assert result.rel.shape == (3, 4, 5)
+    assert np.isnan(result.rel[2, 1:]).all()
+    assert np.isnan(result.rel[0, 0, 1:]).all()
+
+    # The histosys and normsys part is the same as for the signal patches
+    no_stat = workspace_systs(spec, include_stat=False)
+    batched = process_patches(patches[:1])[patches[0][0]["value"]["name"]]
+    for c, nbins in enumerate(result.nbins):
+        rel, _ = batched[f"/channels/{c}/samples/1"]
+        assert np.allclose(no_stat.rel[1, c, :nbins], rel)
+
+    # The staterror of SR_0 combines both samples
+    nom_bkg = background["channels"][0]["samples"][0]["data"][0]
+    rel_stat = np.sqrt(nom_bkg + 4.0**2) / (nom_bkg + 30.0)
+    assert np.isclose(result.staterror[0, 0, 0], rel_stat * nom_bkg)
+    assert np.isclose(result.staterror[2, 0, 0], rel_stat * 30.0)
+    assert np.isclose(result.shapesys[2, 0, 0], 3.0)
+    assert np.isclose(
+        result.rel[2, 0, 0], np.sqrt((rel_stat * 30.0) ** 2 + 3.0**2) / 30.0
+    )
+    # Only the background sample has a staterror in the other channels
+    assert np.allclose(
+        result.staterror[0, 3], np.sqrt(background["channels"][3]["samples"][0]["data"])
+    )
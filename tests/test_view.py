@@ -0,0 +1,153 @@
+import gzip
+import json
+import shlex
+import tarfile
+
+import jsonpatch
+import pytest
+
+from hfval.cache import ArrayCache
+from hfval.fitting import parameter_names
+from hfval.view import WorkspaceView, prune_channels
+
+
+@pytest.fixture
+def spec(background, patches):
+    spec = jsonpatch.apply_patch(background, patches[0])
+    # Binned modifiers, and a parameter shared by two channels
+    for channel in spec["channels"][:2]:
+        sample = channel["samples"][0]
+        nbins = len(sample["data"])
+        sample["modifiers"] += [
+            {
+                "name": f"staterror_{channel['name']}",
+                "type": "staterror",
+                "data": [1.0] * nbins,
+            },
+            {"name": "lumi", "type": "lumi", "data": None},
+            {
+                "name": f"shape_{channel['name']}",
+                "type": "shapesys",
+                "data": [1.0] * nbins,
+            },
+        ]
+    spec["measurements"][0]["config"]["parameters"].append(
+        {
+            "name": "lumi",
+            "auxdata": [1.0],
+            "sigmas": [0.02],
+            "bounds": [[0.5, 1.5]],
+            "inits": [1.0],
+        }
+    )
+    return spec
+
+
+def test_workspace_view(tmp_path, spec):
+    import pyhf
+
+    # Strings with brackets and escapes do not confuse the index
+    spec["channels"][0]["samples"][0]["name"] = 'back"gr{ound]'
+    (tmp_path / "workspace.json").write_text(json.dumps(spec, indent=1))
+    view = WorkspaceView(str(tmp_path / "workspace.json"))
+
+    workspace = pyhf.Workspace(spec)
+    assert view.channels == workspace.channels
+    assert view.channel_nbins() == workspace.channel_nbins
+    assert view.parameter_names() == parameter_names(workspace.model())
+    assert ("lumi", "lumi") in view.modifiers()
+    assert view.channel("SR_1") == spec["channels"][1]
+    assert view.observation("SR_1") == spec["observations"][1]
+    assert view.sample("SR_0", 'back"gr{ound]') == spec["channels"][0]["samples"][0]
+    assert view.spec() == spec
+
+    selected = ["SR_3", "SR_1"]
+    model = view.workspace(selected).model()
+    assert model.config.channels == sorted(selected)
+    assert view.parameter_names(selected) == parameter_names(model)
+    assert view.spec(selected) == prune_channels(spec, selected)
+    with pytest.raises(ValueError, match="Unknown channels SR_9"):
+        view.spec(["SR_9"])
+    with pytest.raises(ValueError, match="Unknown channels SR_9"):
+        prune_channels(spec, ["SR_9"])
+
+
+def test_workspace_view_staterror_order(tmp_path, spec):
+    import pyhf
+
+    # pyhf orders the staterrors by name, not by the channels they are in
+    for channel, name in zip(spec["channels"][:2], ["staterror_zz", "staterror_aa"]):
+        for modifier in channel["samples"][0]["modifiers"]:
+            if modifier["type"] == "staterror":
+                modifier["name"] = name
+    (tmp_path / "workspace.json").write_text(json.dumps(spec))
+    view = WorkspaceView(str(tmp_path / "workspace.json"))
+    names = parameter_names(pyhf.Workspace(spec).model())
+    assert names.index("staterror_aa_0") < names.index("staterror_zz_0")
+    assert view.parameter_names() == names
+
+
+def test_workspace_view_sources(tmp_path, spec):
+    with gzip.open(tmp_path / "workspace.json.gz", "wt") as outfile:
+        json.dump(spec, outfile)
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(spec))
+    with tarfile.open(tmp_path / "likelihoods.tar.gz", "w:gz") as tar:
+        tar.add(tmp_path / "BkgOnly.json", arcname="RegionA/BkgOnly.json")
+
+    for path in [
+        tmp_path / "workspace.json.gz",
+        tmp_path,
+        tmp_path / "likelihoods.tar.gz" / "RegionA" / "BkgOnly.json",
+    ]:
+        view = WorkspaceView(str(path))
+        assert view.channel("SR_2") == spec["channels"][2]
+
+
+def test_workspace_view_cache(tmp_path, spec):
+    path = tmp_path / "workspace.json"
+    path.write_text(json.dumps(spec))
+    cache = ArrayCache("workspace_index", cache_dir=tmp_path / "cache")
+    names = WorkspaceView(str(path), cache=cache).parameter_names()
+    assert WorkspaceView(str(path), cache=cache).parameter_names() == names
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # A changed file is indexed again
+    spec["channels"] = spec["channels"][:2]
+    spec["observations"] = spec["observations"][:2]
+    path.write_text(json.dumps(spec))
+    assert WorkspaceView(str(path), cache=cache).channels == ["SR_0", "SR_1"]
+    assert cache.misses == 2
+
+
+def test_validate_workspace_channels(script_runner, tmp_path, patches, background):
+    (tmp_path / "BkgOnly.json").write_text(json.dumps(background))
+    (tmp_path / "patch.json").write_text(json.dumps(patches[0]))
+
+    command = "pyhf-validation validate-workspace --channel SR_1 --channel SR_3"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    assert "1 samples in 2 channels with 8 bins" in ret.stdout
+
+    ret = script_runner.run(
+        *shlex.split(command), "--patch", "patch.json", cwd=tmp_path
+    )
+    assert ret.success
+    assert "in 2 channels with 8 bins" in ret.stdout
+
+    ret = script_runner.run(
+        *shlex.split("pyhf-validation validate-workspace --channel SR_9"), cwd=tmp_path
+    )
+    assert not ret.success
+    assert "Unknown channels SR_9" in ret.stderr
+
+
+def test_profile_scan_channels(script_runner, tmp_path, spec):
+    from hfval.scans import load_scans
+
+    (tmp_path / "workspace.json").write_text(json.dumps(spec))
+    command = "pyhf-validation profile-scan --pyhf-json workspace.json --channel SR_2 --channel SR_3 --n-points 3 --n-workers 1 --output scans.npz"
+    ret = script_runner.run(*shlex.split(command), cwd=tmp_path)
+    assert ret.success
+    [scan] = load_scans(tmp_path / "scans.npz")
+    assert scan.parameter == "mu_SIG"
+    assert len(scan.values) == 3
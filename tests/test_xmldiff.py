@@ -0,0 +1,162 @@
+import copy
+import json
+
+import numpy as np
+import pytest
+
+from hfval.xmldiff import channel_inputs, diff_workspace, write_differences
+
+CHANNEL_XML = """<!DOCTYPE Channel SYSTEM 'HistFactorySchema.dtd'>
+<Channel Name="{name}" InputFile="data/{name}.root">
+  <Data HistoName="data" />
+  <Sample Name="bkg" HistoName="bkg" NormalizeByTheory="True">
+    <StatError Activate="True" />
+    <OverallSys Name="norm" High="1.05" Low="0.95" />
+    <HistoSys Name="shape" HistoNameHigh="bkg_up" HistoNameLow="bkg_dn" />
+  </Sample>
+  <Sample Name="signal" HistoName="signal" NormalizeByTheory="True">
+    <NormFactor Name="mu" Val="1" High="10" Low="0" />
+  </Sample>
+</Channel>
+"""
+
+TOP_XML = """<!DOCTYPE Combination SYSTEM 'HistFactorySchema.dtd'>
+<Combination OutputFilePrefix="results/out">
+{inputs}
+  <Measurement Name="meas" Lumi="1.0" LumiRelErr="0.02">
+    <POI>mu</POI>
+  </Measurement>
+</Combination>
+"""
+
+
+@pytest.fixture
+def xml_workspace(tmp_path):
+    uproot = pytest.importorskip("uproot")
+    (tmp_path / "config").mkdir()
+    (tmp_path / "data").mkdir()
+    rng = np.random.default_rng(1)
+    inputs = []
+    for name, nbins in [("SR", 3), ("CR", 2)]:
+        edges = np.arange(nbins + 1, dtype=float)
+        bkg = rng.uniform(5.0, 20.0, nbins)
+        with uproot.recreate(tmp_path / "data" / f"{name}.root") as outfile:
+            outfile["data"] = (np.round(bkg) + 1.0, edges)
+            outfile["bkg"] = (bkg, edges)
+            outfile["bkg_up"] = (bkg * 1.1, edges)
+            outfile["bkg_dn"] = (bkg * 0.9, edges)
+            outfile["signal"] = (rng.uniform(0.5, 2.0, nbins), edges)
+        (tmp_path / "config" / f"{name}.xml").write_text(CHANNEL_XML.format(name=name))
+        inputs.append(f"  <Input>config/{name}.xml</Input>")
+    configfile = tmp_path / "config" / "top.xml"
+    configfile.write_text(TOP_XML.format(inputs="\n".join(inputs)))
+    return str(configfile)
+
+
+@pytest.fixture
+def reference(xml_workspace, tmp_path):
+    from pyhf import readxml
+
+    return readxml.parse(xml_workspace, str(tmp_path))
+
+
+def test_channel_inputs(xml_workspace):
+    assert channel_inputs(xml_workspace) == ["config/SR.xml", "config/CR.xml"]
+
+
+def test_identical(xml_workspace, reference, tmp_path):
+    channels = list(diff_workspace(xml_workspace, reference, basedir=str(tmp_path)))
+    assert [channel[0].channel for channel in channels] == ["SR", "CR"]
+    differences = [d for channel in channels for d in channel]
+    assert {d.status for d in differences} == {"ok"}
+    # observation, 2 nominal, 2 lumi, staterror, 2 normsys, 2 histosys, normfactor
+    assert len(channels[0]) == 11
+    histo = [d for d in channels[0] if d.type == "histosys"]
+    assert [(d.sample, d.modifier, d.field) for d in histo] == [
+        ("bkg", "shape", "hi_data"),
+        ("bkg", "shape", "lo_data"),
+    ]
+    assert all(d.n_values == 3 and d.max_abs_diff == 0.0 for d in histo)
+
+
+def test_differences(xml_workspace, reference, tmp_path):
+    reference = copy.deepcopy(reference)
+    sr = reference["channels"][[c["name"] for c in reference["channels"]].index("SR")]
+    bkg = sr["samples"][0]
+    histosys = next(m for m in bkg["modifiers"] if m["type"] == "histosys")
+    histosys["data"]["hi_data"][1] *= 1.01
+    next(m for m in bkg["modifiers"] if m["type"] == "normsys")["data"]["lo"] = 0.9
+    bkg["modifiers"] = [m for m in bkg["modifiers"] if m["type"] != "staterror"]
+    reference["channels"].append({"name": "VR", "samples": []})
+    cr = next(c for c in reference["channels"] if c["name"] == "CR")
+    cr["samples"][1]["data"].append(1.0)
+
+    channels = list(
+        diff_workspace(xml_workspace, reference, basedir=str(tmp_path), rtol=1e-3)
+    )
+    failed = {
+        (d.channel, d.sample, d.modifier, d.field): d
+        for channel in channels
+        for d in channel
+        if d.status != "ok"
+    }
+    assert set(failed) == {
+        ("SR", "bkg", "shape", "hi_data"),
+        ("SR", "bkg", "norm", "lo"),
+        ("SR", "bkg", "staterror_SR", "data"),
+        ("CR", "signal", "", "data"),
+        ("VR", "", "", ""),
+    }
+    shape = failed[("SR", "bkg", "shape", "hi_data")]
+    assert (shape.status, shape.n_failed, shape.n_values) == ("differs", 1, 3)
+    assert shape.max_rel_diff == pytest.approx(0.01 / 1.01)
+    assert failed[("SR", "bkg", "norm", "lo")].max_abs_diff == pytest.approx(0.05)
+    assert failed[("SR", "bkg", "staterror_SR", "data")].status == (
+        "missing in reference"
+    )
+    assert failed[("CR", "signal", "", "data")].status == "length"
+    assert failed[("VR", "", "", "")].status == "missing in xml"
+
+    # A loose enough tolerance accepts the changed values
+    channels = list(
+        diff_workspace(xml_workspace, reference, basedir=str(tmp_path), atol=0.5)
+    )
+    statuses = {d.status for channel in channels for d in channel}
+    assert "differs" not in statuses
+
+
+def test_write_differences(xml_workspace, reference, tmp_path):
+    differences = [
+        d
+        for channel in diff_workspace(xml_workspace, reference, basedir=str(tmp_path))
+        for d in channel
+    ]
+    write_differences(tmp_path / "diff.csv", differences)
+    lines = (tmp_path / "diff.csv").read_text().splitlines()
+    assert lines[0].startswith("channel,sample,modifier")
+    assert len(lines) == len(differences) + 1
+    write_differences(tmp_path / "diff.json", differences)
+    records = json.loads((tmp_path / "diff.json").read_text())
+    assert records[0]["status"] == "ok"
+    assert any(record["max_abs_diff"] is None for record in records)
+    with pytest.raises(ValueError):
+        write_differences(tmp_path / "diff.txt", differences)
+
+
+def test_cli(script_runner, xml_workspace, reference, tmp_path):
+    with open(tmp_path / "reference.json", "w") as outfile:
+        json.dump(reference, outfile)
+    command = "pyhf-validation xml-diff --xml config/top.xml --reference reference.json --n-workers 2 --output diff.csv"
+    ret = script_runner.run(*command.split(), cwd=str(tmp_path))
+    assert ret.success
+    assert "SR: 0 of 11 arrays differ" in ret.stdout
+    assert (tmp_path / "diff.csv").exists()
+
+    reference["channels"][0]["samples"][0]["data"][0] += 1.0
+    with open(tmp_path / "reference.json", "w") as outfile:
+        json.dump(reference, outfile)
+    command = "pyhf-validation xml-diff --xml config/top.xml --reference reference.json --n-workers 1"
+    ret = script_runner.run(*command.split(), cwd=str(tmp_path))
+    assert not ret.success
+    assert "bkg/data (nominal): 1 of 3 values" in ret.stdout
+    assert "1 arrays differ" in ret.stderr